@@ -0,0 +1,92 @@
+# benchmarks/bench_batch_score.py
+# scripts/batch_score.py vs per-record scoring (what a SingleRecord batch transform does per
+# line, minus the HTTP round trip) on a synthetic X_test-shaped CSV: rows/second at each worker
+# count, and peak RSS of the driver and of the largest worker at two file sizes, which should
+# stay flat as the file grows.
+#   python benchmarks/bench_batch_score.py --rows 2000000 --workers 1,2,4,8
+import os, sys, time, argparse, resource, tempfile, subprocess
+import numpy as np
+import joblib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+sys.path.insert(0, SCRIPTS)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import inference
+from flat_model import export_model
+from bench_inference import make_model
+
+# Peak RSS (KB) of the driver and of its largest worker. The driver's comes from VmHWM, which
+# starts over at exec; ru_maxrss would carry over this (much larger) benchmark process's peak.
+MEASURE = ("import sys, runpy, resource; sys.argv = sys.argv[1:]; sys.path.insert(0, %r); "
+           "runpy.run_path(sys.argv[0], run_name='__main__'); "
+           "hwm = [l for l in open('/proc/self/status') if l.startswith('VmHWM')][0].split()[1]; "
+           "print(hwm, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)") % SCRIPTS
+
+def write_csv(path, n_rows, n_features=16, seed=0, block=500_000):
+    """Id + n_features float columns with a header, like rossmann-processed/X_test.csv."""
+    rng = np.random.RandomState(seed)
+    with open(path, "w") as f:
+        f.write(",".join(["Id"] + [f"f{i}" for i in range(n_features)]) + "\n")
+        for start in range(0, n_rows, block):
+            n = min(block, n_rows - start)
+            X = np.column_stack([np.arange(start + 1, start + n + 1), rng.rand(n, n_features)])
+            np.savetxt(f, X, fmt=["%d"] + ["%.6f"] * n_features, delimiter=",")
+    return path
+
+def per_record(model_dir, path, n_lines=2_000):
+    """rows/s of one input_fn -> predict_fn -> output_fn call per line."""
+    model = inference.model_fn(model_dir)
+    with open(path) as f:
+        f.readline()
+        lines = [",".join(f.readline().rstrip("\n").split(",")[1:]) for _ in range(n_lines)]
+    start = time.perf_counter()
+    for line in lines:
+        inference.output_fn(inference.predict_fn(inference.input_fn(line, "text/csv"), model), "text/csv")
+    return n_lines / (time.perf_counter() - start)
+
+def batch_score(model_dir, path, workers):
+    out_path = path + f".{workers}.out"
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", MEASURE, os.path.join(SCRIPTS, "batch_score.py"),
+                          "--model-dir", model_dir, "--input", path, "--output", out_path,
+                          "--workers", str(workers)], check=True, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    driver_kb, worker_kb = (int(v) for v in out.stdout.strip().splitlines()[-1].split())
+    with open(out_path, "rb") as f:
+        rows = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+    os.remove(out_path)
+    return rows / seconds, driver_kb / 1024, worker_kb / 1024
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = os.path.join(workdir, "model")
+        os.makedirs(model_dir)
+        model = make_model(n_trees=args.trees).set_params(n_jobs=None)
+        joblib.dump(model, os.path.join(model_dir, "model.joblib"))
+        export_model(model, model_dir)
+        path = write_csv(os.path.join(workdir, "X_test.csv"), args.rows)
+        print(f"{args.rows:,d} rows, {os.path.getsize(path) / 2**20:.0f}MB, {os.cpu_count()} CPUs")
+
+        print(f"{'per record':>12} | {per_record(model_dir, path):10,.0f} rows/s")
+        base = None
+        for workers in [int(w) for w in args.workers.split(",")]:
+            rate, driver_mb, worker_mb = batch_score(model_dir, path, workers)
+            base = base or rate
+            print(f"{workers:>4} workers | {rate:10,.0f} rows/s | {rate / base:5.2f}x | "
+                  f"peak RSS driver {driver_mb:7.1f}MB, largest worker {worker_mb:7.1f}MB", flush=True)
+
+        # Bounded memory: a 4x smaller file should peak at about the same RSS
+        small = write_csv(os.path.join(workdir, "small.csv"), max(1, args.rows // 4))
+        _, driver_mb, worker_mb = batch_score(model_dir, small, 1)
+        print(f"{args.rows // 4:,d}-row file, 1 worker | peak RSS driver {driver_mb:7.1f}MB, "
+              f"largest worker {worker_mb:7.1f}MB")
+
+if __name__ == "__main__":
+    main()
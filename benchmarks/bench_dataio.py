@@ -0,0 +1,76 @@
+# benchmarks/bench_dataio.py
+# CSV vs Parquet for the processed datasets, entirely on the local storage backend.
+#   python benchmarks/bench_dataio.py --rows 1000000
+#   python benchmarks/bench_dataio.py --rows 200000 --pipeline preprocess,hpt
+import os, sys, time, json, argparse, tempfile, subprocess
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+sys.path.insert(0, SCRIPTS)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+import preprocess
+from store_features import build_store_features
+from storage import LocalStorage
+from dataio import write_dataset, read_dataset, dataset_key
+
+PROC_PREFIX = "rossmann-processed/"
+SUBSET = ["Store", "Promo", "CompetitionDistance", "Month", "DayOfWeek", "CompetitionOpenTimeMonths"]
+
+def processed_frame(n_rows):
+    store_df = synthetic.load_store()
+    df = preprocess.build_features(synthetic.make_train(n_rows, store_df), build_store_features(store_df))
+    for col in ["StateHoliday", "Assortment", "StoreType", "Store"]:
+        df[col] = pd.factorize(df[col].astype(str), sort=True)[0]
+    return df.drop(columns=["Sales"])
+
+def clock(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+def io_benchmark(n_rows, workdir):
+    storage = LocalStorage(workdir)
+    df = processed_frame(n_rows)
+    print(f"{len(df):,d} processed rows x {df.shape[1]} columns")
+    for fmt in ["csv", "parquet"]:
+        _, t_write = clock(lambda: write_dataset(storage, df, PROC_PREFIX, "X_train", fmt=fmt))
+        size = os.path.getsize(storage.local_path(dataset_key(PROC_PREFIX, "X_train", fmt)))
+        full, t_read = clock(lambda: read_dataset(storage, PROC_PREFIX, "X_train", fmt=fmt))
+        sub, t_sub = clock(lambda: read_dataset(storage, PROC_PREFIX, "X_train", columns=SUBSET, fmt=fmt))
+        print(f"{fmt:>8} | write {t_write:7.3f}s | {size / 2**20:8.1f}MB on disk | "
+              f"read all {t_read:7.3f}s ({full.memory_usage().sum() / 2**20:6.1f}MB) | "
+              f"read {len(SUBSET)} cols {t_sub:7.3f}s ({sub.memory_usage().sum() / 2**20:6.1f}MB)")
+
+def pipeline_benchmark(n_rows, stages, workdir):
+    """Run the real stage scripts offline (local storage, local input/model dirs) per format."""
+    input_dir = synthetic.write_inputs(os.path.join(workdir, "input"), n_rows)
+    for fmt in ["csv", "parquet"]:
+        env = dict(os.environ,
+                   ROSSMANN_DATA_FORMAT=fmt,
+                   ROSSMANN_STORAGE_ROOT=os.path.join(workdir, "storage"),
+                   PROCESSING_INPUT_DIR=input_dir,
+                   SM_MODEL_DIR=os.path.join(workdir, "model-" + fmt))
+        timings = {}
+        for stage in stages:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(SCRIPTS, stage + ".py")], env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings[stage] = round(time.perf_counter() - start, 3)
+        print(f"{fmt:>8} | " + json.dumps(timings))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--pipeline", default="", help="comma-separated stages, e.g. preprocess,hpt,train")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.pipeline:
+            pipeline_benchmark(args.rows, args.pipeline.split(","), workdir)
+        else:
+            io_benchmark(args.rows, workdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_forecast_table.py
+# Raw-record scoring latency: forecast-table lookup vs featurize + model inference
+# (FlatForest and sklearn), for 1, 64 and 1,000 records on the test horizon.
+#   python benchmarks/bench_forecast_table.py --trees 100
+import os, sys, time, argparse
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from features import ENCODED_COLUMNS, MODEL_COLUMNS, RecordTransform, build_features, record_columns
+from store_features import build_store_features
+from flat_model import FlatForest
+from forecast_table import build_forecast_table
+from synthetic import load_store, make_train, make_test
+
+def per_call(fn, budget_s=1.0):
+    fn()
+    calls, start = 0, time.perf_counter()
+    while calls < 3 or time.perf_counter() - start < budget_s:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+
+    store_df = load_store()
+    table = build_store_features(store_df)
+    train = build_features(make_train(args.rows, store_df), table)
+    train["StateHoliday"] = train["StateHoliday"].astype(str)
+    encoders = {col: LabelEncoder().fit(train[col]) for col in ENCODED_COLUMNS}
+    for col in ENCODED_COLUMNS:
+        train[col] = encoders[col].transform(train[col])
+    transform = RecordTransform(table, encoders)
+    model = RandomForestRegressor(n_estimators=args.trees, min_samples_leaf=2, random_state=42, n_jobs=-1)
+    model.fit(train[MODEL_COLUMNS].to_numpy(np.float32), train["Sales"])
+    model.set_params(n_jobs=1)
+    flat = FlatForest.from_model(model)
+
+    test = make_test(20_000, store_df)
+    test = test[test["Store"].isin(encoders["Store"].classes_)]
+    dates = test["Date"].to_numpy().astype("datetime64[D]")
+    start = time.perf_counter()
+    forecast = build_forecast_table(flat.predict, transform, dates.min(), int((dates.max() - dates.min()).astype(int)) + 1)
+    print(f"🔹 Scored {forecast.meta['rows']:,d} grid rows in {time.perf_counter() - start:.1f}s "
+          f"({forecast.values.nbytes / 2**20:.1f}MB)")
+
+    records = test.to_dict("records")  # test/test_forecast_table.py checks lookups match the model
+
+    for n in [1, 64, 1_000]:
+        batch = records[:n]
+        lookup = per_call(lambda: forecast.lookup_columns(*record_columns(batch)))
+        flat_t = per_call(lambda: flat.predict(transform.transform_records(batch)))
+        sk = per_call(lambda: model.predict(transform.transform_records(batch)))
+        print(f"{n:>6,d} records | table lookup {lookup * 1e3:8.3f}ms | featurize + FlatForest {flat_t * 1e3:8.3f}ms"
+              f" | featurize + sklearn {sk * 1e3:8.3f}ms")
+
+if __name__ == "__main__":
+    main()
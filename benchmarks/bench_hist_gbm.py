@@ -0,0 +1,54 @@
+# benchmarks/bench_hist_gbm.py
+# HistGradientBoosting on shared quantile bins vs RandomForest, on the synthetic split hpt.py
+# uses: one fit of each model family with default settings, then the best config of each
+# family's successive-halving search. Binning is timed separately since it is paid once per
+# training matrix, not per fit.
+#   python benchmarks/bench_hist_gbm.py --rows 400000 --n_configs 27
+import os, sys, time, json, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import hpt
+from binning import QuantileBinner
+from bench_hpt_search import processed_split
+
+def timed_fit(model, X_train, y_train, X_val, y_val):
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    seconds = time.perf_counter() - start
+    return seconds, hpt.rmse(y_val, model.predict(X_val))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=400_000)
+    parser.add_argument("--n_configs", type=int, default=27)
+    parser.add_argument("--n_jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    X_train, X_val, y_train, y_val = processed_split(args.rows)
+    print(f"{len(X_train):,d} train rows, {len(X_val):,d} validation rows")
+
+    start = time.perf_counter()
+    binner = QuantileBinner().fit(X_train)
+    B_train, B_val = binner.transform(X_train), binner.transform(X_val)
+    print(f"binning  | once            | {time.perf_counter() - start:8.2f}s")
+
+    # ---- Single fits: train.py's RandomForest vs its HistGradientBoosting ----
+    rf_params = {"n_estimators": 100, "min_samples_split": 2, "min_samples_leaf": 1, "max_features": "auto"}
+    t_rf, rmse_rf = timed_fit(hpt.make_forest(rf_params, n_jobs=args.n_jobs), X_train, y_train, X_val, y_val)
+    t_hgb, rmse_hgb = timed_fit(hpt.make_hgb({"max_iter": 100}), B_train, y_train, B_val, y_val)
+    print(f"rf       | default fit     | {t_rf:8.2f}s | RMSE {rmse_rf:.4f}")
+    print(f"hgb      | default fit     | {t_hgb:8.2f}s | RMSE {rmse_hgb:.4f} | {t_rf / t_hgb:.2f}x faster")
+
+    # ---- Best of each family's halving search ----
+    for family, space, X_t, X_v in [("rf", hpt.SEARCH_SPACE, X_train, X_val),
+                                    ("hgb", hpt.HGB_SEARCH_SPACE, B_train, B_val)]:
+        start = time.perf_counter()
+        best_params, best_rmse, _, _ = hpt.successive_halving(
+            hpt.sample_configs(args.n_configs, space=space), X_t, y_train, X_v, y_val,
+            n_jobs=args.n_jobs, family=family)
+        print(f"{family:<8} | halving {args.n_configs:3d} cfgs | {time.perf_counter() - start:8.2f}s | "
+              f"RMSE {best_rmse:.4f} | {json.dumps(best_params)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_hpt_search.py
+# Serial 10-trial random search (today's SageMaker tuner, minus job overhead) vs the
+# in-process successive-halving search in hpt.py, on the same synthetic split, plus a
+# tree-count sweep with and without the warm-start forest cache.
+#   python benchmarks/bench_hpt_search.py --rows 400000 --n_configs 27
+import os, sys, time, json, argparse
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+import preprocess
+import hpt
+from store_features import build_store_features
+
+def processed_split(n_rows, seed=42):
+    """Synthetic processed X/y with the same 50% sample and 80/20 split hpt.py uses."""
+    store_df = synthetic.load_store()
+    df = preprocess.build_features(synthetic.make_train(n_rows, store_df, seed=seed), build_store_features(store_df))
+    for col in preprocess.ENCODED_COLUMNS:
+        df[col] = pd.factorize(df[col].astype(str), sort=True)[0]
+    X = df.drop(columns=["Sales"]).to_numpy(np.float32)
+    y = df["Sales"].to_numpy()
+    X, _, y, _ = train_test_split(X, y, test_size=0.5, random_state=42)
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+def serial_search(configs, X_train, y_train, X_val, y_val):
+    best = None
+    for params in configs:
+        model = hpt.make_forest(params, n_jobs=1)
+        model.fit(X_train, y_train)
+        score = hpt.rmse(y_val, model.predict(X_val))
+        if best is None or score < best[0]:
+            best = (score, params)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=400_000)
+    parser.add_argument("--serial_trials", type=int, default=10)
+    parser.add_argument("--n_configs", type=int, default=27)
+    parser.add_argument("--n_jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    X_train, X_val, y_train, y_val = processed_split(args.rows)
+    print(f"{len(X_train):,d} train rows, {len(X_val):,d} validation rows")
+
+    start = time.perf_counter()
+    serial_rmse, serial_params = serial_search(hpt.sample_configs(args.serial_trials, seed=7),
+                                               X_train, y_train, X_val, y_val)
+    t_serial = time.perf_counter() - start
+    print(f"serial   | {args.serial_trials:3d} trials | {t_serial:8.2f}s | best RMSE {serial_rmse:.4f} | {json.dumps(serial_params)}")
+
+    start = time.perf_counter()
+    best_params, best_rmse, _, history = hpt.successive_halving(
+        hpt.sample_configs(args.n_configs), X_train, y_train, X_val, y_val, n_jobs=args.n_jobs)
+    t_halving = time.perf_counter() - start
+    print(f"halving  | {args.n_configs:3d} configs | {t_halving:8.2f}s | best RMSE {best_rmse:.4f} | {json.dumps(best_params)}")
+    print(f"speedup {t_serial / t_halving:.2f}x over {len(history)} rungs")
+
+    # Tree-count sweep: one fit per checkpoint vs one warm-started growth run
+    params = dict(hpt.sample_configs(1)[0])
+    checkpoints = [100, 125, 150, 175, 200]
+    start = time.perf_counter()
+    for n in checkpoints:
+        hpt.make_forest(dict(params, n_estimators=n), n_jobs=1).fit(X_train, y_train).predict(X_val)
+    t_fits = time.perf_counter() - start
+    start = time.perf_counter()
+    cache = hpt.ForestCache(X_train, y_train, X_val, y_val)
+    for n in checkpoints:
+        cache.grow(params, n)
+    t_grow = time.perf_counter() - start
+    print(f"tree sweep {checkpoints} | separate fits {t_fits:8.2f}s | warm-start growth {t_grow:8.2f}s | "
+          f"speedup {t_fits / t_grow:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_incremental.py
+# Full rebuild (preprocess.py + train.py over the whole history) vs an incremental cycle
+# (preprocess.py --incremental + retrain.py on a fixed number of new rows) at growing history
+# sizes, against the local storage backend. The full rebuild should grow with the history and
+# the incremental cycle should stay about flat.
+#   python benchmarks/bench_incremental.py --history 25000,100000,400000 --delta-rows 2000
+import os, sys, time, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+def run(script, env, *args):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.join(SCRIPTS, script), *args], env=env,
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.stderr.write(out.stdout[-4000:] + out.stderr[-4000:])
+        raise RuntimeError(f"{script} exited with {out.returncode}")
+    return time.perf_counter() - start
+
+def cycle(workdir, n_history, n_delta):
+    input_dir = os.path.join(workdir, "input")
+    os.makedirs(input_dir)
+    store_df = synthetic.load_store()
+    synthetic.make_train(n_history, store_df, end="2015-06-30").to_csv(os.path.join(input_dir, "train.csv"), index=False)
+    synthetic.make_train(n_delta, store_df, seed=1, start="2015-07-01", end="2015-07-07").to_csv(
+        os.path.join(input_dir, "delta.csv"), index=False)
+    synthetic.make_test(1_000, store_df).to_csv(os.path.join(input_dir, "test.csv"), index=False)
+    store_df.to_csv(os.path.join(input_dir, "store.csv"), index=False)
+    env = dict(os.environ, ROSSMANN_STORAGE_ROOT=os.path.join(workdir, "storage"), PROCESSING_INPUT_DIR=input_dir,
+               SM_MODEL_DIR=os.path.join(workdir, "model"), STAGE_CACHE_ROOT=os.path.join(workdir, "stage-cache"))
+    env.pop("STAGE_CACHE_BUCKET", None)
+
+    full = run("preprocess.py", env) + run("train.py", env)
+    run("retrain.py", env)  # records the rebuild's reference histograms, as the first cycle after it would
+    preprocess = run("preprocess.py", env, "--incremental", "--train-file", "delta.csv")
+    retrain = run("retrain.py", env)
+    return full, preprocess, retrain
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default="25000,100000,400000", help="train.csv rows before the new days")
+    parser.add_argument("--delta-rows", type=int, default=2_000, help="rows of new days per cycle")
+    args = parser.parse_args()
+
+    print(f"{'history':>10} | {'full rebuild':>12} | {'incr. preprocess':>16} | {'retrain':>8} | speedup")
+    for n_history in [int(n) for n in args.history.split(",")]:
+        with tempfile.TemporaryDirectory() as workdir:
+            full, preprocess, retrain = cycle(workdir, n_history, args.delta_rows)
+        print(f"{n_history:>10,d} | {full:11.1f}s | {preprocess:15.1f}s | {retrain:7.1f}s | "
+              f"{full / (preprocess + retrain):6.1f}x", flush=True)
+
+if __name__ == "__main__":
+    main()
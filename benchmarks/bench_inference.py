@@ -0,0 +1,175 @@
+# benchmarks/bench_inference.py
+# Local load generator for the scripts/inference.py handlers:
+#  - CSV parsing: old per-row map(float) vs the vectorized parser, at several batch sizes
+#  - closed-loop concurrent single-row requests with and without the micro-batcher,
+#    reporting p50/p99 latency and rows/second
+#  - per-request handler overhead (parse + predict + serialize around a no-op model):
+#    the old flushed-print handlers vs the current ones
+#   python benchmarks/bench_inference.py --concurrency 16 --seconds 10 --window_ms 2
+#  - repetitive dashboard-style traffic (Zipf over a fixed set of rows) with and without the
+#    prediction cache
+#   python benchmarks/bench_inference.py --overhead
+#   python benchmarks/bench_inference.py --cache
+import os, sys, io, json, time, argparse, threading, contextlib, traceback
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import inference
+from prediction_cache import PredictionCache
+
+ROW = "1,0,0,2,1,0,2,6.215,2015,7,27,15,0,0,0,2.302"
+
+def legacy_parse(body):
+    return np.array([list(map(float, line.split(","))) for line in body.split("\n")])
+
+# ---- Handlers as they were before the serving logger: two flushed prints per stage ----
+def legacy_input_fn(request_body, request_content_type):
+    try:
+        print(f"🔹 input_fn received content_type={request_content_type}", flush=True)
+        if request_content_type == "text/csv":
+            data = np.array([float(x) for x in request_body.strip().split(",")]).reshape(1, -1)
+        elif request_content_type == "application/json":
+            data = np.array(json.loads(request_body)).reshape(1, -1)
+        else:
+            raise ValueError(f"Unsupported content type: {request_content_type}")
+        print(f"✅ Parsed input shape: {data.shape}", flush=True)
+        return data
+    except Exception as e:
+        print("❌ Error in input_fn:", e, flush=True)
+        traceback.print_exc(file=sys.stdout)
+        raise
+
+def legacy_predict_fn(input_data, model):
+    print(f"🔹 Running prediction on shape: {input_data.shape}", flush=True)
+    prediction = model.predict(input_data)
+    print(f"✅ Prediction done, shape: {prediction.shape}", flush=True)
+    return prediction
+
+def legacy_output_fn(prediction, content_type):
+    print(f"🔹 Serializing prediction, content_type={content_type}", flush=True)
+    if content_type == "text/csv":
+        return ",".join(str(x) for x in prediction)
+    return json.dumps(prediction.tolist())
+
+class ConstantModel:
+    def predict(self, X):
+        return np.full(len(X), 5263.0)
+
+def overhead_benchmark(n_requests=20_000):
+    """Handler cost around a no-op model, stdout sent to /dev/null (still one write per flush)."""
+    model = ConstantModel()
+    inference.BATCH_WINDOW_MS = 0
+    handlers = {
+        "legacy": (legacy_input_fn, legacy_predict_fn, legacy_output_fn),
+        "current": (inference.input_fn, inference.predict_fn, inference.output_fn),
+    }
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        timings = {}
+        for label, (input_fn, predict_fn, output_fn) in handlers.items():
+            start = time.perf_counter()
+            for _ in range(n_requests):
+                output_fn(predict_fn(input_fn(ROW, "text/csv"), model), "text/csv")
+            timings[label] = (time.perf_counter() - start) / n_requests
+    for label, seconds in timings.items():
+        print(f"{label:>8} handlers | {seconds * 1e6:7.1f}us per request")
+    for rows in [10_000, 1_000_000]:
+        preds = np.random.RandomState(0).rand(rows) * 10_000
+        start = time.perf_counter()
+        "\n".join(str(x) for x in preds)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        inference.to_csv(preds)
+        current = time.perf_counter() - start
+        print(f"serialize {rows:>9,d} rows | str() generator {legacy * 1e3:8.1f}ms | to_csv {current * 1e3:8.1f}ms")
+    print("stage metrics:", json.dumps(inference.metrics_snapshot(), indent=2))
+
+def cache_benchmark(model, n_requests=5_000, distinct_rows=2_000, batch=8, cache_size=1_000):
+    """Batches of `batch` rows drawn Zipf-like from `distinct_rows`; p50/p99 with the cache off and on."""
+    rng = np.random.RandomState(0)
+    rows = rng.rand(distinct_rows, 16).astype(np.float32)
+    picks = np.minimum(rng.zipf(1.3, size=(n_requests, batch)) - 1, distinct_rows - 1)
+    inference.BATCH_WINDOW_MS = 0
+    for label, cache in [("no cache", None), (f"cache {cache_size:,d}", PredictionCache(cache_size))]:
+        inference.prediction_cache = cache
+        latencies = []
+        for pick in picks:
+            start = time.perf_counter()
+            inference.predict_fn(rows[pick], model)
+            latencies.append(time.perf_counter() - start)
+        lat = np.array(latencies) * 1e3
+        hit_rate = f" | hit rate {cache.stats()['hit_rate']:.1%}" if cache is not None else ""
+        print(f"{label:>12} | {batch}-row requests | p50 {np.percentile(lat, 50):7.3f}ms | "
+              f"p99 {np.percentile(lat, 99):7.3f}ms | mean {lat.mean():7.3f}ms{hit_rate}")
+    inference.prediction_cache = None
+
+def make_model(n_rows=50_000, n_trees=100, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(n_rows, 16).astype(np.float32)
+    y = X @ rng.rand(16) * 1000 + rng.rand(n_rows) * 100
+    return RandomForestRegressor(n_estimators=n_trees, min_samples_leaf=2, random_state=42, n_jobs=-1).fit(X, y)
+
+def parse_benchmark(repeats=20):
+    for rows in [1, 64, 10_000]:
+        body = "\n".join([ROW] * rows)
+        timings = {}
+        for label, fn in [("map(float)", legacy_parse), ("vectorized", inference.parse_csv)]:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fn(body)
+            timings[label] = (time.perf_counter() - start) / repeats
+        print(f"parse {rows:>6,d} rows | map(float) {timings['map(float)'] * 1e3:8.3f}ms | "
+              f"vectorized {timings['vectorized'] * 1e3:8.3f}ms")
+
+def load_benchmark(model, concurrency, seconds, window_ms, rows_per_request=1):
+    inference.BATCH_WINDOW_MS = window_ms
+    inference.close_batchers()
+    body = "\n".join([ROW] * rows_per_request)
+    latencies = [[] for _ in range(concurrency)]
+    stop = time.monotonic() + seconds
+
+    def client(i):
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            data = inference.input_fn(body, "text/csv")
+            inference.output_fn(inference.predict_fn(data, model), "text/csv")
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    lat = np.concatenate([np.array(l) for l in latencies]) * 1e3
+    label = f"batch window {window_ms:g}ms" if window_ms else "no batching"
+    print(f"{label:>20} | c={concurrency:<3d} | {len(lat) * rows_per_request / seconds:9.1f} rows/s | "
+          f"p50 {np.percentile(lat, 50):7.2f}ms | p99 {np.percentile(lat, 99):7.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--window_ms", type=float, default=2)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--overhead", action="store_true", help="only the per-request handler overhead")
+    parser.add_argument("--cache", action="store_true", help="only the prediction-cache benchmark")
+    args = parser.parse_args()
+
+    if args.overhead:
+        overhead_benchmark()
+        return
+    if args.cache:
+        model = make_model(n_trees=args.trees)
+        model.set_params(n_jobs=1)
+        cache_benchmark(model)
+        return
+
+    parse_benchmark()
+    model = make_model(n_trees=args.trees)
+    model.set_params(n_jobs=1)
+    load_benchmark(model, args.concurrency, args.seconds, 0)
+    load_benchmark(model, args.concurrency, args.seconds, args.window_ms)
+
+if __name__ == "__main__":
+    main()
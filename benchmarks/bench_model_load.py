@@ -0,0 +1,77 @@
+# benchmarks/bench_model_load.py
+# Cold start of the serving container: joblib (compress=3) vs the flat_model export.
+# Fits an unpruned forest, writes both artifacts, then starts --workers fresh processes at
+# once (like a multi-worker endpoint scaling out) that each run inference.model_fn and one
+# prediction. Reports load time, first-request latency, peak RSS and PSS per worker
+# (PSS splits shared pages between the processes mapping them).
+#   python benchmarks/bench_model_load.py --rows 200000 --trees 200 --workers 4
+import os, sys, json, time, argparse, tempfile, subprocess
+import numpy as np
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS)
+from flat_model import export_model
+
+WORKER = r"""
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import numpy as np
+import inference
+model = inference.model_fn(sys.argv[2])
+loaded = time.perf_counter()
+model.predict(np.zeros((1, 16), dtype=np.float32))
+first = time.perf_counter()
+def proc_mb(path, field):
+    # /proc counters, not ru_maxrss: that one survives exec and would report the parent's peak
+    try:
+        with open(path) as f:
+            return next(int(l.split()[1]) for l in f if l.startswith(field)) / 1024
+    except (OSError, StopIteration):
+        return None
+print(json.dumps({"load_s": loaded - start, "first_predict_ms": (first - loaded) * 1e3,
+                  "max_rss_mb": proc_mb("/proc/self/status", "VmHWM:"),
+                  "pss_mb": proc_mb("/proc/self/smaps_rollup", "Pss:")}))
+"""
+
+def run_workers(model_dir, engine, n_workers):
+    env = dict(os.environ, INFERENCE_ENGINE=engine)
+    procs = [subprocess.Popen([sys.executable, "-c", WORKER, SCRIPTS, model_dir], env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+             for _ in range(n_workers)]
+    return [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--trees", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    X = rng.rand(args.rows, 16).astype(np.float32)
+    y = X @ rng.rand(16) * 1000 + rng.rand(args.rows) * 100
+    start = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=args.trees, random_state=42, n_jobs=-1).fit(X, y)
+    print(f"🔹 Fitted {args.trees} trees on {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    model_dir = tempfile.mkdtemp(prefix="bench-model-")
+    joblib.dump(model, os.path.join(model_dir, "model.joblib"), compress=3)
+    flat_dir = export_model(model, model_dir)
+    sizes = {
+        "joblib": os.path.getsize(os.path.join(model_dir, "model.joblib")),
+        "flat": sum(os.path.getsize(os.path.join(flat_dir, f)) for f in os.listdir(flat_dir)),
+    }
+
+    for engine in ["sklearn", "numpy"]:
+        label = "joblib" if engine == "sklearn" else "flat"
+        results = run_workers(model_dir, engine, args.workers)
+        mean = lambda k: np.mean([r[k] for r in results]) if results[0][k] is not None else float("nan")
+        print(f"{label:>7} | artifact {sizes[label] / 2**20:7.1f}MB | load {mean('load_s'):6.2f}s | "
+              f"first predict {mean('first_predict_ms'):7.2f}ms | max RSS {mean('max_rss_mb'):7.1f}MB | "
+              f"PSS {mean('pss_mb'):7.1f}MB per worker ({args.workers} workers)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_predict_engines.py
+# Prediction latency of the serving engines at batch sizes 1, 64 and 10k:
+# sklearn's RandomForestRegressor.predict (n_jobs=1 and -1) vs FlatForest on numpy / numba.
+#   python benchmarks/bench_predict_engines.py --rows 200000 --trees 200
+import os, sys, copy, time, argparse
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from flat_model import FlatForest, HAS_NUMBA
+
+BATCH_SIZES = [1, 64, 10_000]
+
+def median_latency(predict, X, budget_s=2.0, max_calls=1000):
+    predict(X)  # warm-up
+    times = []
+    deadline = time.perf_counter() + budget_s
+    while len(times) < max_calls and (len(times) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        predict(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--trees", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    X = rng.rand(args.rows, 16).astype(np.float32)
+    y = X @ rng.rand(16) * 1000 + rng.rand(args.rows) * 100
+    start = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=args.trees, random_state=42, n_jobs=-1).fit(X, y)
+    print(f"🔹 Fitted {args.trees} trees on {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    serial = copy.copy(model).set_params(n_jobs=1)
+    engines = {"sklearn n_jobs=-1": model.predict, "sklearn n_jobs=1": serial.predict,
+               "flat numpy": FlatForest.from_model(model, engine="numpy").predict}
+    if HAS_NUMBA:
+        engines["flat numba"] = FlatForest.from_model(model, engine="numba").predict
+
+    X_test = rng.rand(max(BATCH_SIZES), 16).astype(np.float32)
+    print(f"{'engine':>18} | " + " | ".join(f"batch {n:>6,d}" for n in BATCH_SIZES))
+    for label, predict in engines.items():
+        cells = []
+        for n in BATCH_SIZES:
+            seconds = median_latency(predict, X_test[:n])
+            cells.append(f"{seconds * 1e3:10.3f}ms")
+        print(f"{label:>18} | " + " | ".join(cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# benchmarks/bench_preprocess_chunked.py
+# Peak RSS and wall time of preprocess.py in memory vs --chunksize, on the local backend.
+#   python benchmarks/bench_preprocess_chunked.py --sizes 250000,1000000,4000000 --chunksize 200000
+import os, sys, time, argparse, filecmp, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+# Runs one command and reports its peak RSS (ru_maxrss of the only child, in KB on Linux)
+MEASURE = ("import resource, subprocess, sys; subprocess.run(sys.argv[1:], check=True, "
+           "stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL); "
+           "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)")
+
+def run_preprocess(workdir, input_dir, label, extra_args):
+    storage_root = os.path.join(workdir, label)
+    env = dict(os.environ, ROSSMANN_STORAGE_ROOT=storage_root, PROCESSING_INPUT_DIR=input_dir)
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", MEASURE, sys.executable, os.path.join(ROOT, "scripts", "preprocess.py")] + extra_args,
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return time.perf_counter() - start, int(out.stdout.strip()) / 1024, storage_root
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="250000,1000000,4000000")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for n in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as workdir:
+            input_dir = synthetic.write_inputs(os.path.join(workdir, "input"), n)
+            t_mem, rss_mem, out_mem = run_preprocess(workdir, input_dir, "memory", [])
+            t_chk, rss_chk, out_chk = run_preprocess(workdir, input_dir, "chunked",
+                                                     ["--chunksize", str(args.chunksize)])
+            proc = os.path.join("rossmann-sales-bucket", "rossmann-processed")
+            names = ["X_train.csv", "y_train.csv", "X_test.csv"]
+            _, mismatch, errors = filecmp.cmpfiles(os.path.join(out_mem, proc), os.path.join(out_chk, proc),
+                                                   names, shallow=False)
+            print(f"{n:>10,d} rows | in-memory {t_mem:7.2f}s {rss_mem:8.1f}MB | "
+                  f"chunked {t_chk:7.2f}s {rss_chk:8.1f}MB | "
+                  f"{'identical' if not mismatch and not errors else 'DIFFERENT'}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_preprocess_features.py
+# Old preprocess.py (store merge + row-wise apply) vs the store-table gather path.
+#   python benchmarks/bench_preprocess_features.py --sizes 100000,1000000,10000000
+import os, sys, time, argparse, tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import preprocess
+import store_features
+import synthetic
+
+# ---------------- OLD IMPLEMENTATION (reference) ---------------- #
+def legacy_date_column(df):
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["Year"] = df["Date"].dt.year
+    df["Month"] = df["Date"].dt.month
+    df["WeekOfYear"] = df["Date"].dt.isocalendar().week
+    df["Day"] = df["Date"].dt.day
+    df["DayOfWeek"] = df["Date"].dt.dayofweek
+    df["IsWeekend"] = df["DayOfWeek"].isin([5, 6]).astype(int)
+    # .dt parts are int32/int64 and the ISO week UInt32 depending on the pandas version;
+    # date_parts returns int64 throughout, so compare the values
+    date_columns = ["Year", "Month", "WeekOfYear", "Day", "DayOfWeek", "IsWeekend"]
+    df[date_columns] = df[date_columns].astype(np.int64)
+    return df
+
+def legacy_promo(df):
+    df["PromoInterval"] = df["PromoInterval"].fillna("NoPromo")
+    df["Promo2SinceWeek"] = df["Promo2SinceWeek"].fillna(0).astype(int)
+    df["Promo2SinceYear"] = df["Promo2SinceYear"].fillna(0).astype(int)
+    df["MonthStr"] = df["Date"].dt.strftime("%b")
+    df["IsPromoMonth"] = df.apply(
+        lambda row: int(row["MonthStr"] in row["PromoInterval"].split(","))
+        if row["PromoInterval"] != "NoPromo" else 0, axis=1
+    )
+    df.drop(columns=["MonthStr"], inplace=True)
+    df["Promo2Active"] = ((df["Promo2"] == 1) & (df["IsPromoMonth"] == 1)).astype(int)
+    return df
+
+def legacy_competition(df):
+    df = df[df["CompetitionDistance"].notna()]
+    df["CompetitionDistance"] = np.log1p(df["CompetitionDistance"])
+    df["CompetitionOpenSinceMonth"] = df["CompetitionOpenSinceMonth"].fillna(0).astype(int)
+    df["CompetitionOpenSinceYear"]  = df["CompetitionOpenSinceYear"].fillna(0).astype(int)
+    df["CompetitionOpenSinceDate"] = df.apply(
+        lambda row: datetime(
+            year=row["CompetitionOpenSinceYear"],
+            month=row["CompetitionOpenSinceMonth"],
+            day=1
+        ) if row["CompetitionOpenSinceYear"] > 0 and row["CompetitionOpenSinceMonth"] > 0
+        else row["Date"], axis=1
+    )
+    df["CompetitionOpenTimeMonths"] = (
+        (df["Date"].dt.year - df["CompetitionOpenSinceDate"].dt.year) * 12 +
+        (df["Date"].dt.month - df["CompetitionOpenSinceDate"].dt.month)
+    ).apply(lambda x: max(x, 0))
+    df["CompetitionOpenTimeMonths"] = np.log1p(df["CompetitionOpenTimeMonths"])
+    return df.drop(columns=["CompetitionOpenSinceDate"])
+
+def legacy_features(daily, store_df):
+    df = pd.merge(daily, store_df, on="Store", how="left")
+    df = legacy_date_column(df)
+    df = df[df["Open"] == 1].drop(columns=["Open"])
+    df = legacy_competition(legacy_promo(df))
+    return df.drop(columns=[
+        "Date", "Customers", "CompetitionOpenSinceMonth", "CompetitionOpenSinceYear",
+        "Promo2", "Promo2SinceWeek", "Promo2SinceYear", "PromoInterval",
+    ])
+
+def timed(fn, df, memory):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    out = fn(df.copy())
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return out, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100000,1000000,10000000")
+    parser.add_argument("--legacy-max-rows", type=int, default=10_000_000,
+                        help="skip the apply() path above this many rows")
+    parser.add_argument("--memory", action="store_true", help="also report tracemalloc peak")
+    args = parser.parse_args()
+
+    store_df = synthetic.load_store()
+    store_table = store_features.build_store_features(store_df)
+    for n in [int(s) for s in args.sizes.split(",")]:
+        daily = synthetic.make_train(n, store_df)
+        new, t_new, m_new = timed(lambda d: preprocess.build_features(d, store_table), daily, args.memory)
+        line = f"{n:>10,d} rows | vectorized {t_new:8.3f}s"
+        if args.memory:
+            line += f" peak {m_new / 2**20:7.1f}MB"
+        if n <= args.legacy_max_rows:
+            old, t_old, m_old = timed(lambda d: legacy_features(d, store_df), daily, args.memory)
+            pd.testing.assert_frame_equal(old.reset_index(drop=True), new.reset_index(drop=True), check_exact=True)
+            line += f" | apply {t_old:8.3f}s"
+            if args.memory:
+                line += f" peak {m_old / 2**20:7.1f}MB"
+            line += f" | speedup {t_old / t_new:6.1f}x | identical"
+        print(line, flush=True)
+
+if __name__ == "__main__":
+    main()
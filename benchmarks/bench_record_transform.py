@@ -0,0 +1,47 @@
+# benchmarks/bench_record_transform.py
+# Raw-record featurization for the endpoint: RecordTransform (precomputed store lookups)
+# vs pushing the same records through the offline DataFrame path (build_features + encode),
+# at 1, 64 and 10k records. Also checks both produce the same matrix.
+#   python benchmarks/bench_record_transform.py
+import os, sys, time
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from features import ENCODED_COLUMNS, MODEL_COLUMNS, RecordTransform, build_features, encode
+from store_features import build_store_features
+from synthetic import load_store, make_train, make_test
+
+def per_call(fn, budget_s=1.0):
+    fn()
+    calls, start = 0, time.perf_counter()
+    while calls < 3 or time.perf_counter() - start < budget_s:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+def main():
+    store_df = load_store()
+    table = build_store_features(store_df)
+    train = build_features(make_train(200_000, store_df), table)
+    train["StateHoliday"] = train["StateHoliday"].astype(str)
+    encoders = {col: LabelEncoder().fit(train[col]) for col in ENCODED_COLUMNS}
+    transform = RecordTransform(table, encoders)
+
+    test = make_test(20_000, store_df).assign(Open=1)
+    test = test[test["Store"].isin(encoders["Store"].classes_)]
+    expected = encode(build_features(test, table), encoders)[MODEL_COLUMNS].to_numpy(np.float32)
+    records = test.to_dict("records")
+    assert np.array_equal(transform.transform_records(records), expected), "online/offline mismatch"
+    print("✅ RecordTransform matches build_features + encode on", len(records), "records")
+
+    for n in [1, 64, 10_000]:
+        batch, frame = records[:n], test.iloc[:n]
+        offline = per_call(lambda: encode(build_features(frame.copy(), table), encoders)[MODEL_COLUMNS].to_numpy(np.float32))
+        online = per_call(lambda: transform.transform_records(batch))
+        print(f"{n:>6,d} records | build_features+encode {offline * 1e3:9.3f}ms | "
+              f"RecordTransform {online * 1e3:9.3f}ms ({online / n * 1e6:7.2f}us/record)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/bench_serve.py
+# Throughput and memory of scripts/serve.py at 1, 4 and 8 workers on this box, for a pickled
+# forest (shared copy-on-write after the pre-fork) and for the exported flat model
+# (memory-mapped). Memory is the summed PSS of the master and its workers, which splits
+# shared pages between the processes sharing them, next to the summed RSS, which counts them
+# once per process. --reload replaces model.joblib and sends SIGHUP half-way through every
+# run; failed requests are counted either way.
+#   python benchmarks/bench_serve.py --workers 1,4,8 --concurrency 16 --seconds 10
+#   python benchmarks/bench_serve.py --reload
+import os, sys, time, signal, argparse, tempfile, threading, subprocess, http.client
+import numpy as np
+import joblib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVE = os.path.join(ROOT, "scripts", "serve.py")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from flat_model import export_model
+from bench_inference import ROW, make_model
+
+def process_tree(pid):
+    pids = [pid]
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except OSError:
+                pass
+    return pids
+
+def memory_mb(pid):
+    """(summed PSS, summed RSS) in MB over the master and its workers."""
+    pss = rss = 0
+    for p in process_tree(pid):
+        with open(f"/proc/{p}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss += int(line.split()[1])
+                elif line.startswith("Rss:"):
+                    rss += int(line.split()[1])
+    return pss / 1024, rss / 1024
+
+def wait_ready(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/ping")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def load(port, concurrency, seconds, on_half=None):
+    """Closed-loop single-row CSV requests on keep-alive connections; (requests, errors, latencies)."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop = time.monotonic() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/invocations", ROW, {"Content-Type": "text/csv"})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[i] += 1
+            except (OSError, http.client.HTTPException):
+                # a retiring worker closed this keep-alive connection between requests: reconnect
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    if on_half is not None:
+        time.sleep(seconds / 2)
+        on_half()
+    for t in threads:
+        t.join()
+    lat = np.concatenate([np.array(l) for l in latencies]) * 1e3
+    return len(lat), sum(errors), lat
+
+def run(model_dir, workers, args, port):
+    env = dict(os.environ, INFERENCE_ENGINE=args.engine)
+    server = subprocess.Popen([sys.executable, SERVE, "--model-dir", model_dir, "--workers", str(workers),
+                               "--port", str(port), "--watch", "0", "--threads", str(args.threads)],
+                              env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        time.sleep(1)  # let every worker finish start-up before measuring
+        idle_pss, idle_rss = memory_mb(server.pid)
+
+        def reload():
+            model = make_model(n_trees=args.trees, seed=1).set_params(n_jobs=None)
+            joblib.dump(model, os.path.join(model_dir, "model.joblib"))
+            server.send_signal(signal.SIGHUP)
+
+        n, errors, lat = load(port, args.concurrency, args.seconds, reload if args.reload else None)
+        pss, rss = memory_mb(server.pid)
+        return {"rps": n / args.seconds, "p50": np.percentile(lat, 50), "p99": np.percentile(lat, 99),
+                "errors": errors, "idle_pss": idle_pss, "idle_rss": idle_rss, "pss": pss, "rss": rss}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--engine", default="auto", help="INFERENCE_ENGINE for the server")
+    parser.add_argument("--reload", action="store_true", help="hot-reload a new model.joblib mid-run")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    model = make_model(n_trees=args.trees).set_params(n_jobs=None)  # as trained models are served
+    with tempfile.TemporaryDirectory() as workdir:
+        dirs = {"pickled forest": os.path.join(workdir, "joblib"), "flat model": os.path.join(workdir, "flat")}
+        for label, model_dir in dirs.items():
+            os.makedirs(model_dir)
+            joblib.dump(model, os.path.join(model_dir, "model.joblib"))
+            if label == "flat model":
+                export_model(model, model_dir)
+        for label, model_dir in dirs.items():
+            for workers in [int(w) for w in args.workers.split(",")]:
+                r = run(model_dir, workers, args, args.port)
+                print(f"{label:>14} | {workers} workers | {r['rps']:8.0f} req/s | p50 {r['p50']:7.2f}ms "
+                      f"p99 {r['p99']:7.2f}ms | errors {r['errors']} | PSS idle {r['idle_pss']:7.1f}MB "
+                      f"loaded {r['pss']:7.1f}MB | RSS idle {r['idle_rss']:7.1f}MB loaded {r['rss']:7.1f}MB",
+                      flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_train_memory.py
+# Peak RSS and wall time of a full train.py run: the scripts at a baseline git revision vs the
+# working tree, on the same processed data (local storage backend). Also reports how far the
+# validation metrics of the two runs are apart.
+#   python benchmarks/bench_train_memory.py --rows 200000 --baseline HEAD~1
+#   python benchmarks/bench_train_memory.py --storage-root /tmp/off/storage --baseline HEAD~1
+import os, sys, json, time, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+# Runs a script as __main__ in this process, then prints the peak RSS (KB on Linux) of the
+# process itself (data loading, selection, matrices) and of its largest worker (model fits)
+MEASURE = ("import os, sys, runpy, resource; sys.argv = sys.argv[1:]; "
+           "sys.path.insert(0, os.path.dirname(sys.argv[0])); "
+           "runpy.run_path(sys.argv[0], run_name='__main__'); "
+           "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "
+           "resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)")
+RESULTS = os.path.join("rossmann-sales-bucket", "rossmann-model-results", "model_results.json")
+
+def checkout_scripts(rev, workdir):
+    """scripts/ as of `rev`, extracted into workdir."""
+    archive = subprocess.run(["git", "-C", ROOT, "archive", rev, "scripts"], check=True, capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", workdir], input=archive, check=True)
+    return os.path.join(workdir, "scripts")
+
+def run_train(scripts_dir, storage_root, model_dir):
+    # Fixed hash seed: at older baseline revisions the selected-feature column order comes from a set
+    env = dict(os.environ, ROSSMANN_STORAGE_ROOT=storage_root, SM_MODEL_DIR=model_dir, PYTHONHASHSEED="0")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", MEASURE, os.path.join(scripts_dir, "train.py")],
+                         env=env, check=True, capture_output=True, text=True)
+    main_kb, worker_kb = (int(v) for v in out.stdout.strip().splitlines()[-1].split())
+    with open(os.path.join(storage_root, RESULTS)) as f:
+        results = json.load(f)
+    return time.perf_counter() - start, main_kb / 1024, worker_kb / 1024, results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000, help="synthetic train.csv rows")
+    parser.add_argument("--storage-root", help="use processed data already under this local storage root")
+    parser.add_argument("--baseline", default="HEAD", help="git revision whose scripts/ is the baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        storage_root = args.storage_root
+        if storage_root is None:
+            storage_root = os.path.join(workdir, "storage")
+            input_dir = synthetic.write_inputs(os.path.join(workdir, "input"), args.rows)
+            env = dict(os.environ, ROSSMANN_STORAGE_ROOT=storage_root, PROCESSING_INPUT_DIR=input_dir)
+            subprocess.run([sys.executable, os.path.join(SCRIPTS, "preprocess.py")], env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        runs = {}
+        for label, scripts_dir in [(f"baseline {args.baseline}", checkout_scripts(args.baseline, workdir)),
+                                   ("working tree", SCRIPTS)]:
+            seconds, main_rss, worker_rss, results = run_train(scripts_dir, storage_root,
+                                                               os.path.join(workdir, "model-" + str(len(runs))))
+            runs[label] = results
+            print(f"{label:>20} | {seconds:8.1f}s | peak RSS main process {main_rss:8.1f}MB, "
+                  f"largest worker {worker_rss:8.1f}MB", flush=True)
+
+        base, new = runs.values()
+        drift = {name: abs(new[name]["RMSE"] - base[name]["RMSE"]) / base[name]["RMSE"] for name in base}
+        worst = max(drift, key=drift.get)
+        print(f"🔹 Largest relative RMSE difference: {drift[worst]:.2e} ({worst})")
+
+if __name__ == "__main__":
+    main()
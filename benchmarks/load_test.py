@@ -0,0 +1,276 @@
+# benchmarks/load_test.py
+# Load test for an inference endpoint: replays X_test.csv rows as single-row or batched
+# /invocations requests from a pool of threads sharing one pooled urllib3 connection manager,
+# and writes p50/p95/p99/max latency, a latency histogram, throughput and error rates to JSON.
+#
+#   python benchmarks/load_test.py --serve /opt/ml/model --data X_test.csv      # local serve.py
+#   python benchmarks/load_test.py --url http://127.0.0.1:8080 --data X_test.csv
+#   python benchmarks/load_test.py --endpoint rossmann-rf-endpoint --region us-east-1  # SigV4-signed
+#
+# Without --rate every thread sends its next request as soon as the previous one returns
+# (closed loop, measures capacity). With --rate requests are scheduled at that rate whatever
+# the server does (open loop), and latency counts from the scheduled send time, so time a
+# request spends waiting for a free thread is not hidden when the server falls behind.
+# Without --data, X_test.csv is read from the bucket (rossmann-processed/).
+import os, sys, json, time, queue, socket, argparse, tempfile, threading, subprocess
+import numpy as np
+import pandas as pd
+import urllib3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+COLUMNS_FILE = "feature_columns.json"
+# Histogram bucket upper bounds in ms, log-spaced from 0.1ms to 60s
+BUCKETS_MS = np.geomspace(0.1, 60_000, 58)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="server base URL (or full /invocations URL)")
+    target.add_argument("--endpoint", help="SageMaker endpoint name (requests are SigV4-signed)")
+    target.add_argument("--serve", metavar="MODEL_DIR", help="start scripts/serve.py on this model dir")
+    parser.add_argument("--region", default=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"))
+    parser.add_argument("--data", help="X_test.csv to replay (default: from the bucket)")
+    parser.add_argument("--columns", help="comma-separated feature columns to send, in model order "
+                        f"(default: {COLUMNS_FILE} of --model-dir/--serve if present, else all but Id)")
+    parser.add_argument("--model-dir", help=f"model dir whose {COLUMNS_FILE} gives the columns")
+    parser.add_argument("--content-type", choices=["text/csv", "application/json"], default="text/csv")
+    parser.add_argument("--batch-rows", type=int, default=1, help="rows per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads (and pooled connections)")
+    parser.add_argument("--rate", type=float, default=0, help="requests/second, open loop (0: closed loop)")
+    parser.add_argument("--seconds", type=float, default=30, help="measured duration")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of unmeasured traffic first")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request read timeout")
+    parser.add_argument("--workers", type=int, default=1, help="--serve: server worker processes")
+    parser.add_argument("--port", type=int, default=0, help="--serve: port (default: a free one)")
+    parser.add_argument("--out", default="load_report.json")
+    return parser.parse_args(argv)
+
+# ---------------- PAYLOADS ---------------- #
+def load_rows(args):
+    """X_test rows as a float32 matrix in the model's column order, plus the column names."""
+    path = args.data
+    if path is None:
+        sys.path.insert(0, SCRIPTS)
+        from storage import get_storage
+        from dataio import dataset_key
+        path = os.path.join(tempfile.mkdtemp(prefix="load-test-"), "X_test.csv")
+        get_storage("rossmann-sales-bucket").download_file(dataset_key("rossmann-processed/", "X_test", "csv"), path)
+    df = pd.read_csv(path)
+    model_dir = args.model_dir or args.serve
+    if args.columns:
+        columns = args.columns.split(",")
+    elif model_dir and os.path.exists(os.path.join(model_dir, COLUMNS_FILE)):
+        with open(os.path.join(model_dir, COLUMNS_FILE)) as f:
+            columns = json.load(f)
+    else:
+        columns = [c for c in df.columns if c != "Id"]
+    return df[columns].to_numpy(np.float32), columns
+
+def make_payloads(X, batch_rows, content_type, limit=1_000):
+    """Request bodies cycling through the rows; at most `limit` distinct bodies are kept."""
+    bodies = []
+    n = max(1, min(limit, -(-len(X) // batch_rows)))
+    for i in range(n):
+        rows = X[np.arange(i * batch_rows, (i + 1) * batch_rows) % len(X)]
+        if content_type == "text/csv":
+            body = "\n".join(",".join(f"{v:g}" for v in row) for row in rows)
+        else:
+            body = json.dumps(rows.tolist())
+        bodies.append(body.encode())
+    return bodies
+
+# ---------------- TARGETS ---------------- #
+def invocations_url(url):
+    url = url.rstrip("/")
+    return url if url.endswith("/invocations") else url + "/invocations"
+
+class Signer:
+    """SigV4 headers for SageMaker runtime, as boto3's invoke_endpoint would send them."""
+
+    def __init__(self, region):
+        import boto3
+        from botocore.auth import SigV4Auth
+        self.credentials = boto3.Session().get_credentials()
+        self.auth = lambda credentials: SigV4Auth(credentials, "sagemaker", region)
+
+    def headers(self, url, body, headers):
+        from botocore.awsrequest import AWSRequest
+        request = AWSRequest(method="POST", url=url, data=body, headers=headers)
+        self.auth(self.credentials.get_frozen_credentials()).add_auth(request)
+        return dict(request.headers)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(model_dir, workers, port):
+    """scripts/serve.py on 127.0.0.1:port, once /ping answers."""
+    server = subprocess.Popen([sys.executable, os.path.join(SCRIPTS, "serve.py"), "--model-dir", model_dir,
+                               "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+                               "--watch", "0"], stdout=subprocess.DEVNULL)
+    http = urllib3.PoolManager(retries=False)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {server.returncode}")
+        try:
+            if http.request("GET", f"http://127.0.0.1:{port}/ping", timeout=1).status == 200:
+                return server
+        except urllib3.exceptions.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("serve.py did not start")
+
+# ---------------- LOAD ---------------- #
+class Recorder:
+    """Per-thread samples, merged once the run is over."""
+
+    def __init__(self):
+        self.latency, self.service, self.rows, self.statuses = [], [], 0, {}
+
+    def add(self, status, latency, service, rows):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == "200":
+            self.latency.append(latency)
+            self.service.append(service)
+            self.rows += rows
+
+def run_load(url, payloads, args, signer=None):
+    """Drive the target for warmup + seconds; returns (Recorder per thread, measured seconds)."""
+    http = urllib3.PoolManager(num_pools=1, maxsize=args.concurrency, block=True, retries=False,
+                               timeout=urllib3.Timeout(connect=10, read=args.timeout))
+    base_headers = {"Content-Type": args.content_type, "Accept": "text/csv"}
+    start = time.perf_counter()
+    measure_from, stop = start + args.warmup, start + args.warmup + args.seconds
+    schedule = queue.Queue() if args.rate > 0 else None
+    recorders = [Recorder() for _ in range(args.concurrency)]
+
+    def send(i, recorder, scheduled):
+        body = payloads[i % len(payloads)]
+        headers = signer.headers(url, body, base_headers) if signer else base_headers
+        sent = time.perf_counter()
+        try:
+            response = http.request("POST", url, body=body, headers=headers)
+            status = str(response.status)
+        except urllib3.exceptions.HTTPError as e:
+            status = type(e).__name__
+        done = time.perf_counter()
+        if scheduled >= measure_from:
+            recorder.add(status, done - scheduled, done - sent, args.batch_rows)
+
+    def closed_loop(t):
+        i = t
+        while time.perf_counter() < stop:
+            send(i, recorders[t], time.perf_counter())
+            i += args.concurrency
+
+    def open_loop(t):
+        while True:
+            item = schedule.get()
+            if item is None:
+                return
+            i, scheduled = item
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            send(i, recorders[t], scheduled)
+
+    threads = [threading.Thread(target=open_loop if schedule else closed_loop, args=(t,), daemon=True)
+               for t in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    if schedule is not None:
+        # Requests are queued ahead of their send time; a backlog shows up as latency
+        i, interval = 0, 1.0 / args.rate
+        while start + i * interval < stop:
+            lead = start + i * interval - time.perf_counter()
+            if lead > 0.05:
+                time.sleep(lead - 0.05)
+            schedule.put((i, start + i * interval))
+            i += 1
+        for _ in threads:
+            schedule.put(None)
+    for thread in threads:
+        thread.join()
+    return recorders, max(time.perf_counter(), stop) - measure_from
+
+# ---------------- REPORT ---------------- #
+def percentiles(samples_s):
+    ms = np.asarray(samples_s) * 1e3
+    if not len(ms):
+        return {}
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3), "max_ms": round(float(ms.max()), 3),
+            "mean_ms": round(float(ms.mean()), 3)}
+
+def histogram(samples_s):
+    """[{"le_ms": bucket upper bound, "count": n}] over the non-empty buckets."""
+    counts = np.bincount(np.searchsorted(BUCKETS_MS, np.asarray(samples_s) * 1e3), minlength=len(BUCKETS_MS) + 1)
+    bounds = list(BUCKETS_MS) + [float("inf")]
+    return [{"le_ms": round(float(b), 3), "count": int(c)} for b, c in zip(bounds, counts) if c]
+
+def report(recorders, seconds, target, args):
+    latency = [v for r in recorders for v in r.latency]
+    service = [v for r in recorders for v in r.service]
+    statuses = {}
+    for r in recorders:
+        for status, n in r.statuses.items():
+            statuses[status] = statuses.get(status, 0) + n
+    requests = sum(statuses.values())
+    errors = requests - statuses.get("200", 0)
+    return {
+        "target": target, "content_type": args.content_type, "batch_rows": args.batch_rows,
+        "concurrency": args.concurrency, "rate": args.rate or None, "seconds": round(seconds, 3),
+        "requests": requests, "errors": errors, "error_rate": round(errors / requests, 6) if requests else None,
+        "statuses": statuses,
+        "requests_per_s": round(len(latency) / seconds, 2),
+        "rows_per_s": round(sum(r.rows for r in recorders) / seconds, 2),
+        "latency": percentiles(latency),  # from the scheduled send time (open loop) or the send
+        "service_time": percentiles(service),  # request on the wire to response read
+        "histogram": histogram(latency),
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    X, columns = load_rows(args)
+    payloads = make_payloads(X, args.batch_rows, args.content_type)
+    print(f"🔹 {len(X):,d} rows x {len(columns)} columns, {len(payloads)} distinct "
+          f"{args.batch_rows}-row {args.content_type} payloads")
+
+    server, signer = None, None
+    if args.serve:
+        port = args.port or free_port()
+        server = start_server(args.serve, args.workers, port)
+        url = f"http://127.0.0.1:{port}/invocations"
+    elif args.endpoint:
+        url = f"https://runtime.sagemaker.{args.region}.amazonaws.com/endpoints/{args.endpoint}/invocations"
+        signer = Signer(args.region)
+    else:
+        url = invocations_url(args.url)
+
+    try:
+        mode = f"{args.rate:g} req/s open loop" if args.rate else "closed loop"
+        print(f"🔹 {url}: {args.concurrency} threads, {mode}, {args.warmup:g}s warm-up + {args.seconds:g}s")
+        recorders, seconds = run_load(url, payloads, args, signer)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+
+    result = report(recorders, seconds, url, args)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    lat = result["latency"]
+    print(f"✅ {result['requests']:,d} requests, {result['requests_per_s']:,.1f} req/s "
+          f"({result['rows_per_s']:,.0f} rows/s), errors {result['errors']} ({result['error_rate'] or 0:.2%})")
+    if lat:
+        print(f"   latency p50 {lat['p50_ms']:.2f}ms p95 {lat['p95_ms']:.2f}ms p99 {lat['p99_ms']:.2f}ms "
+              f"max {lat['max_ms']:.2f}ms -> {args.out}")
+    if result["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
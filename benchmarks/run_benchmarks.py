@@ -0,0 +1,202 @@
+# benchmarks/run_benchmarks.py
+# End-to-end pipeline benchmark: synthetic Rossmann-shaped inputs at a chosen scale, then
+# preprocess.py -> train.py -> hpt.py -> the inference.py handlers, all against the local
+# storage backend (a directory standing in for the bucket). Each stage runs in its own process
+# and records wall time, peak RSS (the process or its largest worker, whichever is higher) and
+# rows/second; inference adds p50/p99 per-request latency. Validation RMSE is recorded too, so
+# a speedup that costs accuracy shows up as a regression.
+#
+#   python benchmarks/run_benchmarks.py --rows 100000 --out report.json
+#   python benchmarks/run_benchmarks.py --rows 100000 --baseline           # benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --rows 100000 --save-baseline      # re-record the baseline
+#
+# With a baseline the run exits 1 if any metric is worse than the baseline by more than its
+# tolerance. Baselines only compare on the same machine, scale and hpt arguments, so none is
+# committed: when the baseline file does not exist yet, the run records it and compares nothing.
+import os, sys, json, time, shlex, argparse, platform, tempfile, subprocess
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+BUCKET_DIR = "rossmann-sales-bucket"
+# Runs a script as __main__ in this process, then prints the peak RSS (KB on Linux) of the
+# process itself and of its largest child (joblib / process-pool workers)
+MEASURE = ("import os, sys, runpy, resource; sys.argv = sys.argv[1:]; "
+           "sys.path.insert(0, os.path.dirname(sys.argv[0])); "
+           "runpy.run_path(sys.argv[0], run_name='__main__'); "
+           "print('peak_rss_kb', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "
+           "resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)")
+
+# metric -> (better direction, tolerance argument)
+METRICS = {
+    "wall_s": ("lower", "time_tolerance"),
+    "rows_per_s": ("higher", "time_tolerance"),
+    "p50_ms": ("lower", "time_tolerance"),
+    "p99_ms": ("lower", "time_tolerance"),
+    "peak_rss_mb": ("lower", "rss_tolerance"),
+    "rmse": ("lower", "rmse_tolerance"),
+}
+
+def run_stage(script, env, args=()):
+    """Run a script under MEASURE; returns (wall seconds, peak RSS MB, stdout)."""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", MEASURE, script, *args], env=env,
+                         capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if out.returncode != 0:
+        sys.stderr.write(out.stdout[-4000:] + out.stderr[-4000:])
+        raise RuntimeError(f"{os.path.basename(script)} exited with {out.returncode}")
+    line = [l for l in out.stdout.splitlines() if l.startswith("peak_rss_kb ")][-1]
+    self_kb, child_kb = (int(v) for v in line.split()[1:])
+    return seconds, max(self_kb, child_kb) / 1024, out.stdout
+
+def stage_result(seconds, rss_mb, rows, **extra):
+    return dict({"wall_s": round(seconds, 3), "peak_rss_mb": round(rss_mb, 1), "rows": rows,
+                 "rows_per_s": round(rows / seconds, 1)}, **extra)
+
+# ---------------- INFERENCE (runs in its own process) ---------------- #
+def inference_benchmark(model_dir, test_csv, n_requests, batch_rows):
+    """Raw-record requests through input_fn -> predict_fn -> output_fn, as the endpoint calls them."""
+    sys.path.insert(0, SCRIPTS)
+    import inference
+    start = time.perf_counter()
+    model = inference.model_fn(model_dir)
+    load_s = time.perf_counter() - start
+
+    # Stores without CompetitionDistance are dropped by preprocessing, so the endpoint rejects them
+    stores = pd.read_csv(os.path.join(os.path.dirname(test_csv), "store.csv")).dropna(subset=["CompetitionDistance"])
+    test = pd.read_csv(test_csv)
+    records = test[test["Store"].isin(stores["Store"])].drop(columns=["Id"]).to_dict(orient="records")
+    bodies = [json.dumps(records[i % len(records)]) for i in range(n_requests)]
+    latencies = []
+    for body in bodies:
+        start = time.perf_counter()
+        inference.output_fn(inference.predict_fn(inference.input_fn(body, "application/json"), model),
+                            "application/json")
+        latencies.append(time.perf_counter() - start)
+    lat = np.array(latencies) * 1e3
+
+    batch = json.dumps((records * (batch_rows // len(records) + 1))[:batch_rows])
+    start = time.perf_counter()
+    inference.output_fn(inference.predict_fn(inference.input_fn(batch, "application/json"), model), "text/csv")
+    batch_s = time.perf_counter() - start
+    return {"model_load_s": round(load_s, 3), "requests": n_requests,
+            "p50_ms": round(float(np.percentile(lat, 50)), 3), "p99_ms": round(float(np.percentile(lat, 99)), 3),
+            "batch_rows": batch_rows, "rows_per_s": round(batch_rows / batch_s, 1)}
+
+# ---------------- PIPELINE ---------------- #
+def run_pipeline(args, workdir):
+    input_dir = synthetic.write_inputs(os.path.join(workdir, "input"), args.rows, args.test_rows)
+    storage_root = os.path.join(workdir, "storage")
+    env = dict(os.environ, ROSSMANN_STORAGE_ROOT=storage_root, PROCESSING_INPUT_DIR=input_dir,
+               STAGE_CACHE_ROOT=os.path.join(workdir, "stage-cache"))
+    env.pop("STAGE_CACHE_BUCKET", None)
+    stages = {}
+
+    seconds, rss, _ = run_stage(os.path.join(SCRIPTS, "preprocess.py"), env)
+    stages["preprocess"] = stage_result(seconds, rss, args.rows)
+    print(f"🔹 preprocess {seconds:8.1f}s", flush=True)
+
+    seconds, rss, _ = run_stage(os.path.join(SCRIPTS, "train.py"), dict(env, SM_MODEL_DIR=os.path.join(workdir, "train")))
+    with open(os.path.join(storage_root, BUCKET_DIR, "rossmann-model-results", "model_results.json")) as f:
+        results = json.load(f)
+    best = min(results, key=lambda name: results[name]["RMSE"])
+    stages["train"] = stage_result(seconds, rss, args.rows, rmse=round(results[best]["RMSE"], 4), best_model=best)
+    print(f"🔹 train      {seconds:8.1f}s | best {best}", flush=True)
+
+    model_dir = os.path.join(workdir, "hpt")
+    seconds, rss, out = run_stage(os.path.join(SCRIPTS, "hpt.py"), dict(env, SM_MODEL_DIR=model_dir),
+                                  shlex.split(args.hpt_args))
+    score = float([l for l in out.splitlines() if l.startswith("validation:rmse")][-1].split()[1])
+    stages["hpt"] = stage_result(seconds, rss, args.rows // 2, rmse=score)  # hpt.py samples 50%
+    print(f"🔹 hpt        {seconds:8.1f}s | validation:rmse {score:.4f}", flush=True)
+
+    seconds, rss, out = run_stage(os.path.abspath(__file__), env, [
+        "--inference", model_dir, os.path.join(input_dir, "test.csv"),
+        "--requests", str(args.requests), "--batch-rows", str(args.batch_rows)])
+    served = json.loads([l for l in out.splitlines() if l.startswith("{")][-1])
+    stages["inference"] = dict(served, wall_s=round(seconds, 3), peak_rss_mb=round(rss, 1))
+    print(f"🔹 inference  {seconds:8.1f}s | p50 {served['p50_ms']:.2f}ms p99 {served['p99_ms']:.2f}ms", flush=True)
+    return stages
+
+def environment(args):
+    import sklearn
+    rev = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    return {"git": rev, "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "sklearn": sklearn.__version__, "machine": platform.machine(), "cpus": os.cpu_count(),
+            "rows": args.rows, "test_rows": args.test_rows, "hpt_args": args.hpt_args,
+            "requests": args.requests, "batch_rows": args.batch_rows}
+
+# ---------------- BASELINE ---------------- #
+def compare(report, baseline, tolerances):
+    """Rows of (stage, metric, baseline, current, relative change, regressed)."""
+    rows = []
+    for stage, metrics in baseline["stages"].items():
+        for metric, base in metrics.items():
+            if metric not in METRICS or metric not in report["stages"].get(stage, {}):
+                continue
+            direction, tolerance = METRICS[metric]
+            current = report["stages"][stage][metric]
+            change = (current - base) / base if base else 0.0
+            worse = change if direction == "lower" else -change
+            rows.append((stage, metric, base, current, change, worse > tolerances[tolerance]))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000, help="synthetic train.csv rows")
+    parser.add_argument("--test-rows", type=int, default=2_000, help="synthetic test.csv rows")
+    parser.add_argument("--hpt-args", default="--n_estimators 50", help="hyperparameters passed to hpt.py")
+    parser.add_argument("--requests", type=int, default=2_000, help="single-record inference requests")
+    parser.add_argument("--batch-rows", type=int, default=10_000, help="rows in the batch inference request")
+    parser.add_argument("--out", default="benchmark_report.json")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE,
+                        help=f"compare against this report (default {DEFAULT_BASELINE}); recorded there if missing")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="also write the report here")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15, help="allowed relative peak RSS growth")
+    parser.add_argument("--rmse-tolerance", type=float, default=0.01, help="allowed relative RMSE increase")
+    parser.add_argument("--inference", nargs=2, metavar=("MODEL_DIR", "TEST_CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.inference:
+        print(json.dumps(inference_benchmark(*args.inference, args.requests, args.batch_rows)))
+        return
+
+    baseline = None
+    if args.baseline and not os.path.exists(args.baseline):
+        print(f"🔹 No baseline at {args.baseline}: this run records it")
+        args.save_baseline = args.baseline
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for field in ["rows", "test_rows", "hpt_args"]:
+            if baseline["environment"][field] != getattr(args, field):
+                parser.error(f"baseline was recorded with {field}={baseline['environment'][field]!r}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = {"environment": environment(args), "stages": run_pipeline(args, workdir)}
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {path}")
+    if baseline is None:
+        return
+
+    rows = compare(report, baseline, vars(args))
+    for stage, metric, base, current, change, regressed in rows:
+        print(f"{stage:>10} {metric:>12} | {base:12.3f} -> {current:12.3f} | {change:+7.1%}"
+              f"{'  ❌ regression' if regressed else ''}")
+    regressions = [r for r in rows if r[-1]]
+    if regressions:
+        print(f"❌ {len(regressions)} metric(s) regressed against {args.baseline}")
+        sys.exit(1)
+    print(f"✅ No regressions against {args.baseline} (baseline at {baseline['environment']['git']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/synthetic.py
+# Synthetic Rossmann-shaped daily sales, seeded from the store.csv / test.csv schema
+import os
+import numpy as np
+import pandas as pd
+
+CSV_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "csv_files")
+
+def load_store(csv_dir=CSV_DIR):
+    return pd.read_csv(os.path.join(csv_dir, "store.csv"))
+
+def make_train(n_rows, store_df=None, seed=42, start="2013-01-01", end="2015-07-31"):
+    """Return a train.csv-like DataFrame with n_rows random store-days."""
+    if store_df is None:
+        store_df = load_store()
+    rng = np.random.RandomState(seed)
+    days = pd.date_range(start, end, freq="D")
+    dates = days[rng.randint(0, len(days), n_rows)]
+    stores = store_df["Store"].to_numpy()[rng.randint(0, len(store_df), n_rows)]
+    open_ = (rng.rand(n_rows) < 0.83).astype(int)
+    customers = (rng.gamma(4.0, 160.0, n_rows) * open_).astype(int)
+    sales = (customers * rng.uniform(6.0, 12.0, n_rows)).astype(int)
+    return pd.DataFrame({
+        "Store": stores,
+        "DayOfWeek": dates.dayofweek + 1,
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Sales": sales,
+        "Customers": customers,
+        "Open": open_,
+        "Promo": (rng.rand(n_rows) < 0.38).astype(int),
+        "StateHoliday": rng.choice(["0", "a", "b", "c"], n_rows, p=[0.97, 0.02, 0.007, 0.003]),
+        "SchoolHoliday": (rng.rand(n_rows) < 0.18).astype(int),
+    })
+
+def make_test(n_rows, store_df=None, seed=7, start="2015-08-01", end="2015-09-17"):
+    """Return a test.csv-like DataFrame (Id column, no Sales/Customers)."""
+    df = make_train(n_rows, store_df, seed=seed, start=start, end=end)
+    df = df.drop(columns=["Sales", "Customers"])
+    df.insert(0, "Id", np.arange(1, n_rows + 1))
+    return df
+
+def write_inputs(out_dir, n_train, n_test=None, seed=42):
+    """Write train.csv, test.csv and store.csv into out_dir (a processing input dir)."""
+    os.makedirs(out_dir, exist_ok=True)
+    store_df = load_store()
+    make_train(n_train, store_df, seed=seed).to_csv(os.path.join(out_dir, "train.csv"), index=False)
+    make_test(n_test or max(1, n_train // 20), store_df, seed=seed + 1).to_csv(
+        os.path.join(out_dir, "test.csv"), index=False)
+    store_df.to_csv(os.path.join(out_dir, "store.csv"), index=False)
+    return out_dir
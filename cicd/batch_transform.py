@@ -30,11 +30,13 @@ model = SKLearnModel(
     sagemaker_session=sagemaker_session
 )
 
-# Create Transformer object
+# Create Transformer object (scripts/batch_score.py writes the same Id,prediction output locally)
 transformer = model.transformer(
     instance_count=1,
     instance_type="ml.m5.xlarge",
-    strategy="SingleRecord",
+    strategy="MultiRecord",  # mini-batches of lines per request; inference.py parses them in one pass
+    max_payload=6,           # MB per request
+    max_concurrent_transforms=4,
     assemble_with="Line",
     output_path=output_path
 )
@@ -1,10 +1,18 @@
+import os
+import sys
 import sagemaker
 from sagemaker.sklearn.estimator import SKLearn
 from sagemaker.tuner import HyperparameterTuner, IntegerParameter, CategoricalParameter
 from datetime import datetime
+from stages import run_stage
 
 role = "arn:aws:iam::755283537318:role/telco-sagemaker-role"
 bucket = "rossmann-sales-bucket"
+data_format = os.environ.get("ROSSMANN_DATA_FORMAT", "csv")  # csv | parquet, must match preprocessing
+# "tuner": 10 SageMaker trials (default); "halving": one job running hpt.py's in-process search
+hpt_mode = os.environ.get("HPT_MODE", "tuner")
+# "rf": RandomForest (default); "hgb": HistGradientBoosting on quantile bins shared by every trial
+hpt_model = os.environ.get("HPT_MODEL", "rf")
 timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
 job_name = f"rf-hpo-{timestamp}"
 
@@ -18,17 +26,27 @@ estimator = SKLearn(
     framework_version="0.23-1",
     py_version="py3",
     dependencies=["requirements.txt"],
+    environment={"ROSSMANN_DATA_FORMAT": data_format},
     base_job_name="rf-hpo",
     output_path=f"s3://{bucket}/rf-hpo-output"
 )
 
-# Define HPO search space
+# Define HPO search space (same ranges as SEARCH_SPACE / HGB_SEARCH_SPACE in hpt.py)
 hyperparameter_ranges = {
     "n_estimators": IntegerParameter(100, 200),
     "min_samples_split": IntegerParameter(2, 5),
     "min_samples_leaf": IntegerParameter(1, 2),
     "max_features": CategoricalParameter(["sqrt", "log2", "auto"]),
 }
+if hpt_model == "hgb":
+    estimator.set_hyperparameters(model="hgb")
+    hyperparameter_ranges = {
+        "max_iter": IntegerParameter(100, 300),
+        "learning_rate": CategoricalParameter([0.05, 0.1, 0.2]),
+        "max_leaf_nodes": CategoricalParameter([15, 31, 63, 127]),
+        "min_samples_leaf": IntegerParameter(10, 50),
+        "l2_regularization": CategoricalParameter([0.0, 0.1, 1.0]),
+    }
 
 tuner = HyperparameterTuner(
     estimator=estimator,
@@ -45,5 +63,18 @@ tuner = HyperparameterTuner(
     ]
 )
 
-# Start tuning job
-tuner.fit(job_name=job_name)
+def launch():
+    if hpt_mode == "halving":
+        # Same search space, evaluated inside a single training job
+        estimator.set_hyperparameters(model=hpt_model, search="halving", n_configs=27)
+        estimator.fit(job_name=job_name)
+        return {"best_training_job": job_name, "model_data": estimator.model_data}
+    # Start tuning job
+    tuner.fit(job_name=job_name)
+    tuner.wait()
+    best = tuner.best_training_job()
+    return {"tuning_job": job_name, "best_training_job": best,
+            "model_data": f"s3://{bucket}/rf-hpo-output/{best}/output/model.tar.gz"}
+
+# Skipped when the data, the code and the search space are unchanged (see cicd/stages.py)
+run_stage("hpo", launch, dry_run="--dry-run" in sys.argv)
@@ -1,39 +1,57 @@
 # cicd/run_preprocessing_job.py
 
+import os
+import sys
 import sagemaker
-from sagemaker.sklearn.processing import SKLearnProcessor
-from sagemaker.processing import ProcessingInput, ProcessingOutput
+from sagemaker.sklearn.estimator import SKLearn
+from sagemaker.processing import FrameworkProcessor, ProcessingInput, ProcessingOutput
+from stages import run_stage
 
 # Update these as needed
 role = "arn:aws:iam::755283537318:role/telco-sagemaker-role"  
 bucket = "rossmann-sales-bucket"  # 🔄 Replace this
+data_format = os.environ.get("ROSSMANN_DATA_FORMAT", "csv")  # csv | parquet, must match train/hpt
+chunksize = os.environ.get("PREPROCESS_CHUNKSIZE")  # e.g. 200000 for histories that don't fit in RAM
+mode = os.environ.get("PREPROCESS_MODE", "full")  # incremental: only days after the last run
 
-sklearn_processor = SKLearnProcessor(
+arguments = ["--chunksize", chunksize] if chunksize else []
+if mode == "incremental":
+    arguments.append("--incremental")
+
+# FrameworkProcessor uploads the whole scripts/ dir, so preprocess.py can import its helper modules
+sklearn_processor = FrameworkProcessor(
+    estimator_cls=SKLearn,
     framework_version="1.2-1", 
     role=role,
     instance_type="ml.t3.medium",
     instance_count=1,
     base_job_name="rossmann-preprocessing",
+    env={"ROSSMANN_DATA_FORMAT": data_format},
 )
 
-sklearn_processor.run(
-    code="scripts/preprocess.py",
-    inputs=[
-        ProcessingInput(
-            source=f"s3://{bucket}/rossmann-raw",
-            destination="/opt/ml/processing/input"
-        )
-    ],
-    outputs=[
-        ProcessingOutput(
-            source="/opt/ml/processing/processed",
-            destination=f"s3://{bucket}/rossmann-processed"
-        ),
-        ProcessingOutput(
-            source="/opt/ml/processing/artifacts",
-            destination=f"s3://{bucket}/rossmann-artifacts"
-        ),
-    ],
-)
+def launch():
+    sklearn_processor.run(
+        code="preprocess.py",
+        source_dir="scripts",
+        arguments=arguments or None,
+        inputs=[
+            ProcessingInput(
+                source=f"s3://{bucket}/rossmann-raw",
+                destination="/opt/ml/processing/input"
+            )
+        ],
+        outputs=[
+            ProcessingOutput(
+                source="/opt/ml/processing/processed",
+                destination=f"s3://{bucket}/rossmann-processed"
+            ),
+            ProcessingOutput(
+                source="/opt/ml/processing/artifacts",
+                destination=f"s3://{bucket}/rossmann-artifacts"
+            ),
+        ],
+    )
+    print("✅ Rossmann preprocessing job launched on SageMaker .")
 
-print("✅ Rossmann preprocessing job launched on SageMaker .")
+# Skipped when rossmann-raw and the preprocessing code are unchanged (see cicd/stages.py)
+run_stage("preprocess", launch, dry_run="--dry-run" in sys.argv)
@@ -1,27 +1,41 @@
+import os
+import sys
 import sagemaker
 from sagemaker.sklearn.estimator import SKLearn
 from datetime import datetime
+from stages import run_stage
 
 role = "arn:aws:iam::755283537318:role/telco-sagemaker-role"
 bucket = "rossmann-sales-bucket"
+data_format = os.environ.get("ROSSMANN_DATA_FORMAT", "csv")  # csv | parquet, must match preprocessing
+selection_mode = os.environ.get("TRAIN_SELECTION_MODE", "reuse")  # reuse | hist | permutation
+# full: train.py refits everything; incremental: retrain.py updates the models on the new date
+# partitions (preprocessing with PREPROCESS_MODE=incremental) and rebuilds only on drift
+train_mode = os.environ.get("TRAIN_MODE", "full")
+retrain_env = {k: v for k, v in os.environ.items() if k.startswith("RETRAIN_")}  # drift thresholds
 
 timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
 job_name = f"rossmann-training-{timestamp}"
 
 
 sklearn_estimator = SKLearn(
-    entry_point="train.py",
+    entry_point="retrain.py" if train_mode == "incremental" else "train.py",
     source_dir="scripts/",
     role=role,
     instance_count=1,
     instance_type="ml.m5.xlarge",
     framework_version="0.23-1",
     py_version="py3",
-    dependencies=["requirements.txt"]
+    dependencies=["requirements.txt"],
+    environment={"ROSSMANN_DATA_FORMAT": data_format, "TRAIN_SELECTION_MODE": selection_mode, **retrain_env}
 )
 
 
 
 
-# 🔁 Run Training Job
-sklearn_estimator.fit(job_name=job_name)
+# 🔁 Run Training Job (skipped when the processed data and training code are unchanged)
+def launch():
+    sklearn_estimator.fit(job_name=job_name)
+    return {"job_name": job_name, "model_data": sklearn_estimator.model_data}
+
+run_stage("train", launch, dry_run="--dry-run" in sys.argv)
@@ -0,0 +1,158 @@
+# cicd/stages.py
+# Stage-cache wiring for the SageMaker launchers. Each stage declares the bucket objects it
+# reads, the source files it runs (its workflow's path filter) and the prefixes it writes.
+# A launcher hands its job to run_stage: if the stage's key is already cached, the outputs are
+# copied back into the bucket and no job is started; otherwise the job runs and its outputs
+# are cached. Feature selection is cached the same way from inside train.py.
+#
+#   python cicd/stages.py --dry-run                  # what every stage would do right now
+#   python cicd/run_training_job.py --dry-run         # the same for one launcher
+#
+# Inputs are identified by storage digests (ETags on S3), so nothing is downloaded to compute
+# a key. A restored object can get a different multipart ETag than the original upload; that
+# costs at most one extra miss downstream, never a wrong hit.
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+from storage import get_storage
+from dataio import dataset_key
+from stage_cache import get_cache, stage_spec, spec_key, spec_changes
+
+BUCKET = "rossmann-sales-bucket"
+PROC_PREFIX = "rossmann-processed/"
+
+def _files(*names):
+    return [os.path.join(ROOT, name) for name in names]
+
+def _data_format():
+    return os.environ.get("ROSSMANN_DATA_FORMAT", "csv")
+
+def _processed(*names):
+    return [dataset_key(PROC_PREFIX, name, _data_format()) for name in names]
+
+def _incremental(stage_env):
+    return os.environ.get(stage_env, "full") == "incremental"
+
+def _retrain_params():
+    return {k: v for k, v in sorted(os.environ.items()) if k.startswith("RETRAIN_")}
+
+# Inputs ending in "/" stand for every object under that prefix
+STAGES = {
+    "preprocess": {
+        # An incremental run also depends on which days are already processed
+        "inputs": lambda: ["rossmann-raw/"] + ([PROC_PREFIX + "partitions/manifest.json"]
+                                               if _incremental("PREPROCESS_MODE") else []),
+        "code": _files("scripts/preprocess.py", "scripts/store_features.py", "scripts/features.py",
+                       "scripts/storage.py", "scripts/dataio.py", "scripts/instrument.py",
+                       "requirements.txt", "cicd/run_preprocessing_job.py"),
+        # --chunksize only changes peak memory, not the output
+        "params": lambda: {"data_format": _data_format(), "mode": os.environ.get("PREPROCESS_MODE", "full")},
+        "outputs": ["rossmann-processed/", "rossmann-artifacts/"],
+        "after": [],
+    },
+    "train": {
+        # An incremental run updates the previous models on the new partitions
+        "inputs": lambda: (_processed("X_train", "y_train") + ["rossmann-artifacts/"]
+                           + ([PROC_PREFIX + "partitions/", "rossmann-trained-models/"]
+                              if _incremental("TRAIN_MODE") else [])),
+        "code": _files("scripts/train.py", "scripts/retrain.py", "scripts/feature_selection.py",
+                       "scripts/stage_cache.py", "scripts/storage.py", "scripts/dataio.py", "scripts/flat_model.py",
+                       "scripts/features.py", "scripts/store_features.py", "scripts/binning.py",
+                       "scripts/instrument.py", "requirements.txt", "cicd/run_training_job.py"),
+        "params": lambda: {"data_format": _data_format(),
+                           "selection_mode": os.environ.get("TRAIN_SELECTION_MODE", "reuse"),
+                           "mode": os.environ.get("TRAIN_MODE", "full"), **_retrain_params()},
+        "outputs": ["rossmann-trained-models/", "rossmann-model-results/", "rossmann-selected-features/"],
+        "after": ["preprocess"],
+    },
+    "hpo": {
+        "inputs": lambda: (_processed("X_train", "y_train") + ["rossmann-artifacts/"]
+                           + ["rossmann-selected-features/selected_features.json"]),
+        "code": _files("scripts/hpt.py", "scripts/storage.py", "scripts/dataio.py", "scripts/flat_model.py",
+                       "scripts/features.py", "scripts/store_features.py", "scripts/binning.py",
+                       "scripts/instrument.py", "requirements.txt", "cicd/hpt_runner_job.py"),
+        "params": lambda: {"data_format": _data_format(), "hpt_mode": os.environ.get("HPT_MODE", "tuner"),
+                           "hpt_model": os.environ.get("HPT_MODEL", "rf")},
+        # The tuned model stays where SageMaker wrote it; the entry records where that is
+        "outputs": [],
+        "after": ["preprocess", "train"],
+    },
+}
+
+def input_digests(storage, patterns):
+    digests = {}
+    for pattern in patterns:
+        if pattern.endswith("/"):
+            for key, _ in storage.list_keys(pattern):
+                digests[key] = storage.digest(key)
+        else:
+            digests[pattern] = storage.digest(pattern) if storage.exists(pattern) else "missing"
+    return digests
+
+def current_spec(name, storage):
+    stage = STAGES[name]
+    return stage_spec(name, input_digests(storage, stage["inputs"]()), stage["code"], stage["params"]())
+
+def output_keys(name, storage):
+    return [key for prefix in STAGES[name]["outputs"] for key, _ in storage.list_keys(prefix)]
+
+def explain(name, spec, cache, rerun_upstream=()):
+    """One dry-run line: would the stage be restored from the cache or recomputed, and why."""
+    key = spec_key(spec)
+    entry = cache.get(key, touch=False)
+    upstream = [s for s in STAGES[name]["after"] if s in rerun_upstream]
+    if entry is not None and not upstream:
+        size = sum(o["size"] for o in entry["outputs"].values())
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created"]))
+        return True, f"{name:>10} | cached    | {key[:12]} restores {len(entry['outputs'])} outputs ({size / 2**20:.1f}MB) from {when}"
+    if upstream:
+        reason = f"after {', '.join(upstream)} reruns"
+    else:
+        previous = cache.latest(name)
+        changes = spec_changes(previous.get("spec") or {}, spec) if previous else []
+        reason = "; ".join(changes) if changes else "no cached run"
+    return False, f"{name:>10} | recompute | {key[:12]} {reason}"
+
+def run_stage(name, launch, dry_run=False):
+    """Restore the stage's outputs from the cache, or run launch() and cache what it wrote.
+
+    launch() may return a dict of metadata (e.g. the model artifact URI) kept with the entry.
+    """
+    storage, cache = get_storage(BUCKET), get_cache()
+    spec = current_spec(name, storage)
+    if dry_run:
+        print(explain(name, spec, cache)[1])
+        return None
+    key = spec_key(spec)
+    entry = cache.get(key)
+    if entry is not None:
+        restored = cache.restore_objects(entry, storage)
+        print(f"⏭️  {name}: inputs, code and parameters unchanged ({key[:12]}), "
+              f"restored {len(restored)} outputs from the stage cache")
+        for field, value in entry["meta"].items():
+            print(f"   {field}: {value}")
+        return entry["meta"]
+    meta = launch() or {}
+    cache.put_objects(key, name, storage, output_keys(name, storage), meta, spec)
+    print(f"🔹 {name}: cached as {key[:12]}")
+    return meta
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="report only (the default)")
+    parser.add_argument("stages", nargs="*", default=list(STAGES))
+    args = parser.parse_args()
+    storage, cache = get_storage(BUCKET), get_cache()
+    rerun = []
+    for name in args.stages:
+        hit, line = explain(name, current_spec(name, storage), cache, rerun)
+        print(line)
+        if not hit:
+            rerun.append(name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# scripts/batch_score.py
+# Local batch scoring with the inference.py handlers, in place of a SageMaker batch transform.
+# The CSV is cut into byte-range shards on line boundaries; a process pool scores each shard
+# with large predict_fn calls and the predictions are written in input order as shards finish.
+# Only a bounded number of shards is in flight, so memory does not grow with the file size.
+#
+# Output matches the batch transform in cicd/batch_transform.py (join_source="Input",
+# output_filter="$[0,-1]"): each output line is the selected fields of the input line
+# followed by the prediction, by default "Id,prediction". Filters use the transform's
+# JSONPath subset: "$[1:]", "$[0,-1]", "$[2:5]", "$[0,3,-1]".
+#
+#   python scripts/batch_score.py --model-dir /opt/ml/model --input X_test.csv --output preds.csv
+#   python scripts/batch_score.py --model-dir /opt/ml/model --upload   # X_test from the bucket
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import inference
+from storage import get_storage
+from dataio import DATA_FORMAT, dataset_key, iter_dataset
+from features import COLUMNS_FILE
+
+BUCKET = "rossmann-sales-bucket"
+PROC_PREFIX = "rossmann-processed/"
+OUTPUT_PREFIX = "rossmann-batch-predictions/"
+SHARD_BYTES = 16 * 1024 * 1024
+BATCH_ROWS = 65_536
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", default=os.environ.get("SM_MODEL_DIR", "/opt/ml/model"))
+    parser.add_argument("--input", help="CSV to score (default: X_test.csv from the bucket)")
+    parser.add_argument("--output", help="predictions file (default: <input name>.out)")
+    parser.add_argument("--upload", action="store_true", help=f"also upload the output to {OUTPUT_PREFIX}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / 2**20)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="rows per predict_fn call")
+    parser.add_argument("--input-filter", help="input fields the model sees (default: the model's "
+                        f"{COLUMNS_FILE} columns by header name, else '$[1:]', i.e. all but Id)")
+    parser.add_argument("--output-filter", default="$[0,-1]", help="fields of input + prediction to write")
+    parser.add_argument("--header", choices=["auto", "yes", "no"], default="auto",
+                        help="whether the first line is a header (auto: if its first field is not a number)")
+    return parser.parse_args(argv)
+
+# ---------------- FILTERS ---------------- #
+def parse_filter(expr):
+    """'$[1:]' / '$[0,-1]' -> function(n_fields) -> list of field positions."""
+    match = re.fullmatch(r"\$\[(.*)\]", expr.replace(" ", ""))
+    if match is None:
+        raise ValueError(f"Unsupported filter {expr!r}, expected e.g. '$[1:]' or '$[0,-1]'")
+    body = match.group(1)
+    if ":" in body:
+        start, stop = (int(v) if v else None for v in body.split(":"))
+        return lambda n: list(range(n))[start:stop]
+    indices = [int(v) for v in body.split(",")]
+    return lambda n: [i % n for i in indices]
+
+# ---------------- SHARDS ---------------- #
+def read_layout(path):
+    """(header fields or None, number of fields) from the first line of a CSV."""
+    with open(path, "rb") as f:
+        first = f.readline().decode().rstrip("\r\n").split(",")
+    try:
+        float(first[0])
+        return None, len(first)
+    except ValueError:
+        return first, len(first)
+
+def input_positions(model_dir, header, n_fields, input_filter=None):
+    """Field positions fed to the model, in the model's column order when it can be known."""
+    if input_filter is not None:
+        return parse_filter(input_filter)(n_fields)
+    columns_path = os.path.join(model_dir, COLUMNS_FILE)
+    if header is not None and os.path.exists(columns_path):
+        with open(columns_path) as f:
+            columns = json.load(f)
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise ValueError(f"Input has no column(s) {missing} that the model was trained on")
+        return [header.index(c) for c in columns]
+    return parse_filter("$[1:]")(n_fields)
+
+def shard_ranges(path, shard_bytes, skip_header=False):
+    """[(start, end)] byte ranges covering whole lines, about shard_bytes each."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = len(f.readline()) if skip_header else 0
+        ranges = []
+        while start < size:
+            f.seek(min(start + shard_bytes, size))
+            if f.tell() < size:
+                f.readline()  # finish the line the cut falls in
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+# ---------------- WORKERS ---------------- #
+_model = None
+
+def init_worker(model_dir):
+    global _model
+    _model = inference.model_fn(model_dir)
+    # The pool already keeps every core busy: no nested parallelism inside one shard
+    if hasattr(_model, "PARALLEL_ROWS"):
+        _model.PARALLEL_ROWS = float("inf")
+    elif hasattr(_model, "n_jobs"):
+        _model.n_jobs = None
+
+def score_shard(path, start, end, input_cols, output_cols, n_fields, batch_rows):
+    """Score lines in [start, end) of path; returns the output lines as bytes.
+
+    output_cols index the joined record: the n_fields input fields, then the prediction.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if not data.strip():
+        return b""
+    echoed = [c for c in output_cols if c < n_fields]
+    # Echoed fields stay text, exactly as in the input line
+    df = pd.read_csv(BytesIO(data), header=None, dtype={c: str for c in echoed})
+    X = df.iloc[:, input_cols].to_numpy(np.float32)
+    predictions = np.concatenate([
+        np.asarray(inference.predict_fn(X[i:i + batch_rows], _model))
+        for i in range(0, len(X), batch_rows)
+    ])
+    text = inference.to_csv(predictions).split("\n")
+    fields = [text if c == n_fields else df[c].tolist() for c in output_cols]
+    return ("\n".join(",".join(row) for row in zip(*fields)) + "\n").encode()
+
+# ---------------- DRIVER ---------------- #
+def fetch_dataset(storage, prefix, name, path):
+    """Processed dataset -> local CSV at path, whichever ROSSMANN_DATA_FORMAT it was written in."""
+    if DATA_FORMAT == "csv":
+        storage.download_file(dataset_key(prefix, name, "csv"), path)
+        return path
+    with open(path, "wb") as f:  # Parquet is re-encoded batch by batch, never loaded whole
+        header = True
+        for chunk in iter_dataset(storage, prefix, name):
+            f.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+            header = False
+    return path
+
+def score_file(model_dir, path, out_path, workers=None, shard_bytes=SHARD_BYTES, batch_rows=BATCH_ROWS,
+               input_filter=None, output_filter="$[0,-1]", header="auto"):
+    """Score path into out_path in input order; returns the number of rows written."""
+    header_fields, n_fields = read_layout(path)
+    if header == "no":
+        header_fields = None
+    skip_header = header_fields is not None or header == "yes"
+    # Resolved once here, so a bad filter or column set fails before the pool starts
+    task = (input_positions(model_dir, header_fields, n_fields, input_filter),
+            parse_filter(output_filter)(n_fields + 1), n_fields, batch_rows)
+    shards = shard_ranges(path, int(shard_bytes), skip_header)
+    workers = max(1, min(workers or os.cpu_count(), len(shards)))
+    rows = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_dir,)) as pool, \
+            open(out_path, "wb") as out:
+        pending = deque()
+        todo = iter(shards)
+        # At most two shards per worker in flight: bounded memory, and workers never wait on the writer
+        for start, end in todo:
+            pending.append(pool.submit(score_shard, path, start, end, *task))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            lines = pending.popleft().result()
+            out.write(lines)
+            rows += lines.count(b"\n")
+            for start, end in todo:
+                pending.append(pool.submit(score_shard, path, start, end, *task))
+                break
+    return rows
+
+def main(argv=None):
+    args = parse_args(argv)
+    storage = get_storage(BUCKET)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.input
+        if path is None:
+            path = fetch_dataset(storage, PROC_PREFIX, "X_test", os.path.join(workdir, "X_test.csv"))
+        out_path = args.output or os.path.basename(path) + ".out"  # batch transform's naming
+        start = time.perf_counter()
+        rows = score_file(args.model_dir, path, out_path, args.workers, args.shard_mb * 2**20, args.batch_rows,
+                          args.input_filter, args.output_filter, args.header)
+        seconds = time.perf_counter() - start
+        print(f"✅ Scored {rows:,d} rows in {seconds:.1f}s ({rows / seconds:,.0f} rows/s) -> {out_path}")
+        if args.upload:
+            storage.upload_file(out_path, OUTPUT_PREFIX + os.path.basename(out_path))
+            print(f"✅ Uploaded to {OUTPUT_PREFIX}{os.path.basename(out_path)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# scripts/binning.py
+# Quantile binning shared by every histogram-based gradient-boosting fit. Binning is the only
+# part of a HistGradientBoostingRegressor fit that depends on the data alone, so it is done
+# once per training matrix: the uint8 codes are reused across hpt trials and across both
+# feature sets in train.py (a column subset of the codes is the binning of that subset).
+# Boosting on the codes boosts on this binning, since the booster's own binning keeps each of
+# <= 255 distinct codes in its own bin; for columns with <= max_bins distinct values that is
+# exactly the binning it would have derived from the raw values.
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+
+MISSING_CODE = 255
+
+def midpoint_percentiles(values, q):
+    try:
+        return np.percentile(values, q, method="midpoint")
+    except TypeError:  # numpy < 1.22
+        return np.percentile(values, q, interpolation="midpoint")
+
+class QuantileBinner(BaseEstimator, TransformerMixin):
+    """Per-column quantile thresholds; transform -> C-contiguous uint8 codes (NaN -> 255)."""
+
+    def __init__(self, max_bins=255, subsample=200_000, random_state=0):
+        self.max_bins = max_bins
+        self.subsample = subsample
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        if not 2 <= self.max_bins <= MISSING_CODE:
+            raise ValueError(f"max_bins must be in [2, {MISSING_CODE}], got {self.max_bins}")
+        X = np.asarray(X)
+        if self.subsample is not None and len(X) > self.subsample:
+            rows = np.random.RandomState(self.random_state).choice(len(X), self.subsample, replace=False)
+            X = X[np.sort(rows)]
+        self.thresholds_ = []
+        for j in range(X.shape[1]):
+            values = X[:, j].astype(np.float64)
+            values = values[~np.isnan(values)]
+            distinct = np.unique(values)
+            if len(distinct) <= self.max_bins:
+                # One bin per distinct value, split halfway between neighbours
+                edges = (distinct[:-1] + distinct[1:]) / 2
+            else:
+                edges = np.unique(midpoint_percentiles(values, np.linspace(0, 100, self.max_bins + 1)[1:-1]))
+            self.thresholds_.append(edges)
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def transform(self, X):
+        X = np.asarray(X)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        codes = np.empty(X.shape, dtype=np.uint8)
+        for j, edges in enumerate(self.thresholds_):
+            column = X[:, j]
+            codes[:, j] = np.searchsorted(edges, column, side="left")
+            codes[np.isnan(column), j] = MISSING_CODE
+        return codes
+
+    def select(self, columns):
+        """The fitted binner restricted to column positions `columns` (no refit)."""
+        subset = QuantileBinner(self.max_bins, self.subsample, self.random_state)
+        subset.thresholds_ = [self.thresholds_[j] for j in columns]
+        subset.n_features_in_ = len(subset.thresholds_)
+        return subset
+
+def binned_pipeline(binner, model):
+    """Raw features -> codes -> fitted model, as one predictor that pickles with the model."""
+    return Pipeline([("bin", binner), ("model", model)])
+
+def hist_gbm(**params):
+    """HistGradientBoostingRegressor without internal early stopping, so fits are deterministic
+    and warm-started growth matches a from-scratch fit."""
+    try:
+        from sklearn.ensemble import HistGradientBoostingRegressor
+    except ImportError:  # scikit-learn < 1.0 keeps it behind the experimental flag
+        from sklearn.experimental import enable_hist_gradient_boosting  # noqa: F401
+        from sklearn.ensemble import HistGradientBoostingRegressor
+    params.setdefault("random_state", 42)
+    return HistGradientBoostingRegressor(early_stopping=False, **params)
@@ -0,0 +1,214 @@
+# scripts/dataio.py
+# Processed-dataset I/O shared by preprocess, train and hpt (CSV or Parquet).
+# Frames are serialized in row batches straight into a storage writer, and read
+# back from a stream, so only one batch of serialized bytes is held at a time.
+# Training reads go one step further: chunks are scattered into one C-contiguous float32
+# matrix whose rows are already in split order, so train/validation sets are slices of it.
+# Incremental runs add date partitions next to the base datasets, listed in a manifest.
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# csv keeps today's files; parquet needs pyarrow
+DATA_FORMAT = os.environ.get("ROSSMANN_DATA_FORMAT", "csv")
+
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+
+# Rows serialized per write; also the Parquet row-group size
+WRITE_BATCH_ROWS = 100_000
+
+# Compact dtypes for every column the processed datasets can contain
+SCHEMA = {
+    "Id": "int32",
+    "Store": "int16",
+    "DayOfWeek": "int8",
+    "Sales": "int32",
+    "Promo": "int8",
+    "StateHoliday": "int8",
+    "SchoolHoliday": "int8",
+    "StoreType": "int8",
+    "Assortment": "int8",
+    "CompetitionDistance": "float32",
+    "Year": "int16",
+    "Month": "int8",
+    "WeekOfYear": "int8",
+    "Day": "int8",
+    "IsWeekend": "int8",
+    "IsPromoMonth": "int8",
+    "Promo2Active": "int8",
+    "CompetitionOpenTimeMonths": "float32",
+}
+
+def dataset_key(prefix, name, fmt=None):
+    return prefix + name + EXTENSIONS[fmt or DATA_FORMAT]
+
+def apply_schema(df):
+    return df.astype({c: t for c, t in SCHEMA.items() if c in df.columns})
+
+def iter_batches(df, rows=WRITE_BATCH_ROWS):
+    for start in range(0, max(len(df), 1), rows):
+        yield df.iloc[start:start + rows]
+
+# ---------------- WRITE ---------------- #
+class DatasetWriter:
+    """Append DataFrame batches to one dataset object; close() finishes the upload."""
+
+    def __init__(self, storage, prefix, name, fmt=None):
+        self.fmt = fmt or DATA_FORMAT
+        self.key = dataset_key(prefix, name, self.fmt)
+        self.stream = storage.open_writer(self.key)
+        self.parquet = None
+        self.header = True
+
+    def append(self, df):
+        if self.fmt == "csv":
+            self.stream.write(df.to_csv(index=False, header=self.header).encode("utf-8"))
+            self.header = False
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(apply_schema(df), preserve_index=False)
+        if self.parquet is None:
+            self.parquet = pq.ParquetWriter(self.stream, table.schema, compression="snappy")
+        self.parquet.write_table(table)
+
+    def close(self):
+        if self.parquet is not None:
+            self.parquet.close()
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.stream.discard()  # a failed write never replaces the stored object
+        self.close()
+
+def write_dataset(storage, df, prefix, name, fmt=None):
+    with DatasetWriter(storage, prefix, name, fmt) as writer:
+        for batch in iter_batches(df):
+            writer.append(batch)
+    return writer.key
+
+# ---------------- READ ---------------- #
+def iter_dataset(storage, prefix, name, columns=None, fmt=None, chunksize=WRITE_BATCH_ROWS):
+    """Yield the dataset as DataFrame chunks with compact dtypes."""
+    fmt = fmt or DATA_FORMAT
+    key = dataset_key(prefix, name, fmt)
+    if fmt == "csv":
+        dtype = {c: t for c, t in SCHEMA.items() if columns is None or c in columns}
+        body = storage.open(key)
+        try:
+            for chunk in pd.read_csv(body, usecols=columns, dtype=dtype, chunksize=chunksize):
+                yield chunk[list(columns)] if columns is not None else chunk
+        finally:
+            body.close()
+    else:
+        import pyarrow.parquet as pq
+        source = storage.open_seekable(key)
+        try:
+            parquet = pq.ParquetFile(source)
+            for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+                yield apply_schema(batch.to_pandas())
+        finally:
+            source.close()
+
+def read_dataset(storage, prefix, name, columns=None, fmt=None):
+    """Load a processed dataset with compact dtypes, optionally only `columns`."""
+    fmt = fmt or DATA_FORMAT
+    key = dataset_key(prefix, name, fmt)
+    if fmt == "csv":
+        dtype = {c: t for c, t in SCHEMA.items() if columns is None or c in columns}
+        body = storage.open(key)
+        try:
+            df = pd.read_csv(body, usecols=columns, dtype=dtype)
+        finally:
+            body.close()
+    else:
+        import pyarrow.parquet as pq
+        source = storage.open_seekable(key)
+        try:
+            df = pq.read_table(source, columns=columns).to_pandas()
+        finally:
+            source.close()
+    if columns is not None:
+        df = df[list(columns)]
+    return apply_schema(df)
+
+# ---------------- DATE PARTITIONS ---------------- #
+# prefix + "partitions/manifest.json" describes the base datasets (the last full preprocess)
+# and the partitions appended since, each covering the days after the previous watermark:
+#   {"base": {"rows", "first", "last"}, "partitions": [{"name", "rows", "first", "last"}]}
+PARTITIONS_DIR = "partitions/"
+MANIFEST_FILE = "manifest.json"
+
+def partition_prefix(prefix, name):
+    return prefix + PARTITIONS_DIR + name + "/"
+
+def load_manifest(storage, prefix):
+    key = prefix + PARTITIONS_DIR + MANIFEST_FILE
+    return json.loads(storage.read_bytes(key)) if storage.exists(key) else None
+
+def save_manifest(storage, prefix, manifest):
+    storage.put_bytes(prefix + PARTITIONS_DIR + MANIFEST_FILE, json.dumps(manifest, indent=2))
+
+def watermark(manifest):
+    """Last date (YYYY-MM-DD) already in the processed datasets."""
+    return max([manifest["base"]["last"]] + [p["last"] for p in manifest["partitions"]])
+
+def drop_partitions(storage, prefix):
+    """Delete every partition object but the manifest."""
+    for key, _ in list(storage.list_keys(prefix + PARTITIONS_DIR)):
+        if not key.endswith("/" + MANIFEST_FILE):
+            storage.delete(key)
+
+def compact_partitions(storage, prefix, manifest, names=("X_train", "y_train"), fmt=None):
+    """Fold the partitions into the base datasets, streaming chunk by chunk; returns the new manifest.
+
+    Each base dataset is rewritten under its own key; the storage writers only replace the
+    object on close, so the old one can be read while the new one is written.
+    """
+    parts = manifest["partitions"]
+    for name in names:
+        with DatasetWriter(storage, prefix, name, fmt) as writer:
+            for source in [prefix] + [partition_prefix(prefix, p["name"]) for p in parts]:
+                for chunk in iter_dataset(storage, source, name, fmt=fmt):
+                    writer.append(chunk)
+    base = dict(manifest["base"], rows=manifest["base"]["rows"] + sum(p["rows"] for p in parts),
+                last=watermark(manifest))
+    manifest = dict(manifest, base=base, partitions=[])
+    save_manifest(storage, prefix, manifest)  # before the deletes: never lists a missing partition
+    drop_partitions(storage, prefix)
+    return manifest
+
+# ---------------- TRAINING MATRIX ---------------- #
+def split_rows(n_rows, test_size=None, train_size=None, random_state=None):
+    """(train, test) row indices; the same rows, in the same order, train_test_split would pick."""
+    from sklearn.model_selection import ShuffleSplit
+    splitter = ShuffleSplit(n_splits=1, test_size=test_size, train_size=train_size, random_state=random_state)
+    return next(splitter.split(np.empty((n_rows, 0))))
+
+def read_matrix(storage, prefix, name, rows, columns=None, fmt=None):
+    """(float32 matrix, column names) holding dataset rows `rows` (positions), in that order.
+
+    The dataset is streamed in chunks and scattered straight into the preallocated matrix,
+    so the full DataFrame is never held; rows not listed are skipped.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    target = np.full(int(rows.max()) + 1 if len(rows) else 0, -1, dtype=np.int64)
+    target[rows] = np.arange(len(rows))
+    X, names, start = None, None, 0
+    for chunk in iter_dataset(storage, prefix, name, columns=columns, fmt=fmt):
+        if X is None:
+            names = list(chunk.columns)
+            X = np.empty((len(rows), len(names)), dtype=np.float32)
+        dest = target[start:start + len(chunk)]
+        keep = dest >= 0
+        for j, col in enumerate(names):
+            X[dest[keep], j] = chunk[col].to_numpy()[:len(dest)][keep]
+        start += len(chunk)
+    if start < len(target):
+        raise ValueError(f"{name} has {start} rows, row {len(target) - 1} was requested")
+    return X, names
@@ -0,0 +1,128 @@
+# scripts/feature_selection.py
+# Feature selection as a cached stage of train.py. Each method yields one importance vector and
+# keeps the features at or above its median (SelectFromModel(threshold="median")); the selected
+# set is the union over methods. Results live in the stage cache under a key built from a
+# fingerprint of the training matrix and targets, this file and the configuration, so
+# re-running on unchanged data skips the stage entirely.
+#
+#   reuse        fit RandomForest / XGBoost exactly as the main loop would on the full training
+#                rows; the fitted models stand in for RandomForest_all / XGBoost_all
+#   hist         one histogram XGBoost (tree_method="hist") on a row subsample
+#   permutation  permutation importance of that hist model on a validation subsample
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import joblib
+from stage_cache import stage_key
+
+MODES = ["reuse", "hist", "permutation"]
+SAMPLE_ROWS = 200_000
+PERMUTATION_ROWS = 50_000
+LABELS = {"RandomForest": "Random Forest"}
+
+def fingerprint(X, y, columns):
+    """Hex digest of the matrix contents, targets and column names."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"columns": list(columns), "shape": list(X.shape), "dtype": str(X.dtype)}).encode())
+    for start in range(0, len(X), 1 << 16):
+        h.update(np.ascontiguousarray(X[start:start + (1 << 16)]).tobytes())
+    h.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+def selection_key(data_fingerprint, config):
+    """Stage-cache key; library versions count as parameters since the pickles depend on them."""
+    import sklearn
+    import xgboost
+    params = dict(config, sklearn=sklearn.__version__, xgboost=xgboost.__version__)
+    return stage_key("feature-selection", {"training_matrix": data_fingerprint}, [__file__], params)
+
+def median_support(importances):
+    return importances >= np.median(importances)
+
+class Selection:
+    """Importances per method, what each selected, and any main-loop models the stage fitted."""
+
+    def __init__(self, columns, importances, models=None, metrics=None):
+        self.columns = list(columns)
+        self.importances = {k: np.asarray(v, dtype=np.float64) for k, v in importances.items()}
+        self.models = models or {}     # main-loop name -> pickle path (reuse mode)
+        self.metrics = metrics or {}   # main-loop name -> validation metrics of that model
+
+    @property
+    def selected(self):
+        return {method: [c for c, keep in zip(self.columns, median_support(imp)) if keep]
+                for method, imp in self.importances.items()}
+
+    @property
+    def combined(self):
+        return sorted(set().union(*self.selected.values()), key=self.columns.index)
+
+    @property
+    def common(self):
+        return sorted(set.intersection(*(set(s) for s in self.selected.values())), key=self.columns.index)
+
+    def report(self):
+        sections = [(f"Features selected by {method}", cols) for method, cols in self.selected.items()]
+        sections += [("Combined (Union) Features", self.combined), ("Common (Intersection) Features", self.common)]
+        return "\n".join(f"{title}:\n" + "\n".join(cols) + "\n" for title, cols in sections)
+
+# ---------------- METHODS ---------------- #
+def hist_model(X, y, n_jobs, seed=42):
+    from xgboost import XGBRegressor
+    rows = np.random.RandomState(seed).permutation(len(X))[:SAMPLE_ROWS]
+    rows.sort()  # sequential reads from the shared buffer
+    model = XGBRegressor(n_estimators=100, tree_method="hist", random_state=seed, verbosity=0, n_jobs=n_jobs)
+    return model.fit(X[rows], y[rows])
+
+def run_selection(mode, X_train, y_train, X_val, y_val, columns, models=None, model_dir=None,
+                  evaluate=None, n_jobs=1):
+    """Fit the mode's estimators and return a Selection.
+
+    `models` (reuse mode) maps main-loop names ("RandomForest", "XGBoost") to unfitted estimators
+    configured exactly as the main loop would. Each is fitted on all training rows, scored with
+    evaluate(y_val, preds) and pickled to model_dir as <name>_all.pkl, so the main loop can
+    skip those fits.
+    """
+    if mode == "reuse":
+        importances, paths, metrics = {}, {}, {}
+        for name, model in models.items():
+            model.fit(X_train, y_train)
+            importances[LABELS.get(name, name)] = model.feature_importances_
+            metrics[name] = evaluate(y_val, model.predict(X_val))
+            paths[name] = os.path.join(model_dir, f"{name}_all.pkl")
+            joblib.dump(model, paths[name])
+        return Selection(columns, importances, models=paths, metrics=metrics)
+    model = hist_model(X_train, y_train, n_jobs)
+    if mode == "hist":
+        return Selection(columns, {"XGBoost (hist)": model.feature_importances_})
+    if mode == "permutation":
+        from sklearn.inspection import permutation_importance
+        rows = slice(0, min(len(X_val), PERMUTATION_ROWS))
+        result = permutation_importance(model, X_val[rows], y_val[rows], n_repeats=3, random_state=42, n_jobs=1)
+        return Selection(columns, {"Permutation": result.importances_mean})
+    raise ValueError(f"Unknown selection mode: {mode} (expected one of {MODES})")
+
+# ---------------- CACHE ---------------- #
+def load_selection(cache, key, model_dir):
+    """Cached Selection for `key` (models copied into model_dir), or None on a miss."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(cache.fetch(entry, "selection.json", os.path.join(workdir, "selection.json"))) as f:
+            saved = json.load(f)
+    models = {name: cache.fetch(entry, f"{name}_all.pkl", os.path.join(model_dir, f"{name}_all.pkl"))
+              for name in saved["models"]}
+    return Selection(saved["columns"], saved["importances"], models=models, metrics=saved["metrics"])
+
+def save_selection(cache, key, selection):
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "selection.json")
+        with open(path, "w") as f:
+            json.dump({"columns": selection.columns,
+                       "importances": {k: v.tolist() for k, v in selection.importances.items()},
+                       "models": sorted(selection.models), "metrics": selection.metrics}, f, indent=2)
+        files = {f"{name}_all.pkl": p for name, p in selection.models.items()}
+        cache.put(key, "feature-selection", dict(files, **{"selection.json": path}))
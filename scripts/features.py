@@ -0,0 +1,208 @@
+# scripts/features.py
+# The feature transform shared by the processing job (DataFrames of daily rows) and the
+# endpoint (raw {Store, Date, Promo, StateHoliday, SchoolHoliday} records). Both go through
+# the same vectorized date and store-derived computations, so a record scored online gets
+# exactly the features preprocess.py would have written for it.
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from store_features import STORE_OUTPUT_COLUMNS, store_positions, gather, load_store_features
+
+# Derived columns, in the order they appear after the store columns
+FEATURE_COLUMNS = [
+    "Year", "Month", "WeekOfYear", "Day", "IsWeekend",
+    "IsPromoMonth", "Promo2Active", "CompetitionOpenTimeMonths",
+]
+ENCODED_COLUMNS = ["StateHoliday", "Assortment", "StoreType", "Store"]
+DAILY_COLUMNS = ["Store", "DayOfWeek", "Promo", "StateHoliday", "SchoolHoliday"]
+
+# Column order of X_train / X_test (minus Id), i.e. what the models are fitted on
+MODEL_COLUMNS = DAILY_COLUMNS + STORE_OUTPUT_COLUMNS + FEATURE_COLUMNS
+
+# Files packaged next to the model so the endpoint can featurize raw records
+TRANSFORM_ARTIFACTS = ["label_encoders.pkl", "store_features.pkl"]
+COLUMNS_FILE = "feature_columns.json"
+
+# ---------------- DATE FEATURES ---------------- #
+def date_parts(dates):
+    """datetime64 array -> Year, Month, WeekOfYear (ISO), Day, DayOfWeek (Mon=0), IsWeekend."""
+    days = np.asarray(dates, dtype="datetime64[D]")
+    day_number = days.astype(np.int64)
+    months = days.astype("datetime64[M]")
+    day_of_week = (day_number + 3) % 7  # 1970-01-01 was a Thursday
+    # ISO week: the week's Thursday decides the ISO year; count weeks from that year's start
+    thursday = (day_number - day_of_week + 3).astype("datetime64[D]")
+    week = (thursday - thursday.astype("datetime64[Y]")).astype(np.int64) // 7 + 1
+    return {
+        "Year": days.astype("datetime64[Y]").astype(np.int64) + 1970,
+        "Month": months.astype(np.int64) % 12 + 1,
+        "WeekOfYear": week,
+        "Day": (days - months).astype(np.int64) + 1,
+        "DayOfWeek": day_of_week,
+        "IsWeekend": (day_of_week >= 5).astype(np.int64),
+    }
+
+def Date_column(df):
+    df["Date"] = pd.to_datetime(df["Date"])
+    for name, values in date_parts(df["Date"].to_numpy()).items():
+        df[name] = values
+    return df
+
+# ---------------- PROMO2 & COMPETITION ---------------- #
+def store_date_features(year, month, promo_mask, promo2, since_year, since_month):
+    """IsPromoMonth, Promo2Active, CompetitionOpenTimeMonths from per-row store attributes."""
+    is_promo_month = ((promo_mask >> (month - 1)) & 1).astype(np.int64)
+    promo2_active = ((promo2 == 1) & (is_promo_month == 1)).astype(np.int64)
+    # Stores without a known opening date count as opening on the row's own date (0 months)
+    known = (since_year > 0) & (since_month > 0)
+    open_months = np.where(known, (year - since_year) * 12 + (month - since_month), 0)
+    return {
+        "IsPromoMonth": is_promo_month,
+        "Promo2Active": promo2_active,
+        "CompetitionOpenTimeMonths": np.log1p(np.maximum(open_months, 0)),
+    }
+
+# ---------------- OFFLINE: DATAFRAMES OF DAILY ROWS ---------------- #
+def select_rows(df, store_table):
+    """Open days of stores with a known CompetitionDistance, plus their store-table positions.
+
+    Same rows the old left merge + CompetitionDistance.notna() filter kept.
+    """
+    df = df[df["Open"] == 1].drop(columns=["Open"])
+    pos = store_positions(store_table, df["Store"])
+    keep = pos >= 0
+    keep[keep] = store_table["CompetitionDistance"].notna().to_numpy()[pos[keep]]
+    return df[keep], pos[keep]
+
+def build_features(df, store_table):
+    """Daily rows -> model features, gathering store-constant values by Store position."""
+    df, pos = select_rows(df, store_table)
+    df = df.drop(columns=["Customers"], errors="ignore")
+    daily_cols = [c for c in df.columns if c != "Date"]
+
+    df = Date_column(df)
+    for col in STORE_OUTPUT_COLUMNS:
+        df[col] = gather(store_table, col, pos)
+
+    derived = store_date_features(
+        df["Year"].to_numpy(), df["Month"].to_numpy(),
+        gather(store_table, "PromoMonthMask", pos), gather(store_table, "Promo2", pos),
+        gather(store_table, "CompetitionOpenSinceYear", pos), gather(store_table, "CompetitionOpenSinceMonth", pos),
+    )
+    for name, values in derived.items():
+        df[name] = values
+
+    return df[daily_cols + STORE_OUTPUT_COLUMNS + FEATURE_COLUMNS]
+
+def encode(df, label_encoders):
+    df["StateHoliday"] = df["StateHoliday"].astype(str)
+    for col in ENCODED_COLUMNS:
+        df[col] = label_encoders[col].transform(df[col])
+    return df
+
+# ---------------- ONLINE: RAW RECORDS ---------------- #
+class RecordTransform:
+    """Raw records -> float32 model matrix, with every store lookup precomputed.
+
+    Built once in model_fn from the store table and label encoders saved by preprocess.py.
+    Per store id it keeps the encoded Store/StoreType/Assortment codes and the raw values the
+    date-dependent features need, so a batch costs a few array gathers.
+    """
+
+    def __init__(self, store_table, label_encoders, columns=None):
+        self.columns = list(columns) if columns is not None else MODEL_COLUMNS
+        unknown = set(self.columns) - set(MODEL_COLUMNS)
+        if unknown:
+            raise ValueError(f"Model columns not produced by the transform: {sorted(unknown)}")
+
+        ids = store_table["Store"].to_numpy().astype(np.int64)
+        known_store = np.isin(ids, label_encoders["Store"].classes_)
+        usable = known_store & store_table["CompetitionDistance"].notna().to_numpy()
+        pos = np.flatnonzero(usable)
+
+        size = int(ids.max()) + 1
+        self.position = np.full(size, -1, dtype=np.int64)
+        self.position[ids[pos]] = np.arange(len(pos))
+        self.store_code = label_encoders["Store"].transform(ids[pos])
+        self.store_type_code = label_encoders["StoreType"].transform(gather(store_table, "StoreType", pos))
+        self.assortment_code = label_encoders["Assortment"].transform(gather(store_table, "Assortment", pos))
+        self.competition_distance = gather(store_table, "CompetitionDistance", pos).astype(np.float64)
+        self.promo_mask = gather(store_table, "PromoMonthMask", pos).astype(np.int64)
+        self.promo2 = gather(store_table, "Promo2", pos).astype(np.int64)
+        self.since_year = gather(store_table, "CompetitionOpenSinceYear", pos).astype(np.int64)
+        self.since_month = gather(store_table, "CompetitionOpenSinceMonth", pos).astype(np.int64)
+        self.holiday_code = {c: i for i, c in enumerate(label_encoders["StateHoliday"].classes_)}
+
+    def _positions(self, stores):
+        inside = (stores >= 0) & (stores < len(self.position))
+        pos = np.full(len(stores), -1, dtype=np.int64)
+        pos[inside] = self.position[stores[inside]]
+        if (pos < 0).any():
+            raise ValueError(f"Unknown stores (or no CompetitionDistance): {sorted(set(stores[pos < 0].tolist()))}")
+        return pos
+
+    def transform_columns(self, store, date, promo, state_holiday, school_holiday):
+        """Column arrays of raw values -> (rows, len(columns)) float32 matrix."""
+        store = np.asarray(store, dtype=np.int64)
+        pos = self._positions(store)
+        try:
+            holiday = np.array([self.holiday_code[str(h)] for h in state_holiday], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Unknown StateHoliday value: {e.args[0]!r}")
+        parts = date_parts(np.asarray(date, dtype="datetime64[D]"))
+        features = {
+            "Store": self.store_code[pos],
+            "DayOfWeek": parts["DayOfWeek"],
+            "Promo": np.asarray(promo),
+            "StateHoliday": holiday,
+            "SchoolHoliday": np.asarray(school_holiday),
+            "StoreType": self.store_type_code[pos],
+            "Assortment": self.assortment_code[pos],
+            "CompetitionDistance": self.competition_distance[pos],
+        }
+        features.update(parts)
+        features.update(store_date_features(
+            parts["Year"], parts["Month"], self.promo_mask[pos], self.promo2[pos],
+            self.since_year[pos], self.since_month[pos],
+        ))
+        out = np.empty((len(store), len(self.columns)), dtype=np.float32)
+        for i, name in enumerate(self.columns):
+            out[:, i] = features[name]
+        return out
+
+    def transform_records(self, records):
+        """A record dict or a list of them -> model matrix. Missing fields raise KeyError."""
+        return self.transform_columns(*record_columns(records))
+
+def record_columns(records):
+    """A record dict or a list of them -> (Store, Date, Promo, StateHoliday, SchoolHoliday) arrays."""
+    if isinstance(records, dict):
+        records = [records]
+    return (
+        np.array([r["Store"] for r in records], dtype=np.int64),
+        np.array([r["Date"] for r in records], dtype="datetime64[D]"),
+        np.array([r["Promo"] for r in records], dtype=np.int64),
+        np.array([str(r["StateHoliday"]) for r in records], dtype=object),
+        np.array([r["SchoolHoliday"] for r in records], dtype=np.int64),
+    )
+
+# ---------------- MODEL ARTIFACT ---------------- #
+def package_transform(storage, art_prefix, model_dir, columns):
+    """Copy the preprocessing artifacts into model_dir and record the model's column order."""
+    os.makedirs(model_dir, exist_ok=True)
+    for name in TRANSFORM_ARTIFACTS:
+        storage.download_file(art_prefix + name, os.path.join(model_dir, name))
+    with open(os.path.join(model_dir, COLUMNS_FILE), "w") as f:
+        json.dump(list(columns), f)
+
+def load_transform(model_dir):
+    """RecordTransform for a packaged model, or None when the artifacts are not there."""
+    paths = [os.path.join(model_dir, name) for name in TRANSFORM_ARTIFACTS + [COLUMNS_FILE]]
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    encoders_path, table_path, columns_path = paths
+    with open(columns_path) as f:
+        columns = json.load(f)
+    return RecordTransform(load_store_features(table_path), joblib.load(encoders_path), columns)
@@ -0,0 +1,39 @@
+# scripts/flat_kernels.py
+# numba kernels for flat_model.FlatForest's numba engine. Imported only when that engine
+# runs, so numba stays an optional dependency. Each kernel compiles on its first call and
+# the build is cached on disk (cache=True), so later processes load it instead of compiling.
+# The serial and parallel entry points are separate functions because numba's cache holds
+# one build per function.
+from numba import njit, prange
+from flat_model import FEATURE, LEFT, RIGHT, THRESHOLD
+
+@njit(nogil=True, cache=True)
+def _block_sums(X, lo, hi, roots, nodes, thresholds, missing_left, value, out):
+    """out[lo:hi] = sum of the leaf values each row reaches in every tree (leaves are self-loops).
+
+    The block goes through the trees one tree at a time, so the tree's hot nodes stay in cache.
+    """
+    for i in range(lo, hi):
+        out[i] = 0.0
+    for t in range(roots.shape[0]):
+        for i in range(lo, hi):
+            node = roots[t]
+            while nodes[node, LEFT] != node:
+                x = X[i, nodes[node, FEATURE]]
+                if x <= thresholds[node, THRESHOLD] or (x != x and missing_left[node] == 1):
+                    node = nodes[node, LEFT]
+                else:
+                    node = nodes[node, RIGHT]
+            out[i] += value[node]
+
+@njit(nogil=True, cache=True)
+def leaf_sums(X, roots, nodes, thresholds, missing_left, value, out):
+    _block_sums(X, 0, X.shape[0], roots, nodes, thresholds, missing_left, value, out)
+
+@njit(parallel=True, nogil=True, cache=True)
+def leaf_sums_parallel(X, roots, nodes, thresholds, missing_left, value, out, block_rows):
+    """leaf_sums with one block of block_rows rows per thread, the fastest split."""
+    n_rows = X.shape[0]
+    for block in prange((n_rows + block_rows - 1) // block_rows):
+        lo = block * block_rows
+        _block_sums(X, lo, min(n_rows, lo + block_rows), roots, nodes, thresholds, missing_left, value, out)
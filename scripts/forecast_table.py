@@ -0,0 +1,143 @@
+# scripts/forecast_table.py
+# Pre-scored forecast grid for the serving container. A raw record is fully determined by
+# (Store, Date, Promo, StateHoliday, SchoolHoliday), and over a forecast horizon that space
+# is small: ~856 stores x 48 days x 2 x 4 x 2 is well under a million rows. The whole grid is
+# scored once into a dense float64 array (a few MB, memory-mapped at serve time, same digits
+# the model returns), so an on-grid record is answered by index arithmetic and only
+# off-grid records reach the model.
+#
+#   python scripts/forecast_table.py --model_dir /opt/ml/model --test_csv csv_files/test.csv
+#   python scripts/forecast_table.py --model_dir model/ --start 2015-08-01 --days 48
+import argparse
+import json
+import os
+import threading
+import numpy as np
+
+FORECAST_TABLE_DIR = "forecast_table"
+FORMAT_VERSION = 1
+PREDICT_ROWS = 100_000
+
+class ForecastTable:
+    """values[store_slot, day, promo, holiday, school_holiday] for one model."""
+
+    def __init__(self, values, store_slot, meta):
+        self.values = values
+        self.store_slot = store_slot
+        self.meta = meta
+        self.start = np.datetime64(meta["start"], "D")
+        self.n_days = meta["n_days"]
+        self.holiday_code = {h: i for i, h in enumerate(meta["holidays"])}
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forecast table version {meta['version']}")
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode)
+        store_slot = np.load(os.path.join(path, "store_slot.npy"))
+        return cls(values, store_slot, meta)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "values.npy"), np.ascontiguousarray(self.values, dtype=np.float64))
+        np.save(os.path.join(path, "store_slot.npy"), self.store_slot)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+        return path
+
+    def lookup_columns(self, store, date, promo, state_holiday, school_holiday):
+        """(values, hit): table predictions where hit is True; off-grid rows are left as NaN."""
+        store = np.asarray(store, dtype=np.int64)
+        day = (np.asarray(date, dtype="datetime64[D]") - self.start).astype(np.int64)
+        promo = np.asarray(promo, dtype=np.int64)
+        school = np.asarray(school_holiday, dtype=np.int64)
+        holiday = np.array([self.holiday_code.get(str(h), -1) for h in state_holiday], dtype=np.int64)
+
+        slot = np.full(len(store), -1, dtype=np.int64)
+        inside = (store >= 0) & (store < len(self.store_slot))
+        slot[inside] = self.store_slot[store[inside]]
+        hit = ((slot >= 0) & (day >= 0) & (day < self.n_days) & (holiday >= 0)
+               & ((promo == 0) | (promo == 1)) & ((school == 0) | (school == 1)))
+
+        values = np.full(len(store), np.nan)
+        values[hit] = self.values[slot[hit], day[hit], promo[hit], holiday[hit], school[hit]]
+        n_hits = int(hit.sum())
+        with self.lock:
+            self.hits += n_hits
+            self.misses += len(store) - n_hits
+        return values, hit
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "start": self.meta["start"], "n_days": self.n_days, "rows": self.meta["rows"]}
+
+def build_forecast_table(predict, transform, start, n_days, stores=None, model_digest=None):
+    """Score every (store, day, promo, holiday, school holiday) of the horizon with `predict`.
+
+    `transform` is the model's features.RecordTransform; `stores` defaults to every store
+    it can featurize. `model_digest` (flat_model.source_digest of the model directory) lets
+    inference.py skip the table once the model it scored has been replaced.
+    """
+    if stores is None:
+        stores = np.flatnonzero(transform.position >= 0)
+    stores = np.asarray(sorted(set(int(s) for s in stores)), dtype=np.int64)
+    holidays = [str(h) for h in transform.holiday_code]
+    shape = (len(stores), n_days, 2, len(holidays), 2)
+
+    s, d, p, h, sh = (axis.ravel() for axis in np.indices(shape))
+    dates = np.datetime64(start, "D") + d
+    values = np.empty(len(s))
+    for lo in range(0, len(s), PREDICT_ROWS):
+        part = slice(lo, lo + PREDICT_ROWS)
+        X = transform.transform_columns(stores[s[part]], dates[part], p[part],
+                                        np.asarray(holidays, dtype=object)[h[part]], sh[part])
+        values[part] = predict(X)
+
+    store_slot = np.full(int(stores.max()) + 1, -1, dtype=np.int64)
+    store_slot[stores] = np.arange(len(stores))
+    meta = {"version": FORMAT_VERSION, "start": str(np.datetime64(start, "D")), "n_days": int(n_days),
+            "holidays": holidays, "n_stores": len(stores), "rows": int(values.size), "model_digest": model_digest}
+    return ForecastTable(values.reshape(shape), store_slot, meta)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_dir", default=os.environ.get("SM_MODEL_DIR", "/opt/ml/model"))
+    parser.add_argument("--test_csv", help="take the horizon and stores from a test.csv-like file")
+    parser.add_argument("--start", help="first day of the horizon (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=48)
+    args = parser.parse_args()
+
+    import inference  # model and record transform exactly as the endpoint loads them
+    from flat_model import source_digest
+    model = inference.model_fn(args.model_dir)
+    if inference.record_transform is None:
+        raise SystemExit("❌ The model artifact has no record transform (label_encoders.pkl / store_features.pkl)")
+
+    stores = None
+    if args.test_csv:
+        import pandas as pd
+        test = pd.read_csv(args.test_csv, usecols=["Store", "Date"], parse_dates=["Date"])
+        start = test["Date"].min().to_datetime64().astype("datetime64[D]")
+        n_days = int((test["Date"].max() - test["Date"].min()).days) + 1
+        known = inference.record_transform.position
+        stores = [s for s in test["Store"].unique() if s < len(known) and known[s] >= 0]
+    elif args.start:
+        start, n_days = np.datetime64(args.start, "D"), args.days
+    else:
+        parser.error("pass --test_csv or --start")
+
+    print(f"🔹 Scoring {n_days} days from {start} for {len(stores) if stores is not None else 'all'} stores")
+    table = build_forecast_table(model.predict, inference.record_transform, start, n_days, stores,
+                                 model_digest=source_digest(args.model_dir))
+    path = table.save(os.path.join(args.model_dir, FORECAST_TABLE_DIR))
+    print(f"✅ Forecast table with {table.meta['rows']:,d} rows written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,309 @@
-import os, joblib, boto3
+from instrument import profiler, PROFILE_FILE  # first: its clock times the imports below
+import os, json, joblib, copy
 import pandas as pd
 import numpy as np
 import argparse
-from sklearn.ensemble import RandomForestRegressor
+from joblib import Parallel, delayed
 from sklearn.metrics import mean_squared_error
-from sklearn.model_selection import train_test_split
+from storage import get_storage
+from dataio import read_dataset, read_matrix, split_rows
+from flat_model import export_model
+from features import package_transform
+from binning import QuantileBinner, binned_pipeline, hist_gbm
+
+profiler.mark("import")
 
 # ---- S3 Config ----
 BUCKET = "rossmann-sales-bucket"
-s3 = boto3.client("s3")
-
-def load_csv_from_s3(key):
-    obj = s3.get_object(Bucket=BUCKET, Key=key)
-    return pd.read_csv(obj["Body"])
-
-# ✅ Load input data
-X = load_csv_from_s3("rossmann-processed/X_train.csv")
-y = load_csv_from_s3("rossmann-processed/y_train.csv").values.ravel()
-
-# ---- SAMPLE 50% of the dataset ------
-X, _, y, _ = train_test_split(X, y, test_size=0.5, random_state=42, stratify=None)
-print(f"🔹 Using {len(X)} samples (~50% of data) for training to keep model lightweight")
-
-# ---- Parse SageMaker hyperparameters ----
-parser = argparse.ArgumentParser()
-parser.add_argument('--n_estimators', type=int, default=100)
-parser.add_argument('--min_samples_split', type=int, default=2)
-parser.add_argument('--min_samples_leaf', type=int, default=1)
-parser.add_argument('--max_features', type=str, default='auto')
-args = parser.parse_args()
-
-# ---- Train/Test Split ----
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# ---- Train Model ----
-rf = RandomForestRegressor(
-    n_estimators=args.n_estimators,
-    min_samples_split=args.min_samples_split,
-    min_samples_leaf=args.min_samples_leaf,
-    max_features=args.max_features,
-    random_state=42
-)
-
-rf.fit(X_train, y_train)
-preds = rf.predict(X_test)
-rmse = np.sqrt(mean_squared_error(y_test, preds))
-
-# ✅ Required for SageMaker HPO: print only this line
-print(f"validation:rmse {rmse:.4f}")
-
-# ---- Save model to expected path ----
-model_path = "/opt/ml/model"
-os.makedirs(model_path, exist_ok=True)
-joblib.dump(rf, os.path.join(model_path, "model.joblib"), compress=3)  # 🔹 add compression
+PROC_PREFIX = "rossmann-processed/"
+FEATURES_PREFIX = "rossmann-selected-features/"
+ART_PREFIX = "rossmann-artifacts/"
+storage = get_storage(BUCKET)
+
+# ---- Search space (same ranges as cicd/hpt_runner_job.py) ----
+SEARCH_SPACE = {
+    "n_estimators": (100, 200),
+    "min_samples_split": (2, 5),
+    "min_samples_leaf": (1, 2),
+    "max_features": ["sqrt", "log2", "auto"],
+}
+# --model hgb: HistGradientBoosting on bin codes computed once for every trial
+HGB_SEARCH_SPACE = {
+    "max_iter": (100, 300),
+    "learning_rate": [0.05, 0.1, 0.2],
+    "max_leaf_nodes": [15, 31, 63, 127],
+    "min_samples_leaf": (10, 50),
+    "l2_regularization": [0.0, 0.1, 1.0],
+}
+
+def parse_args(argv=None):
+    # ---- Parse SageMaker hyperparameters ----
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default='rf', choices=['rf', 'hgb'])
+    parser.add_argument('--n_estimators', type=int, default=100)
+    parser.add_argument('--min_samples_split', type=int, default=2)
+    parser.add_argument('--min_samples_leaf', type=int, default=None, help="default 1 for rf, 20 for hgb")
+    parser.add_argument('--max_features', type=str, default='auto')
+    parser.add_argument('--max_iter', type=int, default=100)
+    parser.add_argument('--learning_rate', type=float, default=0.1)
+    parser.add_argument('--max_leaf_nodes', type=int, default=31)
+    parser.add_argument('--l2_regularization', type=float, default=0.0)
+    parser.add_argument('--feature_set', type=str, default='all', choices=['all', 'selected'])
+    # ---- Local search: evaluate the whole space in this process instead of one trial ----
+    parser.add_argument('--search', type=str, default='none', choices=['none', 'halving', 'trees'])
+    parser.add_argument('--tree_checkpoints', type=str, default='100,125,150,175,200',
+                        help="--search trees: grow one forest and score it at each tree count")
+    parser.add_argument('--n_configs', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--min_fraction', type=float, default=1 / 9)
+    parser.add_argument('--n_jobs', type=int, default=-1)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args(argv)
+
+def load_data(feature_set="all"):
+    # ✅ Load input data (only the train.py-selected columns when --feature_set selected)
+    columns = None
+    if feature_set == "selected":
+        columns = json.loads(storage.read_bytes(FEATURES_PREFIX + "selected_features.json"))
+    y = read_dataset(storage, PROC_PREFIX, "y_train", columns=["Sales"])["Sales"].to_numpy(np.float64)
+
+    # ---- SAMPLE 50% of the dataset, then the 80/20 split (same rows as two train_test_splits) ----
+    sample, _ = split_rows(len(y), test_size=0.5, random_state=42)
+    print(f"🔹 Using {len(sample)} samples (~50% of data) for training to keep model lightweight")
+    train_rows, val_rows = split_rows(len(sample), test_size=0.2, random_state=42)
+    order = sample[np.concatenate([train_rows, val_rows])]
+
+    # ---- One float32 matrix, train rows then validation rows; both sets are views of it ----
+    X, columns = read_matrix(storage, PROC_PREFIX, "X_train", columns=columns, rows=order)
+    y = y[order]
+    n_train = len(train_rows)
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:], columns
+
+def make_forest(params, n_jobs=None):
+    from sklearn.ensemble import RandomForestRegressor
+    # "auto" meant all features for regressors; newer scikit-learn only accepts 1.0
+    max_features = 1.0 if params["max_features"] == "auto" else params["max_features"]
+    return RandomForestRegressor(
+        n_estimators=params["n_estimators"],
+        min_samples_split=params["min_samples_split"],
+        min_samples_leaf=params["min_samples_leaf"] or 1,
+        max_features=max_features,
+        random_state=42,
+        n_jobs=n_jobs
+    )
+
+def rmse(y_true, preds):
+    return float(np.sqrt(mean_squared_error(y_true, preds)))
+
+# ---- Successive halving ----
+def sample_configs(n, seed=42, space=SEARCH_SPACE):
+    """n configs: (low, high) tuples are inclusive integer ranges, lists are choices."""
+    rng = np.random.RandomState(seed)
+    configs = []
+    for _ in range(n):
+        configs.append({
+            name: int(rng.randint(values[0], values[1] + 1)) if isinstance(values, tuple) else rng.choice(values).item()
+            for name, values in space.items()
+        })
+    return configs
+
+# ---- Warm-started forest growth ----
+def structure_key(params, budget="n_estimators"):
+    """Every hyperparameter except the tree budget, i.e. what fixes the trees themselves."""
+    return tuple(sorted((k, v) for k, v in params.items() if k != budget))
+
+class ForestCache:
+    """Partially grown forests keyed by structure_key, all fitted on the same data.
+
+    With an int random_state, warm_start adds exactly the trees a from-scratch fit of the
+    larger forest would have, so a 200-tree forest is the cached 100-tree forest plus 100
+    new trees, and its first 100 trees are the 100-tree forest. Validation predictions are
+    summed per tree as the forest grows, so each checkpoint's RMSE costs only the new trees.
+    """
+
+    def __init__(self, X_train, y_train, X_val, y_val, n_jobs=1):
+        self.X_train, self.y_train = X_train, y_train
+        self.X_val = np.ascontiguousarray(X_val, dtype=np.float32)
+        self.y_val = y_val
+        self.n_jobs = n_jobs
+        self.entries = {}  # key -> (forest, sum of per-tree validation predictions)
+
+    def _tree_sum(self, trees):
+        total = np.zeros(len(self.X_val))
+        for tree in trees:
+            total += tree.predict(self.X_val, check_input=False)
+        return total
+
+    def grow(self, params, n_trees):
+        """Return (rmse, forest) for params with n_trees trees, reusing or extending the cache."""
+        key = structure_key(params)
+        forest, pred_sum = self.entries.get(key, (None, None))
+        if forest is None:
+            forest = make_forest(dict(params, n_estimators=n_trees), n_jobs=self.n_jobs)
+            forest.set_params(warm_start=True)
+            forest.fit(self.X_train, self.y_train)
+            pred_sum = self._tree_sum(forest.estimators_)
+        elif len(forest.estimators_) < n_trees:
+            grown = len(forest.estimators_)
+            forest.set_params(n_estimators=n_trees)
+            forest.fit(self.X_train, self.y_train)
+            pred_sum = pred_sum + self._tree_sum(forest.estimators_[grown:])
+        self.entries[key] = (forest, pred_sum)
+
+        if len(forest.estimators_) == n_trees:
+            view_sum = pred_sum
+        else:
+            view_sum = self._tree_sum(forest.estimators_[:n_trees])
+        view = copy.copy(forest)
+        view.estimators_ = forest.estimators_[:n_trees]
+        view.set_params(n_estimators=n_trees, warm_start=False)
+        return rmse(self.y_val, view_sum / n_trees), view
+
+def evaluate_group(group, n_rows, X_train, y_train, X_val, y_val, keep_models):
+    """Evaluate configs sharing one structure with a single growth run, fewest trees first.
+
+    `group` is a list of (params, n_trees); returns [(rmse, model or None)] in the same order.
+    """
+    cache = ForestCache(X_train[:n_rows], y_train[:n_rows], X_val, y_val)
+    results = [None] * len(group)
+    for i in sorted(range(len(group)), key=lambda i: group[i][1]):
+        params, n_trees = group[i]
+        score, model = cache.grow(params, n_trees)
+        results[i] = (score, model if keep_models else None)
+    return results
+
+def make_hgb(params):
+    return hist_gbm(**{k: params[k] for k in HGB_SEARCH_SPACE if params.get(k) is not None})
+
+def evaluate_hgb_group(group, n_rows, X_train, y_train, X_val, y_val, keep_models):
+    """evaluate_group for HistGradientBoosting on bin codes: one warm-started booster per group.
+
+    Without early stopping or subsampling, adding iterations with warm_start gives the same
+    model as fitting the larger max_iter from scratch, so each config costs only its new trees.
+    """
+    results = [None] * len(group)
+    model = None
+    for i in sorted(range(len(group)), key=lambda i: group[i][1]):
+        params, n_iter = group[i]
+        if model is None:
+            model = make_hgb(dict(params, max_iter=n_iter)).set_params(warm_start=True)
+        model.set_params(max_iter=n_iter)
+        model.fit(X_train[:n_rows], y_train[:n_rows])
+        score = rmse(y_val, model.predict(X_val))
+        results[i] = (score, copy.deepcopy(model).set_params(warm_start=False) if keep_models else None)
+    return results
+
+# Per model family: group evaluator and the budget hyperparameter halving scales
+FAMILIES = {
+    "rf": (evaluate_group, "n_estimators"),
+    "hgb": (evaluate_hgb_group, "max_iter"),
+}
+
+def successive_halving(configs, X_train, y_train, X_val, y_val, eta=3, min_fraction=1 / 9, n_jobs=-1, family="rf"):
+    """Evaluate every config on a slice of rows and trees, keep the best 1/eta, grow the budget.
+
+    Rung r trains on min_fraction * eta**r of the (pre-shuffled) training rows and the same
+    fraction of each config's tree budget (n_estimators, or max_iter for hgb); the last rung is
+    the full budget, so its winner is the final model. Configs that differ only in the budget
+    share one growth run per rung.
+    Returns (best_params, best_rmse, best_model, history).
+    """
+    evaluate, budget = FAMILIES[family]
+    fraction = min_fraction
+    history = []
+    with Parallel(n_jobs=n_jobs) as parallel:
+        while True:
+            fraction = min(fraction, 1.0)
+            last = fraction >= 1.0 or len(configs) == 1
+            n_rows = len(X_train) if last else max(1, int(round(len(X_train) * fraction)))
+            groups = {}
+            for i, params in enumerate(configs):
+                n_trees = params[budget] if last else max(10, int(round(params[budget] * fraction)))
+                groups.setdefault(structure_key(params, budget), []).append((i, params, n_trees))
+            outputs = parallel(
+                delayed(evaluate)([(p, n) for _, p, n in members], n_rows,
+                                  X_train, y_train, X_val, y_val, keep_models=last)
+                for members in groups.values()
+            )
+            scores = [None] * len(configs)
+            for members, results in zip(groups.values(), outputs):
+                for (i, _, _), result in zip(members, results):
+                    scores[i] = result
+            ranked = sorted(zip(scores, configs), key=lambda item: item[0][0])
+            history.append({"fraction": 1.0 if last else fraction, "rows": n_rows,
+                            "forests": len(groups),
+                            "results": [{"params": p, "rmse": sc[0]} for sc, p in ranked]})
+            print(f"🔹 rung {len(history)}: {len(configs)} configs ({len(groups)} growth runs) on {n_rows} rows, "
+                  f"best RMSE {ranked[0][0][0]:.4f}")
+            if last:
+                (best_rmse, best_model), best_params = ranked[0]
+                return best_params, best_rmse, best_model, history
+            configs = [p for _, p in ranked[:max(1, len(configs) // eta)]]
+            fraction *= eta
+
+def main(argv=None):
+    args = parse_args(argv)
+    with profiler.span("load"):
+        X_train, X_test, y_train, y_test, columns = load_data(args.feature_set)
+    rmse_value = None
+    binner = None
+    if args.model == "hgb":
+        if args.search == "trees":
+            raise ValueError("--search trees grows forests; use --search halving for --model hgb")
+        # ---- Bin once: every hgb fit below boosts on the same uint8 codes ----
+        with profiler.span("bin"):
+            binner = QuantileBinner().fit(X_train)
+            X_train, X_test = binner.transform(X_train), binner.transform(X_test)
+
+    if args.search == "halving":
+        # load_data already shuffled the rows, so every rung's row prefix is a random sample
+        with profiler.span("search"):
+            best_params, rmse_value, rf, history = successive_halving(
+                sample_configs(args.n_configs, args.seed, HGB_SEARCH_SPACE if binner else SEARCH_SPACE),
+                X_train, y_train, X_test, y_test,
+                eta=args.eta, min_fraction=args.min_fraction, n_jobs=args.n_jobs, family=args.model,
+            )
+        print(f"🔹 Best hyperparameters: {json.dumps(best_params)}")
+    elif args.search == "trees":
+        # One growth run for the CLI structure, scored at every checkpoint
+        params = {k: getattr(args, k) for k in SEARCH_SPACE}
+        cache = ForestCache(X_train, y_train, X_test, y_test, n_jobs=args.n_jobs)
+        history = []
+        for n_trees in sorted(int(n) for n in args.tree_checkpoints.split(",")):
+            with profiler.span("search"):
+                score, model = cache.grow(params, n_trees)
+            print(f"🔹 n_estimators={n_trees}: RMSE {score:.4f}")
+            history.append({"n_estimators": n_trees, "rmse": score})
+            if rmse_value is None or score < rmse_value:
+                rmse_value, rf = score, model
+    else:
+        # ---- Train Model ----
+        rf = make_hgb(vars(args)) if binner else make_forest(vars(args))
+        with profiler.span("fit"):
+            rf.fit(X_train, y_train)
+        with profiler.span("predict"):
+            rmse_value = rmse(y_test, rf.predict(X_test))
+        history = None
+
+    # ✅ Required for SageMaker HPO: print only this line
+    print(f"validation:rmse {rmse_value:.4f}")
+
+    # ---- Save model to expected path ----
+    model_path = os.environ.get("SM_MODEL_DIR", "/opt/ml/model")
+    os.makedirs(model_path, exist_ok=True)
+    if binner is not None:
+        # Scores raw features; the flat format has no boosted trees, so inference loads this
+        rf = binned_pipeline(binner, rf)
+    with profiler.span("package"):
+        joblib.dump(rf, os.path.join(model_path, "model.joblib"), compress=3)  # 🔹 add compression
+        if binner is None:
+            export_model(rf, model_path)  # uncompressed arrays that inference.py memory-maps
+        package_transform(storage, ART_PREFIX, model_path, columns)  # lets the endpoint score raw records
+    if history is not None:
+        with open(os.path.join(model_path, "search_history.json"), "w") as f:
+            json.dump(history, f, indent=2)
+
+if __name__ == "__main__":
+    main()
+    model_dir = os.environ.get("SM_MODEL_DIR", "/opt/ml/model")
+    print(profiler.summary(profiler.write(os.path.join(model_dir, PROFILE_FILE), "hpt")))
@@ -1,15 +1,98 @@
+from instrument import profiler, process_age_s  # first: its clock times the imports below
 import joblib
 import os
 import numpy as np
 import json
 import sys
+import queue
+import threading
+import time
 import traceback
+from serving_log import get_logger, StageMetrics
+from flat_model import FLAT_MODEL_DIR, FlatForest, default_engine, source_digest
+from features import load_transform, record_columns
+from forecast_table import FORECAST_TABLE_DIR, ForecastTable
+from prediction_cache import PredictionCache
+
+profiler.mark("import")
+log = get_logger()
+# Per-stage timing counters; metrics_snapshot() reads them without touching stdout
+metrics = StageMetrics(("parse", "predict", "serialize"))
+
+# Server-side micro-batching: concurrent requests arriving within this window share one
+# model.predict call. 0 (default) predicts each request on its own thread.
+BATCH_WINDOW_MS = float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", 0))
+BATCH_MAX_ROWS = int(os.environ.get("INFERENCE_BATCH_MAX_ROWS", 4096))
+# Prediction engine:
+#   auto    model_dir/flat_model (memory-mapped, shared across workers) when the training job
+#           exported one, on the numba kernel if installed; otherwise the pickled estimator.
+#           An export made from an older model.joblib is ignored, so a reload serves the new one
+#   numpy / numba  FlatForest on that kernel; a model.joblib is flattened in memory if needed
+#   sklearn the pickled estimator's own predict
+ENGINE = os.environ.get("INFERENCE_ENGINE", "auto")
+# Opt-in prediction cache: up to CACHE_SIZE rows, each kept CACHE_TTL_S seconds (0 = no expiry)
+CACHE_SIZE = int(os.environ.get("INFERENCE_CACHE_SIZE", 0))
+CACHE_TTL_S = float(os.environ.get("INFERENCE_CACHE_TTL_S", 0))
+prediction_cache = PredictionCache(CACHE_SIZE, CACHE_TTL_S) if CACHE_SIZE > 0 else None
+
+# Raw-record featurizer for the loaded model (None when the artifact has no transform files)
+record_transform = None
+# Pre-scored store x day grid (forecast_table.py) answering on-grid raw records without the model
+forecast_table = None
+# Seconds from process start to the end of the first model_fn (set by model_fn)
+cold_start_s = None
 
 def model_fn(model_dir):
+    global cold_start_s
+    with profiler.span("model_fn"):
+        model = load_model(model_dir)
+    if cold_start_s is None:
+        cold_start_s = process_age_s()
+        spans = profiler.report("inference")["spans"]
+        print(f"⏱️  Cold start {cold_start_s or 0:.2f}s: imports {spans['import']['seconds']:.2f}s, "
+              f"model_fn {spans['model_fn']['seconds']:.2f}s", flush=True)
+    return model
+
+def load_model(model_dir):
+    global record_transform, forecast_table
     try:
+        if prediction_cache is not None:
+            prediction_cache.clear()  # a new artifact invalidates every cached prediction
+        close_batchers()  # their threads would keep the previous model alive
+        with profiler.span("transform"):
+            record_transform = load_transform(model_dir)
+        forecast_table = None
+        flat_path = os.path.join(model_dir, FLAT_MODEL_DIR)
+        table_path = os.path.join(model_dir, FORECAST_TABLE_DIR)
+        # Identifies model.joblib / model.pkl; both derived artifacts record the one they came from
+        digest = source_digest(model_dir) if os.path.isdir(flat_path) or os.path.isdir(table_path) else None
+        if record_transform is not None:
+            print(f"🔹 Raw records enabled ({len(record_transform.columns)} feature columns)", flush=True)
+            if os.path.isdir(table_path):
+                with profiler.span("forecast_table"):
+                    table = ForecastTable.load(table_path)
+                if table.meta.get("model_digest") == digest:
+                    forecast_table = table
+                    print(f"🔹 Forecast table: {table.n_days} days from {table.meta['start']}", flush=True)
+                else:
+                    print(f"❌ {table_path} was scored by a different model, ignoring it", flush=True)
+        engine = default_engine() if ENGINE == "auto" else ENGINE
         model_path = os.path.join(model_dir, "model.joblib")
+        if ENGINE != "sklearn" and os.path.isdir(flat_path):
+            print(f"🔹 Memory-mapping flat model from: {flat_path} (engine={engine})", flush=True)
+            with profiler.span("model"):
+                model = FlatForest.load(flat_path, engine=engine)
+            if model.meta.get("source_digest") == digest:
+                print(f"✅ Model loaded successfully ({model.meta['n_trees']} trees)", flush=True)
+                return model
+            if not os.path.isfile(model_path):
+                raise ValueError(f"{flat_path} was exported from a different model than the one in {model_dir}")
+            print(f"❌ {flat_path} was exported from an older model.joblib, ignoring it", flush=True)
         print(f"🔹 Attempting to load model from: {model_path}", flush=True)
-        model = joblib.load(model_path)
+        with profiler.span("model"):
+            model = joblib.load(model_path)
+            if ENGINE in ("numpy", "numba"):
+                model = FlatForest.from_model(model, engine=engine)
         print("✅ Model loaded successfully", flush=True)
         return model
     except Exception as e:
@@ -17,43 +100,219 @@ def model_fn(model_dir):
         traceback.print_exc(file=sys.stdout)
         raise
 
+def parse_csv(body):
+    """One or more CSV lines of floats -> (rows, cols) float32 matrix in a single pass."""
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode("utf-8")
+    lines = body.strip().replace("\r\n", "\n")
+    n_rows = lines.count("\n") + 1
+    n_cols = lines.split("\n", 1)[0].count(",") + 1
+    data = np.array(lines.replace("\n", ",").split(","), dtype=np.float32)
+    if data.size != n_rows * n_cols:
+        raise ValueError(f"Ragged CSV payload: {data.size} values for {n_rows} rows of {n_cols}")
+    return data.reshape(n_rows, n_cols)
+
+class RecordBatch:
+    """Raw records after the forecast-table lookup: `values` holds the on-grid predictions,
+    `X` the features of the `missing` rows that still need the model."""
+
+    def __init__(self, values, missing, X):
+        self.values, self.missing, self.X = values, missing, X
+        self.shape = (len(values),)
+
+    def __len__(self):
+        return len(self.values)
+
+def parse_records(payload):
+    if record_transform is None:
+        raise ValueError("Raw records need label_encoders.pkl, store_features.pkl and "
+                         "feature_columns.json in the model artifact")
+    columns = record_columns(payload)
+    if forecast_table is None:
+        return record_transform.transform_columns(*columns)
+    values, hit = forecast_table.lookup_columns(*columns)
+    missing = ~hit
+    X = record_transform.transform_columns(*(c[missing] for c in columns)) if missing.any() else None
+    return RecordBatch(values, missing, X)
+
+def parse_json(body):
+    """Feature arrays, or raw {Store, Date, Promo, StateHoliday, SchoolHoliday} record(s)."""
+    payload = json.loads(body)
+    if isinstance(payload, dict) or (isinstance(payload, list) and payload and isinstance(payload[0], dict)):
+        return parse_records(payload)
+    data = np.asarray(payload, dtype=np.float32)
+    return data.reshape(1, -1) if data.ndim == 1 else data
+
 def input_fn(request_body, request_content_type):
     try:
-        print(f"🔹 input_fn received content_type={request_content_type}", flush=True)
-        if request_content_type == "text/csv":
-            data = np.array([list(map(float, request_body.split(",")))])
-        elif request_content_type == "application/json":
-            data = np.array(json.loads(request_body))
-        else:
-            raise ValueError(f"Unsupported content type: {request_content_type}")
-        print(f"✅ Parsed input shape: {data.shape}", flush=True)
+        with metrics.timed("parse"):
+            content_type = request_content_type.split(";")[0].strip()
+            if content_type == "text/csv":
+                data = parse_csv(request_body)
+            elif content_type == "application/json":
+                data = parse_json(request_body)
+            else:
+                raise ValueError(f"Unsupported content type: {request_content_type}")
+        log.debug("parsed %s input of shape %s", content_type, data.shape)
         return data
-    except Exception as e:
-        print("❌ Error in input_fn:", e, flush=True)
-        traceback.print_exc(file=sys.stdout)
+    except (KeyError, TypeError, IndexError) as e:  # records missing a field, or a payload of the wrong shape
+        log.exception("❌ Error in input_fn")
+        raise ValueError(f"Malformed request body: {e!r}") from e
+    except Exception:
+        log.exception("❌ Error in input_fn")
         raise
 
+class MicroBatcher:
+    """Coalesces concurrent predict calls into one model.predict.
+
+    The first request waits at most window_ms for others to join (up to max_rows rows);
+    the stacked batch is predicted once and each caller gets its own slice back. If that
+    predict fails, each request is retried on its own, so one bad request fails alone.
+    """
+
+    def __init__(self, model, window_ms=None, max_rows=None):
+        self.model = model
+        self.window = (BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_rows = BATCH_MAX_ROWS if max_rows is None else max_rows
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.thread.start()
+
+    def predict(self, X):
+        request = {"X": X, "done": threading.Event(), "result": None, "error": None}
+        with self.lock:
+            if self.closed:
+                return self.model.predict(X)
+            self.requests.put(request)
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def close(self):
+        """Stop the thread once the requests already queued are answered."""
+        with self.lock:
+            self.closed = True
+            self.requests.put(None)
+
+    def _collect(self):
+        """(batch, whether close() was called); the None that close() queues is always last."""
+        request = self.requests.get()
+        if request is None:
+            return [], True
+        batch, rows = [request], len(request["X"])
+        deadline = time.monotonic() + self.window
+        while rows < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+            rows += len(request["X"])
+        return batch, False
+
+    def _predict_each(self, batch):
+        for r in batch:
+            try:
+                r["result"] = self.model.predict(r["X"])
+            except Exception as e:
+                r["error"] = e
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            if not batch:
+                continue
+            try:
+                preds = self.model.predict(np.concatenate([r["X"] for r in batch]))
+                start = 0
+                for r in batch:
+                    r["result"] = preds[start:start + len(r["X"])]
+                    start += len(r["X"])
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0]["error"] = e
+                else:
+                    self._predict_each(batch)
+            for r in batch:
+                r["done"].set()
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+def get_batcher(model):
+    with _batchers_lock:
+        batcher = _batchers.get(id(model))
+        if batcher is None or batcher.model is not model:
+            if batcher is not None:
+                batcher.close()
+            batcher = _batchers[id(model)] = MicroBatcher(model)
+        return batcher
+
+def close_batchers():
+    with _batchers_lock:
+        for batcher in _batchers.values():
+            batcher.close()
+        _batchers.clear()
+
+def model_predict(X, model):
+    predict = get_batcher(model).predict if BATCH_WINDOW_MS > 0 else model.predict
+    if prediction_cache is not None:
+        # only the rows not already cached go through the model, results in input order
+        return prediction_cache.predict(X, model, predict)
+    return predict(X)
+
 def predict_fn(input_data, model):
     try:
-        print(f"🔹 Running prediction on shape: {input_data.shape}", flush=True)
-        prediction = model.predict(input_data)
-        print(f"✅ Prediction done, shape: {prediction.shape}", flush=True)
+        with metrics.timed("predict"):
+            if isinstance(input_data, RecordBatch):
+                prediction = input_data.values
+                if input_data.X is not None:
+                    prediction[input_data.missing] = model_predict(input_data.X, model)
+            else:
+                prediction = model_predict(input_data, model)
+        log.debug("predicted %d rows", len(prediction))
         return prediction
-    except Exception as e:
-        print("❌ Error in predict_fn:", e, flush=True)
-        traceback.print_exc(file=sys.stdout)
+    except Exception:
+        log.exception("❌ Error in predict_fn")
         raise
 
+def to_csv(prediction):
+    """One line per row. float64 goes through tolist() (same text as str(np.float64), ~2x faster)."""
+    values = prediction.tolist() if prediction.dtype == np.float64 else prediction.astype(str)
+    return "\n".join(map(str, values))
+
 def output_fn(prediction, content_type):
     try:
-        print(f"🔹 Serializing prediction, content_type={content_type}", flush=True)
-        if content_type == "text/csv":
-            return ",".join(str(x) for x in prediction)
-        elif content_type == "application/json":
-            return json.dumps(prediction.tolist())
-        else:
-            raise ValueError(f"Unsupported content type: {content_type}")
-    except Exception as e:
-        print("❌ Error in output_fn:", e, flush=True)
-        traceback.print_exc(file=sys.stdout)
+        with metrics.timed("serialize"):
+            content_type = content_type.split(";")[0].strip()
+            if content_type == "text/csv":
+                # One line per input row, so batch transform can join outputs to MultiRecord inputs
+                return to_csv(prediction)
+            elif content_type == "application/json":
+                return json.dumps(prediction.tolist())
+            else:
+                raise ValueError(f"Unsupported content type: {content_type}")
+    except Exception:
+        log.exception("❌ Error in output_fn")
         raise
+
+def metrics_snapshot():
+    """Per-stage counts and timings since start-up (or the last metrics.reset()), plus cache counters."""
+    snapshot = metrics.snapshot()
+    if prediction_cache is not None:
+        snapshot["cache"] = prediction_cache.stats()
+    if forecast_table is not None:
+        snapshot["forecast_table"] = forecast_table.stats()
+    # Where start-up went: imports and every model_fn step (reloads add calls)
+    snapshot["startup"] = {"cold_start_s": cold_start_s, "interpreter_s": profiler.startup_s,
+                           "spans": profiler.report("inference")["spans"]}
+    return snapshot
@@ -0,0 +1,235 @@
+# scripts/instrument.py
+# Where a stage's time and memory go. Scripts import this module first, so the profiler's
+# clock starts before their heavy imports, and wrap their steps in spans:
+#
+#   from instrument import profiler
+#   profiler.mark("import")                 # module-level imports, i.e. the cold-start cost
+#   with profiler.span("fit"):
+#       ...
+#   profiler.write(os.path.join(MODEL_DIR, PROFILE_FILE))
+#
+# Spans nest ("fit/predict") and repeated spans add up (calls, seconds), so a per-chunk or
+# per-request span costs one entry. Each span records the peak RSS seen while it was open
+# (a background thread samples it every ROSSMANN_PROFILE_RSS_INTERVAL_S) and how many modules
+# were first imported inside it, which shows where deferred imports are paid.
+#
+# ROSSMANN_PROFILE=cprofile,tracemalloc adds a cProfile dump (<profile>.prof, top functions in
+# the JSON) and the top tracemalloc allocation sites; both slow the run down, so they are off
+# by default. Spans are always on and cost microseconds; the RSS sampler thread only runs while
+# a span is open, so a server that has finished loading its model (and its workers) has none.
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_MODES = set(filter(None, os.environ.get("ROSSMANN_PROFILE", "").split(",")))
+RSS_INTERVAL_S = float(os.environ.get("ROSSMANN_PROFILE_RSS_INTERVAL_S", 0.05))
+PROFILE_FILE = "profile.json"
+TOP_N = 30
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20 if hasattr(os, "sysconf") else 4096 / 2**20
+
+def rss_mb():
+    """Current resident set size; the peak so far where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except OSError:
+        return peak_rss_mb()
+
+def peak_rss_mb():
+    """Peak RSS of this process (VmHWM, which unlike ru_maxrss starts over at exec)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 1024
+
+def process_age_s():
+    """Seconds since this process started (interpreter start-up included), or None."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+    except (OSError, ValueError, IndexError):
+        return None
+
+class Profiler:
+    """Span timings, RSS peaks and optional cProfile / tracemalloc for one process."""
+
+    def __init__(self, modes=PROFILE_MODES, rss_interval=RSS_INTERVAL_S):
+        self.created = time.perf_counter()
+        self.started_at = time.time()
+        self.startup_s = process_age_s()  # interpreter start-up before this module was imported
+        self.spans = {}
+        self.rss_interval = rss_interval
+        self.peak_mb = rss_mb()
+        self._open = {}  # token -> peak RSS of every span currently open, in any thread
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sampler = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+        self.cprofile = None
+        if "cprofile" in modes:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.tracemalloc = "tracemalloc" in modes
+        if self.tracemalloc:
+            import tracemalloc
+            tracemalloc.start(10)
+
+    # ---- RSS sampling ----
+    def _sample(self):
+        while True:
+            time.sleep(self.rss_interval)
+            with self._lock:
+                if not self._open:  # the last span closed: stop until the next one opens
+                    self._sampler = None
+                    return
+            self._observe(rss_mb())
+
+    def _observe(self, rss):
+        with self._lock:
+            self.peak_mb = max(self.peak_mb, rss)
+            for token, peak in self._open.items():
+                self._open[token] = max(peak, rss)
+
+    def _after_fork(self):
+        # A forked child (a pool or server worker) has no sampler thread, and the lock may have
+        # been held by the parent's sampler at the fork
+        self._lock = threading.Lock()
+        self._open = {}
+        self._sampler = None
+
+    def _ensure_sampler(self):
+        """Called with the lock held, once the new span is in _open."""
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._sampler.start()
+
+    # ---- spans ----
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name):
+        stack = self._stack()
+        stack.append(name)
+        path = "/".join(stack)
+        token = object()
+        modules = len(sys.modules)
+        with self._lock:
+            self._open[token] = rss_mb()
+            self._ensure_sampler()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._observe(rss_mb())
+            with self._lock:
+                peak = self._open.pop(token)
+            stack.pop()
+            self.add(path, seconds, peak, len(sys.modules) - modules)
+
+    def add(self, path, seconds, peak_mb=None, imported=0):
+        """Record a span measured elsewhere, e.g. in a pool worker."""
+        with self._lock:
+            entry = self.spans.setdefault(path, {"calls": 0, "seconds": 0.0, "peak_rss_mb": 0.0, "imported": 0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["imported"] += imported
+            if peak_mb is not None:
+                entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak_mb)
+                self.peak_mb = max(self.peak_mb, peak_mb)
+
+    def mark(self, name):
+        """A span from the profiler's creation to now (e.g. "import": the module-level imports).
+
+        Marking the same name again replaces it, so a script importing another script's module
+        reports its own imports once.
+        """
+        with self._lock:
+            self.spans.pop(name, None)
+        self.add(name, time.perf_counter() - self.created, rss_mb(), 0)
+
+    def iterate(self, iterable, name):
+        """Yield from iterable, timing every next() as span `name` (e.g. chunked reads)."""
+        iterator = iter(iterable)
+        while True:
+            with self.span(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    # ---- report ----
+    def report(self, stage=None):
+        with self._lock:
+            spans = {path: dict(entry, seconds=round(entry["seconds"], 4), peak_rss_mb=round(entry["peak_rss_mb"], 1))
+                     for path, entry in self.spans.items()}
+            peak = max(self.peak_mb, peak_rss_mb())
+        return {
+            "stage": stage or os.path.splitext(os.path.basename(sys.argv[0]))[0],
+            "pid": os.getpid(),
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "startup_s": self.startup_s,
+            "wall_s": round(time.perf_counter() - self.created, 3),
+            "peak_rss_mb": round(peak, 1),
+            "modules": len(sys.modules),
+            "spans": spans,
+        }
+
+    def write(self, path, stage=None):
+        """Write the report as JSON to path (plus <path>.prof with cProfile); returns the report."""
+        report = self.report(stage)
+        if self.cprofile is not None:
+            import pstats
+            self.cprofile.disable()
+            prof_path = os.path.splitext(path)[0] + ".prof"
+            self.cprofile.dump_stats(prof_path)
+            stats = pstats.Stats(prof_path)
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_N]
+            report["cprofile"] = {"file": os.path.basename(prof_path), "top_cumulative": [
+                {"function": f"{file}:{line}({func})", "calls": calls, "tottime_s": round(tt, 4), "cumtime_s": round(ct, 4)}
+                for (file, line, func), (_, calls, tt, ct, _) in top]}
+            self.cprofile.enable()
+        if self.tracemalloc:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:TOP_N]
+            report["tracemalloc"] = {"current_mb": round(current / 2**20, 1), "peak_mb": round(peak / 2**20, 1),
+                                     "top": [{"site": str(s.traceback), "size_mb": round(s.size / 2**20, 2),
+                                              "count": s.count} for s in stats]}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def summary(self, report=None):
+        """One line per top-level span, longest first."""
+        report = report or self.report()
+        lines = [f"⏱️  {report['stage']}: {report['wall_s']:.2f}s (+{report['startup_s'] or 0:.2f}s interpreter start-up), "
+                 f"peak RSS {report['peak_rss_mb']:.0f}MB"]
+        top = [(p, e) for p, e in report["spans"].items() if "/" not in p]
+        for path, entry in sorted(top, key=lambda item: -item[1]["seconds"]):
+            calls = f" x{entry['calls']}" if entry["calls"] > 1 else ""
+            lines.append(f"   {path:<20} {entry['seconds']:8.2f}s{calls:<8} peak RSS {entry['peak_rss_mb']:7.0f}MB")
+        return "\n".join(lines)
+
+# One per process; created when the first script imports this module
+profiler = Profiler()
@@ -0,0 +1,94 @@
+# scripts/prediction_cache.py
+# Bounded LRU + TTL cache of predictions keyed on the exact float32 feature row. Rows that
+# the model would see as identical (same float32 values) share one entry; -0.0 and 0.0 are
+# folded together since every split compares them equal.
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class PredictionCache:
+    """Thread-safe row -> prediction cache bound to one model object."""
+
+    def __init__(self, max_entries=100_000, ttl_s=0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s  # 0 keeps entries until evicted
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (prediction, stored_at), least recent first
+        self.model_id = None
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @staticmethod
+    def keys(X):
+        rows = np.ascontiguousarray(X, dtype=np.float32) + np.float32(0.0)
+        return [row.tobytes() for row in rows]
+
+    def bind(self, model):
+        """Drop every entry if predictions are about to come from another model."""
+        with self.lock:
+            if self.model_id != id(model):
+                self.entries.clear()
+                self.model_id = id(model)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.model_id = None
+
+    def get_many(self, keys):
+        """(values, missing): values holds cached predictions where missing is False."""
+        values = np.empty(len(keys))
+        missing = np.zeros(len(keys), dtype=bool)
+        now = time.monotonic()
+        with self.lock:
+            for i, key in enumerate(keys):
+                entry = self.entries.get(key)
+                if entry is not None and self.ttl_s and now - entry[1] > self.ttl_s:
+                    del self.entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing[i] = True
+                    continue
+                self.entries.move_to_end(key)
+                values[i] = entry[0]
+            n_missing = int(missing.sum())
+            self.misses += n_missing
+            self.hits += len(keys) - n_missing
+        return values, missing
+
+    def put_many(self, keys, predictions):
+        now = time.monotonic()
+        with self.lock:
+            for key, value in zip(keys, predictions):
+                self.entries[key] = (float(value), now)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def predict(self, X, model, predict):
+        """Serve X from the cache, calling predict(rows) only for the missing rows."""
+        self.bind(model)
+        keys = self.keys(X)
+        values, missing = self.get_many(keys)
+        if missing.any():
+            misses = np.flatnonzero(missing)
+            predictions = np.asarray(predict(X[misses]))
+            values[misses] = predictions
+            self.put_many([keys[i] for i in misses], predictions)
+        return values
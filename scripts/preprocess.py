@@ -1,131 +1,250 @@
-import os, json, joblib, boto3
+from instrument import profiler, PROFILE_FILE  # first: its clock times the imports below
+import os, json, joblib, argparse, tempfile
+from io import BytesIO
 import pandas as pd
 import numpy as np
-from io import StringIO
-from datetime import datetime
 from sklearn.preprocessing import LabelEncoder
+from storage import get_storage
+from dataio import (
+    write_dataset, DatasetWriter, partition_prefix, load_manifest, save_manifest, watermark, drop_partitions,
+)
+from store_features import (
+    build_store_features, store_positions, gather,
+    store_csv_fingerprint, save_store_features, load_store_features,
+)
+from features import ENCODED_COLUMNS, select_rows, build_features, encode
+
+profiler.mark("import")
 
 # ---------------- CONFIG ---------------- #
 BUCKET = "rossmann-sales-bucket"
 PROC_PREFIX = "rossmann-processed/"
 ART_PREFIX = "rossmann-artifacts/"
+# Not an input of any stage, so a new profile never invalidates a cached downstream stage
+PROFILE_PREFIX = "rossmann-profiles/"
+INPUT_DIR = os.environ.get("PROCESSING_INPUT_DIR", "/opt/ml/processing/input")
 
-s3 = boto3.client("s3")
+storage = get_storage(BUCKET)
+
+# StateHoliday mixes 0 and "0"; read it as text so every chunk parses it the same way
+DAILY_DTYPES = {"StateHoliday": str}
+# Incremental runs scan train.csv for new days in batches of this many rows
+SCAN_CHUNKSIZE = 500_000
 
 # Read from local path in SageMaker container
-def read_csv_local(filename):
-    return pd.read_csv(f"/opt/ml/processing/input/{filename}")
-
-def upload_df(df, key):
-    csv_buffer = StringIO()
-    df.to_csv(csv_buffer, index=False)
-    s3.put_object(Bucket=BUCKET, Key=key, Body=csv_buffer.getvalue())
-
-# ----------------- LOAD DATA ---------------- #
-print("📥 Loading data from container input path...")
-train_df = read_csv_local("train.csv")
-test_df  = read_csv_local("test.csv")
-store_df = read_csv_local("store.csv")
-
-# Merge store info
-df_train = pd.merge(train_df, store_df, on="Store", how="left")
-df_test  = pd.merge(test_df,  store_df, on="Store", how="left")
-
-# ---------------- DATE FEATURES ---------------- #
-def Date_column(df):
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Year"] = df["Date"].dt.year
-    df["Month"] = df["Date"].dt.month
-    df["WeekOfYear"] = df["Date"].dt.isocalendar().week
-    df["Day"] = df["Date"].dt.day
-    df["DayOfWeek"] = df["Date"].dt.dayofweek
-    df["IsWeekend"] = df["DayOfWeek"].isin([5, 6]).astype(int)
-    return df
-
-df_train = Date_column(df_train)
-df_test  = Date_column(df_test)
-
-# ---------------- OPEN & PROMO2 ---------------- #
-df_train = df_train[df_train["Open"] == 1].drop(columns=["Open"])
-df_test  = df_test[df_test["Open"] == 1].drop(columns=["Open"])
-
-for df in [df_train, df_test]:
-    df["PromoInterval"] = df["PromoInterval"].fillna("NoPromo")
-    df["Promo2SinceWeek"] = df["Promo2SinceWeek"].fillna(0).astype(int)
-    df["Promo2SinceYear"] = df["Promo2SinceYear"].fillna(0).astype(int)
-    df["MonthStr"] = df["Date"].dt.strftime("%b")
-    df["IsPromoMonth"] = df.apply(
-        lambda row: int(row["MonthStr"] in row["PromoInterval"].split(","))
-        if row["PromoInterval"] != "NoPromo" else 0, axis=1
-    )
-    df.drop(columns=["MonthStr"], inplace=True)
-    df["Promo2Active"] = ((df["Promo2"] == 1) & (df["IsPromoMonth"] == 1)).astype(int)
-
-# ---------------- COMPETITION DISTANCE ---------------- #
-def preprocess_competition_distance(df):
-    df = df[df["CompetitionDistance"].notna()]
-    df["CompetitionDistance"] = np.log1p(df["CompetitionDistance"])
-
-    df["CompetitionOpenSinceMonth"] = df["CompetitionOpenSinceMonth"].fillna(0).astype(int)
-    df["CompetitionOpenSinceYear"]  = df["CompetitionOpenSinceYear"].fillna(0).astype(int)
-
-    df["CompetitionOpenSinceDate"] = df.apply(
-        lambda row: datetime(
-            year=row["CompetitionOpenSinceYear"],
-            month=row["CompetitionOpenSinceMonth"],
-            day=1
-        ) if row["CompetitionOpenSinceYear"] > 0 and row["CompetitionOpenSinceMonth"] > 0
-        else row["Date"], axis=1
-    )
-
-    df["CompetitionOpenTimeMonths"] = (
-        (df["Date"].dt.year - df["CompetitionOpenSinceDate"].dt.year) * 12 +
-        (df["Date"].dt.month - df["CompetitionOpenSinceDate"].dt.month)
-    ).apply(lambda x: max(x, 0))
-
-    df["CompetitionOpenTimeMonths"] = np.log1p(df["CompetitionOpenTimeMonths"])
-
-    return df
-
-df_train = preprocess_competition_distance(df_train)
-df_test  = preprocess_competition_distance(df_test)
-
-# ---------------- DROP UNUSED COLUMNS ---------------- #
-drop_cols = [
-    "Date", "Customers",
-    "CompetitionOpenSinceMonth", "CompetitionOpenSinceYear",
-    "Promo2", "Promo2SinceWeek", "Promo2SinceYear", "PromoInterval",
-    "CompetitionOpenSinceDate"
-]
-
-df_train.drop(columns=drop_cols, inplace=True, errors="ignore")
-df_test.drop(columns=[c for c in drop_cols if c in df_test.columns], inplace=True)
+def read_csv_local(filename, **kwargs):
+    return pd.read_csv(os.path.join(INPUT_DIR, filename), **kwargs)
+
+# ---------------- STORE FEATURES ---------------- #
+def get_store_features(store_df):
+    """Reuse the cached store table when it was built from the same store.csv and version."""
+    fingerprint = store_csv_fingerprint(store_df)
+    key = ART_PREFIX + "store_features.pkl"
+    try:
+        table = load_store_features(BytesIO(storage.read_bytes(key)), fingerprint)
+    except Exception:
+        table = None
+    if table is None:
+        print("🏪 Building store feature table...")
+        table = build_store_features(store_df)
+        with storage.open_writer(key) as f:
+            save_store_features(table, f, fingerprint)
+    else:
+        print("🏪 Reusing cached store feature table")
+    return table
 
 # ---------------- ENCODING ---------------- #
-df_train["StateHoliday"] = df_train["StateHoliday"].astype(str)
-df_test["StateHoliday"]  = df_test["StateHoliday"].astype(str)
-
-label_encoders = {}
-for col in ["StateHoliday", "Assortment", "StoreType", "Store"]:
-    le = LabelEncoder()
-    df_train[col] = le.fit_transform(df_train[col])
-    df_test[col] = le.transform(df_test[col])
-    label_encoders[col] = le
-
-# ---------------- SPLIT & UPLOAD ---------------- #
-X_train = df_train.drop("Sales", axis=1)
-y_train = df_train[["Sales"]]
-X_test  = df_test.copy()  # y_test not available
-
-print("📤 Uploading processed datasets to S3...")
-upload_df(X_train, PROC_PREFIX + "X_train.csv")
-upload_df(y_train, PROC_PREFIX + "y_train.csv")
-upload_df(X_test, PROC_PREFIX + "X_test.csv")
-
-# ---------------- SAVE ARTIFACTS ---------------- #
-print("💾 Saving label encoders...")
-os.makedirs("/tmp", exist_ok=True)
-joblib.dump(label_encoders, "/tmp/label_encoders.pkl")
-s3.upload_file("/tmp/label_encoders.pkl", BUCKET, ART_PREFIX + "label_encoders.pkl")
-
-print("✅ Done preprocessing and uploading everything.")
+def fit_encoders_streaming(store_table, chunksize):
+    """Cheap first pass over train.csv: the classes the in-memory fit would see."""
+    holidays, stores = set(), set()
+    for chunk in read_csv_local("train.csv", usecols=["Store", "Open", "StateHoliday"],
+                                dtype=DAILY_DTYPES, chunksize=chunksize):
+        chunk, _ = select_rows(chunk, store_table)
+        holidays.update(chunk["StateHoliday"].astype(str).unique())
+        stores.update(chunk["Store"].unique())
+
+    pos = store_positions(store_table, sorted(stores))
+    classes = {
+        "StateHoliday": np.array(sorted(holidays), dtype=object),
+        "Assortment": np.unique(gather(store_table, "Assortment", pos)),
+        "StoreType": np.unique(gather(store_table, "StoreType", pos)),
+        "Store": np.array(sorted(stores), dtype=np.int64),
+    }
+    label_encoders = {}
+    for col in ENCODED_COLUMNS:
+        label_encoders[col] = LabelEncoder().fit(classes[col])
+    return label_encoders
+
+def run_in_memory(store_table):
+    with profiler.span("load"):
+        train_df = read_csv_local("train.csv", dtype=DAILY_DTYPES)
+        test_df  = read_csv_local("test.csv", dtype=DAILY_DTYPES)
+
+    with profiler.span("features"):
+        df_train = build_features(train_df, store_table)
+        df_test  = build_features(test_df, store_table)
+
+    with profiler.span("encode"):
+        df_train["StateHoliday"] = df_train["StateHoliday"].astype(str)
+        df_test["StateHoliday"]  = df_test["StateHoliday"].astype(str)
+
+        label_encoders = {}
+        for col in ENCODED_COLUMNS:
+            le = LabelEncoder()
+            df_train[col] = le.fit_transform(df_train[col])
+            df_test[col] = le.transform(df_test[col])
+            label_encoders[col] = le
+
+    # ---------------- SPLIT & UPLOAD ---------------- #
+    X_train = df_train.drop("Sales", axis=1)
+    y_train = df_train[["Sales"]]
+    X_test  = df_test.copy()  # y_test not available
+
+    print("📤 Uploading processed datasets to S3...")
+    with profiler.span("upload"):
+        write_dataset(storage, X_train, PROC_PREFIX, "X_train")
+        write_dataset(storage, y_train, PROC_PREFIX, "y_train")
+        write_dataset(storage, X_test, PROC_PREFIX, "X_test")
+    base = {"rows": len(X_train), "first": train_df["Date"].min(), "last": train_df["Date"].max()}
+    return label_encoders, base
+
+def run_chunked(store_table, chunksize, label_encoders):
+    """Bounded-memory path: each batch is featurized, encoded and appended to the outputs."""
+    print(f"📤 Streaming processed datasets to S3 in batches of {chunksize:,d} rows...")
+    base = {"rows": 0, "first": None, "last": None}
+    with DatasetWriter(storage, PROC_PREFIX, "X_train") as x_out, \
+            DatasetWriter(storage, PROC_PREFIX, "y_train") as y_out:
+        for chunk in profiler.iterate(read_csv_local("train.csv", dtype=DAILY_DTYPES, chunksize=chunksize), "load"):
+            base["first"] = min(filter(None, [base["first"], chunk["Date"].min()]))
+            base["last"] = max(filter(None, [base["last"], chunk["Date"].max()]))
+            with profiler.span("features"):
+                df = build_features(chunk, store_table)
+            with profiler.span("encode"):
+                df = encode(df, label_encoders)
+            base["rows"] += len(df)
+            with profiler.span("upload"):
+                x_out.append(df.drop("Sales", axis=1))
+                y_out.append(df[["Sales"]])
+
+    with DatasetWriter(storage, PROC_PREFIX, "X_test") as x_out:
+        for chunk in profiler.iterate(read_csv_local("test.csv", dtype=DAILY_DTYPES, chunksize=chunksize), "load"):
+            with profiler.span("features"):
+                df = build_features(chunk, store_table)
+            with profiler.span("encode"):
+                df = encode(df, label_encoders)
+            with profiler.span("upload"):
+                x_out.append(df)
+    return base
+
+# ---------------- INCREMENTAL ---------------- #
+def unseen_classes(df, label_encoders):
+    """{column: values} the fitted encoders have never seen."""
+    unseen = {}
+    for col in ENCODED_COLUMNS:
+        values = pd.unique(df[col].astype(str) if col == "StateHoliday" else df[col])
+        missing = values[~np.isin(values, label_encoders[col].classes_)]
+        if len(missing):
+            unseen[col] = sorted(missing.tolist())
+    return unseen
+
+def run_incremental(store_table, label_encoders, manifest, train_file, chunksize):
+    """Featurize only the days after the manifest's watermark into a new date partition.
+
+    Returns the partition's manifest entry, or None when there are no new days.
+    """
+    since = watermark(manifest)
+    with profiler.span("load"):
+        new_days = [chunk[chunk["Date"] > since]  # ISO dates compare as strings
+                    for chunk in read_csv_local(train_file, dtype=DAILY_DTYPES, chunksize=chunksize)]
+        daily = pd.concat(new_days, ignore_index=True)
+    if daily.empty:
+        return None
+
+    with profiler.span("features"):
+        df = build_features(daily, store_table)
+    unseen = unseen_classes(df, label_encoders)
+    if unseen:
+        # New codes would shift LabelEncoder's sorted classes, i.e. re-encode the whole history
+        raise ValueError(f"New days have values the label encoders were not fitted on: {unseen}. "
+                         "Run a full preprocess (without --incremental) to refit them.")
+    with profiler.span("encode"):
+        df = encode(df, label_encoders)
+
+    entry = {"name": f"{daily['Date'].min()}_{daily['Date'].max()}", "rows": len(df),
+             "first": daily["Date"].min(), "last": daily["Date"].max()}
+    prefix = partition_prefix(PROC_PREFIX, entry["name"])
+    print(f"📤 Uploading {len(df):,d} new rows ({entry['first']} to {entry['last']}) to {prefix}")
+    with profiler.span("upload"):
+        write_dataset(storage, df.drop("Sales", axis=1), prefix, "X_train")
+        write_dataset(storage, df[["Sales"]], prefix, "y_train")
+    return entry
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="rows per batch; 0 processes the files in memory")
+    parser.add_argument("--encoders", choices=["fit", "reuse"], default="fit",
+                        help="chunked mode: fit encoders in a first pass or load label_encoders.pkl")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only process days after the last run into a new date partition "
+                             "(reuses label_encoders.pkl; X_test is left as it is)")
+    parser.add_argument("--train-file", default="train.csv",
+                        help="incremental mode: daily sales file to take the new days from")
+    args = parser.parse_args()
+
+    # ----------------- LOAD DATA ---------------- #
+    print("📥 Loading data from container input path...")
+    with profiler.span("load"):
+        store_df = read_csv_local("store.csv")
+
+    # ---------------- STORE FEATURES ---------------- #
+    with profiler.span("store_features"):
+        store_table = get_store_features(store_df)
+
+    if args.incremental:
+        manifest = load_manifest(storage, PROC_PREFIX)
+        if manifest is None:
+            raise SystemExit("❌ No partition manifest in rossmann-processed/: run a full preprocess first")
+        label_encoders = joblib.load(BytesIO(storage.read_bytes(ART_PREFIX + "label_encoders.pkl")))
+        entry = run_incremental(store_table, label_encoders, manifest, args.train_file,
+                                args.chunksize or SCAN_CHUNKSIZE)
+        if entry is None:
+            print(f"✅ No days after {watermark(manifest)}, nothing to add.")
+            return
+        manifest["partitions"].append(entry)
+        save_manifest(storage, PROC_PREFIX, manifest)  # last: readers never see a half-written partition
+        print(f"✅ Done: partition {entry['name']} appended ({len(manifest['partitions'])} since the last full run).")
+        return
+
+    if not args.chunksize:
+        label_encoders, base = run_in_memory(store_table)
+    elif args.encoders == "reuse":
+        label_encoders = joblib.load(BytesIO(storage.read_bytes(ART_PREFIX + "label_encoders.pkl")))
+        base = run_chunked(store_table, args.chunksize, label_encoders)
+    else:
+        with profiler.span("fit_encoders"):
+            label_encoders = fit_encoders_streaming(store_table, args.chunksize)
+        base = run_chunked(store_table, args.chunksize, label_encoders)
+
+    # The full datasets now hold every day: start a new partition history from them
+    drop_partitions(storage, PROC_PREFIX)
+    save_manifest(storage, PROC_PREFIX, {"base": base, "partitions": []})
+
+    # ---------------- SAVE ARTIFACTS ---------------- #
+    print("💾 Saving label encoders...")
+    with profiler.span("upload"), storage.open_writer(ART_PREFIX + "label_encoders.pkl") as f:
+        joblib.dump(label_encoders, f)
+
+    print("✅ Done preprocessing and uploading everything.")
+
+def save_profile():
+    """Upload the run's profile (and cProfile dump, if any) to rossmann-profiles/."""
+    path = os.path.join(tempfile.mkdtemp(prefix="preprocess-profile-"), PROFILE_FILE)
+    report = profiler.write(path, "preprocess")
+    for name in os.listdir(os.path.dirname(path)):
+        storage.upload_file(os.path.join(os.path.dirname(path), name), PROFILE_PREFIX + "preprocess" + os.path.splitext(name)[1])
+    print(profiler.summary(report))
+
+if __name__ == "__main__":
+    main()
+    save_profile()
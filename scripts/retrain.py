@@ -0,0 +1,247 @@
+# scripts/retrain.py
+# Incremental retraining on the date partitions preprocess.py --incremental appends.
+# Instead of refitting every model on the whole history, the models the last full train.py
+# run produced are updated on the new rows only:
+#   XGBoost       extra boosting rounds, continued from the previous booster
+#   RandomForest  extra trees (warm_start), fitted on the new rows
+# so a cycle costs about as much as the delta, not the history. The other models keep
+# their last full fit until the next rebuild.
+#
+# Before updating, the new rows are checked against the last rebuild; when any check fails
+# the partitions are folded into the base datasets and train.py runs from scratch:
+#   - PSI of DRIFT_COLUMNS against reference histograms of the rebuild's data
+#   - RMSE of the deployed model (XGBoost_selected) on the new rows vs its validation RMSE
+#   - rows added since the rebuild, as a fraction of the rebuild's rows
+#   - number of incremental updates since the rebuild (every update grows the models)
+#
+#   python scripts/retrain.py             # update, or rebuild if a threshold is crossed
+#   python scripts/retrain.py --dry-run   # only print the drift checks and the decision
+#   python scripts/retrain.py --full      # rebuild regardless
+from instrument import profiler, PROFILE_FILE  # first: its clock times the imports below
+import os, json, time, joblib, shutil, argparse, tempfile
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import train
+from train import (
+    storage, evaluate, PROC_PREFIX, MODEL_PREFIX, RESULTS_PREFIX, FEATURES_PREFIX, ART_PREFIX, MODEL_DIR, N_CPUS,
+)
+from dataio import read_dataset, partition_prefix, load_manifest, compact_partitions
+from flat_model import export_model
+from features import package_transform
+
+profiler.mark("import")
+
+# ---------------- CONFIG ----------------
+STATE_KEY = MODEL_PREFIX + "incremental_state.json"
+RESULTS_KEY = RESULTS_PREFIX + "incremental_results.json"
+DEPLOYED_MODEL = "XGBoost_selected"
+
+# Rebuild thresholds
+PSI_MAX = float(os.environ.get("RETRAIN_PSI_MAX", 0.2))
+RMSE_RATIO_MAX = float(os.environ.get("RETRAIN_RMSE_RATIO", 1.25))
+MAX_NEW_FRACTION = float(os.environ.get("RETRAIN_MAX_NEW_FRACTION", 0.25))
+MAX_INCREMENTS = int(os.environ.get("RETRAIN_MAX_INCREMENTS", 20))
+
+# Size of one update
+XGB_ROUNDS = int(os.environ.get("RETRAIN_XGB_ROUNDS", 10))
+RF_TREES = int(os.environ.get("RETRAIN_RF_TREES", 10))
+
+# Calendar columns are left out: a new week always "drifts" in Month / WeekOfYear / Day
+DRIFT_COLUMNS = ["Sales", "Promo", "StateHoliday", "StoreType", "Assortment", "CompetitionDistance"]
+REFERENCE_ROWS = 200_000
+PSI_BINS = 10
+
+# ---------------- DRIFT ----------------
+def reference_histogram(values):
+    """Decile edges of the reference values and the share of rows in each bin."""
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, PSI_BINS + 1)[1:-1]))
+    return {"edges": edges.tolist(), "fractions": bin_fractions(values, edges).tolist()}
+
+def bin_fractions(values, edges):
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return counts / max(len(values), 1)
+
+def psi(reference, values, eps=1e-4):
+    """Population stability index of values against a reference_histogram."""
+    expected = np.clip(np.asarray(reference["fractions"]), eps, None)
+    actual = np.clip(bin_fractions(values, np.asarray(reference["edges"])), eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def load_drift_columns(prefix):
+    X = read_dataset(storage, prefix, "X_train", columns=[c for c in DRIFT_COLUMNS if c != "Sales"])
+    X["Sales"] = read_dataset(storage, prefix, "y_train", columns=["Sales"])["Sales"].to_numpy()
+    return X
+
+def drift_checks(state, delta, feature_sets):
+    """{check: (value, limit)} for every rebuild condition; a check fails when value > limit."""
+    checks = {f"psi_{col}": (psi(state["reference"][col], delta.frame[col].to_numpy()), PSI_MAX)
+              for col in DRIFT_COLUMNS}
+    model = load_model(DEPLOYED_MODEL)
+    rmse = evaluate(delta.y, model.predict(delta.X[:, feature_sets["selected"]]))["RMSE"]
+    checks["rmse_ratio"] = (rmse / state["baseline_rmse"], RMSE_RATIO_MAX)
+    checks["new_fraction"] = ((state["rows_since_rebuild"] + len(delta.y)) / state["base"]["rows"], MAX_NEW_FRACTION)
+    checks["increments"] = (state["increments"] + 1, MAX_INCREMENTS)
+    return checks
+
+# ---------------- STATE ----------------
+def load_json(key, default=None):
+    return json.loads(storage.read_bytes(key)) if storage.exists(key) else default
+
+def fresh_state(manifest):
+    """State right after a full train.py run on the base datasets of manifest."""
+    sample = load_drift_columns(PROC_PREFIX)
+    if len(sample) > REFERENCE_ROWS:
+        sample = sample.sample(REFERENCE_ROWS, random_state=0)
+    results = load_json(RESULTS_PREFIX + "model_results.json")
+    return {
+        "base": manifest["base"], "partitions": [], "increments": 0, "rows_since_rebuild": 0,
+        "baseline_rmse": results[DEPLOYED_MODEL]["RMSE"],
+        "reference": {col: reference_histogram(sample[col].to_numpy()) for col in DRIFT_COLUMNS},
+        "rebuilt": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+# ---------------- DELTA ----------------
+class Delta:
+    """The rows of the pending partitions: model matrix, target and the drift columns."""
+
+    def __init__(self, partitions):
+        X = [read_dataset(storage, partition_prefix(PROC_PREFIX, p["name"]), "X_train") for p in partitions]
+        y = [read_dataset(storage, partition_prefix(PROC_PREFIX, p["name"]), "y_train") for p in partitions]
+        X, y = pd.concat(X, ignore_index=True), pd.concat(y, ignore_index=True)
+        self.columns = list(X.columns)
+        self.X = np.ascontiguousarray(X.to_numpy(np.float32))
+        self.y = y["Sales"].to_numpy(np.float64)
+        self.frame = X[[c for c in DRIFT_COLUMNS if c != "Sales"]].assign(Sales=self.y)
+
+# ---------------- MODEL UPDATES ----------------
+def load_model(name):
+    return joblib.load(BytesIO(storage.read_bytes(f"{MODEL_PREFIX}{name}.pkl")))
+
+def boost_more(model, X, y):
+    """XGB_ROUNDS more boosting rounds on (X, y), starting from the fitted booster."""
+    from xgboost import XGBRegressor
+    params = dict(model.get_params(), n_estimators=XGB_ROUNDS, n_jobs=N_CPUS)
+    updated = XGBRegressor(**params).fit(X, y, xgb_model=model.get_booster())
+    return updated.set_params(n_jobs=model.get_params()["n_jobs"])
+
+def grow_forest(model, X, y):
+    """RF_TREES more trees fitted on (X, y); the existing trees are kept as they are."""
+    n_jobs = model.n_jobs
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + RF_TREES, n_jobs=N_CPUS)
+    model.fit(X, y)
+    return model.set_params(warm_start=False, n_jobs=n_jobs)
+
+UPDATES = {"XGBoost": boost_more, "RandomForest": grow_forest}
+
+def update_models(delta, feature_sets, out_dir):
+    """Update every UPDATES model on the delta; returns {model: metrics on the delta before the update}."""
+    results = {}
+    for name, update in UPDATES.items():
+        for feature_set, cols in feature_sets.items():
+            key = f"{name}_{feature_set}"
+            with profiler.span("load"):
+                model = load_model(key)
+            X = np.ascontiguousarray(delta.X[:, cols])
+            with profiler.span("predict"):
+                results[key] = evaluate(delta.y, model.predict(X))
+            start = time.perf_counter()
+            with profiler.span("fit"), profiler.span(key):
+                model = update(model, X, delta.y)
+            print(f"✅ {key}: RMSE on the new rows {results[key]['RMSE']:.2f} before the update, "
+                  f"updated in {time.perf_counter() - start:.1f}s")
+            with profiler.span("upload"):
+                joblib.dump(model, os.path.join(out_dir, f"{key}.pkl"))
+                storage.upload_file(os.path.join(out_dir, f"{key}.pkl"), f"{MODEL_PREFIX}{key}.pkl")
+    return results
+
+def deploy(out_dir, selected):
+    """Refresh MODEL_DIR the way train.py leaves it."""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    path = os.path.join(out_dir, f"{DEPLOYED_MODEL}.pkl")
+    shutil.copyfile(path, os.path.join(MODEL_DIR, "model.pkl"))
+    export_model(joblib.load(path), MODEL_DIR)
+    package_transform(storage, ART_PREFIX, MODEL_DIR, selected)
+
+# ---------------- MAIN ----------------
+def rebuild(manifest, reasons):
+    print(f"🔁 Full rebuild: {'; '.join(reasons)}")
+    if manifest["partitions"]:
+        print(f"🔹 Folding {len(manifest['partitions'])} partitions into the base datasets")
+        manifest = compact_partitions(storage, PROC_PREFIX, manifest)
+    train.main()
+    return fresh_state(manifest)
+
+def record(entry):
+    history = load_json(RESULTS_KEY, [])
+    history.append(entry)
+    storage.put_bytes(RESULTS_KEY, json.dumps(history, indent=4))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true", help="rebuild whatever the drift checks say")
+    parser.add_argument("--dry-run", action="store_true", help="print the checks and the decision only")
+    args = parser.parse_args()
+
+    manifest = load_manifest(storage, PROC_PREFIX)
+    if manifest is None:
+        raise SystemExit("❌ No partition manifest in rossmann-processed/: run a full preprocess first")
+    state = load_json(STATE_KEY)
+    # A full preprocess is always followed by train.py, so new base datasets mean new full fits
+    if state is None or state["base"] != manifest["base"]:
+        print("🔹 Taking the last full training run as the rebuild")
+        state = fresh_state(manifest)
+    pending = [p for p in manifest["partitions"] if p["name"] not in state["partitions"]]
+    new_rows = sum(p["rows"] for p in pending)
+    print(f"🔹 {len(pending)} new partitions ({new_rows:,d} rows), "
+          f"{state['increments']} updates since the rebuild of {state['rebuilt']}")
+
+    reasons = ["requested (--full)"] if args.full else []
+    entry = {"partitions": [p["name"] for p in pending], "rows": new_rows}
+    if pending and not reasons:
+        with profiler.span("load"):
+            delta = Delta(pending)
+        selected = json.loads(storage.read_bytes(FEATURES_PREFIX + "selected_features.json"))
+        feature_sets = {"all": list(range(len(delta.columns))),
+                        "selected": [delta.columns.index(c) for c in selected]}
+        with profiler.span("drift"):
+            checks = drift_checks(state, delta, feature_sets)
+        for check, (value, limit) in checks.items():
+            print(f"   {check:>24} {value:10.4f} (limit {limit:g}){'  ❌' if value > limit else ''}")
+        reasons += [f"{check} {value:.4f} > {limit:g}" for check, (value, limit) in checks.items() if value > limit]
+        entry["checks"] = {check: value for check, (value, _) in checks.items()}
+    if not pending and not reasons:
+        if not args.dry_run:
+            storage.put_bytes(STATE_KEY, json.dumps(state, indent=2))
+        print("✅ No new partitions, models are up to date.")
+        return
+    if args.dry_run:
+        print(f"🔹 Would {'rebuild: ' + '; '.join(reasons) if reasons else 'update incrementally'}")
+        return
+
+    start = time.perf_counter()
+    if reasons:
+        with profiler.span("rebuild"):
+            state = rebuild(manifest, reasons)
+        entry.update(action="rebuild", reasons=reasons)
+    else:
+        out_dir = tempfile.mkdtemp(prefix="retrain-models-")
+        entry.update(action="update", models=update_models(delta, feature_sets, out_dir))
+        with profiler.span("package"):
+            deploy(out_dir, selected)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        state["partitions"] += entry["partitions"]
+        state["increments"] += 1
+        state["rows_since_rebuild"] += new_rows
+    entry.update(seconds=round(time.perf_counter() - start, 1), time=time.strftime("%Y-%m-%d %H:%M:%S"))
+    storage.put_bytes(STATE_KEY, json.dumps(state, indent=2))
+    record(entry)
+    print(f"✅ Retrain complete ({entry['action']}, {entry['seconds']}s).")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("❌ Retraining failed:", str(e))
+        raise e
+    print(profiler.summary(profiler.write(os.path.join(MODEL_DIR, PROFILE_FILE), "retrain")))
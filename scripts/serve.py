@@ -0,0 +1,314 @@
+# scripts/serve.py
+# Self-hosted ASGI server for the inference.py handlers (FastAPI + uvicorn), same contract as
+# the SageMaker container: GET /ping, POST /invocations (Content-Type / Accept as in input_fn /
+# output_fn), plus GET /metrics with the worker's stage timings.
+#
+#   python scripts/serve.py --model-dir /opt/ml/model --workers 4 --port 8080
+#   kill -HUP <master pid>     # reload the model now (also picked up by --watch polling)
+#
+# Pre-fork: the master loads the model once through model_fn, then forks the workers, which
+# all accept on one listening socket. A pickled forest is shared copy-on-write (the GC is frozen
+# around the fork so collections in the workers do not copy its pages); an exported flat_model
+# is memory-mapped, so its pages are shared through the page cache in any case.
+# predict runs on a per-worker thread pool, never on the event loop, so /ping and request
+# parsing stay responsive during a large batch (and INFERENCE_BATCH_WINDOW_MS can coalesce
+# concurrent requests across those threads).
+#
+# Hot reload: the master loads the new model, forks a new generation of workers and only when
+# they are accepting does it send SIGTERM to the old ones, which finish their in-flight requests
+# before exiting. If the new model fails to load or its workers fail to start, the old
+# generation keeps serving. A retiring worker first stops accepting and answers what it has
+# already accepted for --drain seconds, so clients see no reset connections during a swap.
+import argparse
+import asyncio
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import uvicorn
+from fastapi import FastAPI, Request, Response
+import inference
+import serving_log
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", default=os.environ.get("SM_MODEL_DIR", "/opt/ml/model"))
+    parser.add_argument("--host", default=os.environ.get("SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SERVE_PORT", 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVE_WORKERS", 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", 4)),
+                        help="predict threads per worker")
+    parser.add_argument("--watch", type=float, default=float(os.environ.get("SERVE_WATCH_S", 5)),
+                        help="seconds between checks of the model directory for changes (0: SIGHUP only)")
+    parser.add_argument("--drain", type=float, default=1.0,
+                        help="seconds a retiring worker keeps answering connections it already accepted")
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="seconds a retiring worker gets to finish its requests")
+    parser.add_argument("--start-timeout", type=float, default=120,
+                        help="seconds a new generation of workers gets to start accepting")
+    return parser.parse_args(argv)
+
+# ---------------- APP (one per worker) ---------------- #
+def invoke(body, content_type, accept, model):
+    return inference.output_fn(inference.predict_fn(inference.input_fn(body, content_type), model), accept)
+
+def create_app(model, threads=4, ready_fd=None):
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="predict")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if ready_fd is not None:
+            os.write(ready_fd, b"1")  # tells the master this worker is about to accept
+            os.close(ready_fd)
+        yield
+        executor.shutdown(wait=True)
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/ping")
+    async def ping():
+        return Response(status_code=200)
+
+    @app.get("/metrics")
+    async def metrics():
+        return dict(inference.metrics_snapshot(), pid=os.getpid())
+
+    @app.post("/invocations")
+    async def invocations(request: Request):
+        body = await request.body()
+        content_type = request.headers.get("content-type", "text/csv")
+        accept = request.headers.get("accept", "*/*").split(",")[0].strip()
+        if accept in ("", "*/*"):
+            accept = content_type  # SageMaker answers in the request's content type by default
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                executor, invoke, body, content_type, accept, model)
+        except ValueError as e:  # unparseable input or unsupported content type
+            return Response(str(e), status_code=400, media_type="text/plain")
+        return Response(result, media_type=accept.split(";")[0].strip())
+
+    return app
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server whose SIGTERM first stops accepting, then shuts down drain_s later.
+
+    uvicorn's own shutdown closes every connection that has no request in flight, including
+    ones it accepted from the shared socket a moment ago whose request has not been read yet;
+    while the worker drains, those requests arrive and are answered, and new connections go
+    to the other generation.
+    """
+
+    def __init__(self, config, drain_s):
+        super().__init__(config)
+        self.drain_s = drain_s
+        self.drain_deadline = None
+
+    def handle_exit(self, sig, frame):
+        if sig == signal.SIGTERM and self.drain_deadline is None and self.drain_s > 0:
+            self.drain_deadline = time.monotonic() + self.drain_s
+        else:
+            super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter):
+        if self.drain_deadline is not None and not self.should_exit:
+            for server in self.servers:
+                server.close()  # idempotent; runs on the event loop, not in the signal handler
+            if time.monotonic() >= self.drain_deadline:
+                self.should_exit = True
+        return await super().on_tick(counter)
+
+def run_worker(sock, model, args, ready_fd):
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)  # reloads are the master's business
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    for sig in (signal.SIGTERM, signal.SIGINT):  # uvicorn installs its own once it runs
+        signal.signal(sig, signal.SIG_DFL)
+    app = create_app(model, args.threads, ready_fd)
+    server = DrainingServer(uvicorn.Config(app, log_level="warning", access_log=False, lifespan="on"), args.drain)
+    server.run(sockets=[sock])  # SIGTERM: drain, then uvicorn's graceful shutdown
+
+# ---------------- MASTER ---------------- #
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def model_signature(model_dir):
+    """(path, size, mtime) of every file under model_dir; changes when a new model is written."""
+    files = []
+    for root, _, names in os.walk(model_dir):
+        for name in names:
+            st = os.stat(os.path.join(root, name))
+            files.append((os.path.join(root, name), st.st_size, st.st_mtime_ns))
+    return tuple(sorted(files))
+
+class Master:
+    """Forks and supervises the workers; swaps generations on reload."""
+
+    def __init__(self, args):
+        self.args = args
+        self.sock = bind_socket(args.host, args.port)
+        self.model = None
+        self.signature = None
+        self.last_seen = None
+        self.workers = set()   # pids of the current generation
+        self.retiring = {}     # pid -> deadline for the SIGKILL
+        self.stopping = False
+        self.reload_requested = False
+
+    def load(self):
+        signature = model_signature(self.args.model_dir)
+        self.model = inference.model_fn(self.args.model_dir)
+        self.signature = signature
+
+    def fork_worker(self, ready_fd):
+        gc.collect()
+        gc.freeze()  # the loaded model moves to the permanent generation: no GC writes to its pages
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, self.model, self.args, ready_fd)
+            except BaseException:
+                code = 1
+                inference.log.exception("❌ Worker failed")
+            finally:
+                serving_log.stop_listeners()
+                sys.stdout.flush()
+                os._exit(code)
+        gc.unfreeze()
+        return pid
+
+    def spawn(self, n):
+        """Fork n workers; returns their pids once all accept, or None (and kills them) on timeout."""
+        read_fd, write_fd = os.pipe()
+        pids = [self.fork_worker(write_fd) for _ in range(n)]
+        os.close(write_fd)
+        ready, deadline = 0, time.monotonic() + self.args.start_timeout
+        while ready < n and time.monotonic() < deadline:
+            readable, _, _ = select.select([read_fd], [], [], max(0.0, deadline - time.monotonic()))
+            if not readable:
+                break
+            data = os.read(read_fd, n)
+            if not data:  # every worker exited or closed its end without reporting
+                break
+            ready += len(data)
+        os.close(read_fd)
+        if ready < n:
+            for pid in pids:
+                self.kill(pid, signal.SIGKILL)
+            return None
+        return set(pids)
+
+    def kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def retire(self, pids):
+        for pid in pids:
+            self.kill(pid, signal.SIGTERM)
+            self.retiring[pid] = time.monotonic() + self.args.graceful_timeout
+
+    def reload(self):
+        self.reload_requested = False
+        print(f"🔹 Reloading model from {self.args.model_dir}", flush=True)
+        try:
+            self.load()
+        except Exception:
+            print("❌ Reload failed, the current workers keep serving", flush=True)
+            return
+        workers = self.spawn(self.args.workers)
+        if workers is None:
+            print("❌ New workers did not start, the current workers keep serving", flush=True)
+            return
+        old, self.workers = self.workers, workers
+        self.retire(old)
+        print(f"✅ Reloaded: {len(workers)} new workers, {len(old)} retiring", flush=True)
+
+    def reap(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.retiring.pop(pid, None)
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if not self.stopping:
+                    print(f"❌ Worker {pid} exited, starting a replacement", flush=True)
+                    self.workers |= self.spawn(1) or set()
+
+    def model_changed(self):
+        """True once a changed model directory has stayed the same for a whole watch interval,
+        so a model that is still being written is not picked up half-way."""
+        current = model_signature(self.args.model_dir)
+        changed = current != self.signature and current == self.last_seen
+        self.last_seen = current
+        return changed
+
+    def request_reload(self, *_):
+        self.reload_requested = True
+
+    def request_stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        # Before the first fork: a SIGTERM during start-up must still stop the workers
+        signal.signal(signal.SIGHUP, self.request_reload)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        self.load()
+        self.workers = self.spawn(self.args.workers)
+        if self.workers is None:
+            raise RuntimeError("Workers did not start")
+        print(f"✅ Serving on {self.args.host}:{self.args.port} with {len(self.workers)} workers "
+              f"(master {os.getpid()})", flush=True)
+        next_check = time.monotonic() + self.args.watch
+        while not self.stopping:
+            time.sleep(0.2)
+            self.reap()
+            if self.args.watch > 0 and time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.args.watch
+                if self.model_changed():
+                    self.reload_requested = True
+            if self.reload_requested:
+                self.reload()
+            for pid, deadline in list(self.retiring.items()):
+                if time.monotonic() > deadline:
+                    self.kill(pid, signal.SIGKILL)
+        self.shutdown()
+
+    def shutdown(self):
+        self.retire(self.workers)
+        self.workers = set()
+        while self.retiring:
+            time.sleep(0.1)
+            self.reap()
+            for pid, deadline in list(self.retiring.items()):
+                if time.monotonic() > deadline:
+                    self.kill(pid, signal.SIGKILL)
+        self.sock.close()
+        print("✅ Server stopped", flush=True)
+
+def main(argv=None):
+    code = 0
+    try:
+        Master(parse_args(argv)).run()
+    except BaseException:
+        code = 1
+        inference.log.exception("❌ Server failed")
+    sys.exit(code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# scripts/serving_log.py
+# Logging and stage timers for the inference handlers. Per-request events are DEBUG/INFO,
+# which the default WARNING level drops before any formatting; when enabled they go through
+# a QueueHandler so the request thread never waits on a stdout write.
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.environ.get("INFERENCE_LOG_LEVEL", "WARNING").upper()
+
+_listeners = []  # (QueueHandler, QueueListener) per logger
+
+def _start_listener(handler, stream):
+    listener = logging.handlers.QueueListener(handler.queue, stream)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+def get_logger(name="rossmann.inference"):
+    """Logger whose records are written to stdout by a background listener thread."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.handlers.QueueHandler(queue.Queue(-1))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        _listeners.append((handler, _start_listener(handler, stream)))
+    return logger
+
+def _restart_listeners():
+    """A forked worker (serve.py) inherits the queues but not the listener threads: give it
+    fresh queues, since the parent's listener may have held a queue lock at fork time."""
+    for i, (handler, listener) in enumerate(_listeners):
+        handler.queue = queue.Queue(-1)
+        _listeners[i] = (handler, _start_listener(handler, *listener.handlers))
+
+def stop_listeners():
+    """Write out queued records; for processes that leave through os._exit (serve.py workers)."""
+    for _, listener in _listeners:
+        if listener._thread is not None:
+            listener.stop()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners)
+
+class StageMetrics:
+    """Thread-safe per-stage call counts and wall time (count, total, max seconds)."""
+
+    def __init__(self, stages=("parse", "predict", "serialize")):
+        self.lock = threading.Lock()
+        self.stages = tuple(stages)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {s: 0 for s in self.stages}
+            self.totals = {s: 0.0 for s in self.stages}
+            self.maxima = {s: 0.0 for s in self.stages}
+            self.errors = {s: 0 for s in self.stages}
+
+    def record(self, stage, seconds, error=False):
+        with self.lock:
+            self.counts[stage] += 1
+            self.totals[stage] += seconds
+            if seconds > self.maxima[stage]:
+                self.maxima[stage] = seconds
+            if error:
+                self.errors[stage] += 1
+
+    def timed(self, stage):
+        return _StageTimer(self, stage)
+
+    def snapshot(self):
+        """{stage: {"count", "errors", "total_ms", "mean_ms", "max_ms"}}"""
+        with self.lock:
+            return {
+                s: {
+                    "count": self.counts[s],
+                    "errors": self.errors[s],
+                    "total_ms": self.totals[s] * 1e3,
+                    "mean_ms": self.totals[s] * 1e3 / self.counts[s] if self.counts[s] else 0.0,
+                    "max_ms": self.maxima[s] * 1e3,
+                }
+                for s in self.stages
+            }
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics, self.stage = metrics, stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.stage, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
@@ -0,0 +1,188 @@
+# scripts/stage_cache.py
+# Content-addressed cache of pipeline stage outputs. A stage's key hashes its input objects,
+# the source files it runs and its parameters, so a hit means running the stage again would
+# only reproduce the cached outputs; they are copied back into place instead.
+#
+# Layout under the cache prefix (any storage backend: a local directory by default, or the
+# bucket with STAGE_CACHE_BUCKET):
+#   blobs/<sha256>        output bytes, shared by every entry that produced the same content
+#   entries/<key>.json    stage, outputs (name -> blob, size), metadata, created / last used
+# Past the byte budget the least recently used entries are dropped, then unreferenced blobs.
+#
+#   python scripts/stage_cache.py --report
+#   python scripts/stage_cache.py --evict --max-bytes 5000000000
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from storage import LocalStorage, S3Storage
+
+CACHE_ROOT = os.environ.get("STAGE_CACHE_ROOT", os.path.join(os.path.expanduser("~"), ".cache", "rossmann-stages"))
+CACHE_BUCKET = os.environ.get("STAGE_CACHE_BUCKET")  # set to keep the cache in S3 instead
+CACHE_PREFIX = "rossmann-stage-cache/"
+MAX_BYTES = int(os.environ.get("STAGE_CACHE_MAX_BYTES", 10 * 2**30))
+COPY_CHUNK = 1024 * 1024
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def stage_spec(stage, inputs=None, code=(), params=None):
+    """What a stage's result depends on: {input name: digest}, its source files and parameters."""
+    return {
+        "stage": stage,
+        "inputs": inputs or {},
+        "code": {os.path.basename(p): file_digest(p) for p in code},
+        "params": params or {},
+    }
+
+def spec_key(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+def stage_key(stage, inputs=None, code=(), params=None):
+    return spec_key(stage_spec(stage, inputs, code, params))
+
+def spec_changes(old, new):
+    """Human-readable differences between two stage specs, e.g. ["code: train.py"]."""
+    changes = []
+    for section in ["inputs", "code", "params"]:
+        a, b = old.get(section, {}), new.get(section, {})
+        changed = sorted(k for k in set(a) | set(b) if a.get(k) != b.get(k))
+        if changed:
+            changes.append(f"{section}: {', '.join(changed)}")
+    return changes
+
+class StageCache:
+    """Stage outputs keyed by stage_key, stored on a storage backend under `prefix`."""
+
+    def __init__(self, store, prefix=CACHE_PREFIX, max_bytes=MAX_BYTES):
+        self.store = store
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+
+    def _entry_key(self, key):
+        return f"{self.prefix}entries/{key}.json"
+
+    def _blob_key(self, digest):
+        return f"{self.prefix}blobs/{digest}"
+
+    # ---- lookup ----
+    def get(self, key, touch=True):
+        """The entry for key (a dict), or None. A hit counts as a use for eviction."""
+        entry_key = self._entry_key(key)
+        if not self.store.exists(entry_key):
+            return None
+        entry = json.loads(self.store.read_bytes(entry_key))
+        if touch:
+            entry["last_used"] = time.time()
+            self.store.put_bytes(entry_key, json.dumps(entry, indent=2))
+        return entry
+
+    def fetch(self, entry, name, path):
+        """Copy one output of an entry to a local path."""
+        self.store.download_file(self._blob_key(entry["outputs"][name]["blob"]), path)
+        return path
+
+    def restore_objects(self, entry, storage):
+        """Write every output back to `storage`, outputs being named by their storage keys."""
+        for name, output in entry["outputs"].items():
+            source = self.store.open(self._blob_key(output["blob"]))
+            try:
+                with storage.open_writer(name) as target:
+                    shutil.copyfileobj(source, target, COPY_CHUNK)
+            finally:
+                source.close()
+        return list(entry["outputs"])
+
+    # ---- store ----
+    def put(self, key, stage, files, meta=None, spec=None):
+        """Cache local files {output name: path} as the outputs of `stage` under key."""
+        outputs = {}
+        for name, path in files.items():
+            digest = file_digest(path)
+            if not self.store.exists(self._blob_key(digest)):
+                self.store.upload_file(path, self._blob_key(digest))
+            outputs[name] = {"blob": digest, "size": os.path.getsize(path)}
+        now = time.time()
+        entry = {"key": key, "stage": stage, "outputs": outputs, "meta": meta or {}, "spec": spec,
+                 "created": now, "last_used": now}
+        # Written after its blobs: an entry only exists once it is complete
+        self.store.put_bytes(self._entry_key(key), json.dumps(entry, indent=2))
+        self.evict()
+        return entry
+
+    def put_objects(self, key, stage, storage, keys, meta=None, spec=None):
+        """Cache storage objects (named by their keys) as the outputs of `stage`."""
+        workdir = tempfile.mkdtemp(prefix="stage-cache-")
+        try:
+            files = {}
+            for i, name in enumerate(keys):
+                files[name] = os.path.join(workdir, str(i))
+                storage.download_file(name, files[name])
+            return self.put(key, stage, files, meta, spec)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # ---- housekeeping ----
+    def entries(self):
+        return [json.loads(self.store.read_bytes(k)) for k, _ in self.store.list_keys(self.prefix + "entries/")]
+
+    def latest(self, stage):
+        """Most recently used entry of a stage, or None."""
+        entries = [e for e in self.entries() if e["stage"] == stage]
+        return max(entries, key=lambda e: e["last_used"]) if entries else None
+
+    def evict(self, max_bytes=None):
+        """Drop least recently used entries until the blobs they keep fit in max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e["last_used"])
+        blob_sizes = {k[len(self.prefix + "blobs/"):]: size for k, size in self.store.list_keys(self.prefix + "blobs/")}
+        evicted = []
+        while entries and self._referenced_bytes(entries, blob_sizes) > max_bytes:
+            entry = entries.pop(0)
+            self.store.delete(self._entry_key(entry["key"]))
+            evicted.append(entry["key"])
+        live = {o["blob"] for e in entries for o in e["outputs"].values()}
+        for digest in set(blob_sizes) - live:
+            self.store.delete(self._blob_key(digest))
+        return evicted
+
+    @staticmethod
+    def _referenced_bytes(entries, blob_sizes):
+        blobs = {o["blob"] for e in entries for o in e["outputs"].values()}
+        return sum(blob_sizes.get(b, 0) for b in blobs)
+
+    def report(self):
+        rows = []
+        for entry in sorted(self.entries(), key=lambda e: -e["last_used"]):
+            size = sum(o["size"] for o in entry["outputs"].values())
+            rows.append(f"{entry['stage']:>18} {entry['key'][:12]} {len(entry['outputs']):>3} outputs "
+                        f"{size / 2**20:9.1f}MB  last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))}")
+        return "\n".join(rows) or "(empty)"
+
+def get_cache(max_bytes=MAX_BYTES):
+    """Local directory cache (STAGE_CACHE_ROOT), or the STAGE_CACHE_BUCKET bucket when set."""
+    if CACHE_BUCKET:
+        return StageCache(S3Storage(CACHE_BUCKET), CACHE_PREFIX, max_bytes)
+    return StageCache(LocalStorage(CACHE_ROOT), "", max_bytes)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report", action="store_true")
+    parser.add_argument("--evict", action="store_true")
+    parser.add_argument("--max-bytes", type=int, default=MAX_BYTES)
+    args = parser.parse_args()
+    cache = get_cache(args.max_bytes)
+    if args.evict:
+        evicted = cache.evict()
+        print(f"🔹 Evicted {len(evicted)} entries")
+    print(cache.report())
+
+if __name__ == "__main__":
+    main()
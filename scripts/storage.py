@@ -0,0 +1,411 @@
+# scripts/storage.py
+# Where pipeline artifacts live: the S3 bucket in SageMaker, a local directory offline,
+# or an in-process dict for tests. Writes stream through a bounded buffer and reads
+# come back as streams/chunk iterators, so no stage holds a whole serialized object.
+import hashlib
+import io
+import os
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+BUCKET = "rossmann-sales-bucket"
+
+# Multipart part size (S3 minimum is 5MB) and how many parts may be in flight per writer
+PART_SIZE = int(os.environ.get("ROSSMANN_S3_PART_SIZE", 8 * 1024 * 1024))
+MAX_CONCURRENCY = int(os.environ.get("ROSSMANN_S3_CONCURRENCY", 8))
+READ_CHUNK_SIZE = 1024 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+
+def shared_client():
+    """One pooled S3 client per process (boto3 clients are thread-safe)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import boto3
+            from botocore.config import Config
+            _client = boto3.client("s3", config=Config(
+                max_pool_connections=MAX_CONCURRENCY * 2,
+                retries={"max_attempts": 5, "mode": "standard"},
+            ))
+        return _client
+
+def transfer_config():
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=PART_SIZE,
+        multipart_chunksize=PART_SIZE,
+        max_concurrency=MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+# ---------------- S3 ---------------- #
+class S3MultipartWriter(io.RawIOBase):
+    """Write-only stream that ships every PART_SIZE bytes as a multipart part.
+
+    At most MAX_CONCURRENCY parts are uploading at once, so memory stays around
+    (MAX_CONCURRENCY + 1) * PART_SIZE whatever the object size. Objects smaller
+    than one part fall back to a single put_object.
+    """
+
+    def __init__(self, client, bucket, key, part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY):
+        super().__init__()
+        self.client, self.bucket, self.key = client, bucket, key
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.max_concurrency = max_concurrency
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.pool = None
+        self.pending = deque()
+        self.parts = []
+        self.discarded = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self.discarded:
+            return len(data)
+        self.buffer.extend(data)
+        while len(self.buffer) >= self.part_size:
+            self._ship(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def _ship(self, body):
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+            self.pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        while len(self.pending) >= self.max_concurrency:
+            self.parts.append(self.pending.popleft().result())
+        number = len(self.parts) + len(self.pending) + 1
+        self.pending.append(self.pool.submit(self._upload_part, number, body))
+
+    def _upload_part(self, number, body):
+        etag = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=body
+        )["ETag"]
+        return {"PartNumber": number, "ETag": etag}
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+        self.close()
+
+    def discard(self):
+        """Drop everything written so far; close() then uploads nothing."""
+        self.abort()
+        self.buffer = bytearray()
+        self.discarded = True
+
+    def close(self):
+        if self.closed:
+            return
+        if self.discarded:
+            super().close()
+            return
+        try:
+            if self.upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self._ship(bytes(self.buffer))
+                while self.pending:
+                    self.parts.append(self.pending.popleft().result())
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                    MultipartUpload={"Parts": self.parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
+            super().close()
+
+    def abort(self):
+        if self.upload_id is not None:
+            for future in self.pending:
+                future.cancel()
+            self.pending.clear()
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+class S3RangeReader(io.RawIOBase):
+    """Seekable read-only view of an object, fetched with ranged GETs.
+
+    Parquet readers only touch the footer and the column chunks they need.
+    """
+
+    def __init__(self, client, bucket, key):
+        super().__init__()
+        self.client, self.bucket, self.key = client, bucket, key
+        self.size = client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def read(self, size=-1):
+        end = self.size if size is None or size < 0 else min(self.size, self.pos + size)
+        if self.pos >= end:
+            return b""
+        body = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={self.pos}-{end - 1}"
+        )["Body"]
+        data = body.read()
+        self.pos += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+class S3Storage:
+    def __init__(self, bucket=BUCKET, client=None):
+        self.bucket = bucket
+        self.client = client or shared_client()
+
+    def put_bytes(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def open(self, key):
+        """Readable binary stream over the object body."""
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+
+    def open_writer(self, key):
+        return S3MultipartWriter(self.client, self.bucket, key)
+
+    def open_seekable(self, key):
+        return S3RangeReader(self.client, self.bucket, key)
+
+    def iter_chunks(self, key, chunk_size=READ_CHUNK_SIZE):
+        body = self.open(key)
+        try:
+            for chunk in iter(lambda: body.read(chunk_size), b""):
+                yield chunk
+        finally:
+            body.close()
+
+    def read_bytes(self, key):
+        return b"".join(self.iter_chunks(key))
+
+    def upload_file(self, path, key):
+        self.client.upload_file(path, self.bucket, key, Config=transfer_config())
+
+    def download_file(self, key, path):
+        self.client.download_file(self.bucket, key, path, Config=transfer_config())
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def list_keys(self, prefix):
+        """(key, size) of every object under prefix."""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["Size"]
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def digest(self, key):
+        """Content identifier without reading the body: the ETag (MD5 for single-part uploads)."""
+        return self.client.head_object(Bucket=self.bucket, Key=key)["ETag"].strip('"')
+
+    def local_path(self, key):
+        return None
+
+# ---------------- LOCAL DIRECTORY ---------------- #
+class _AtomicFileWriter(io.FileIO):
+    """Writes to key.partial and renames on close, like an S3 object appearing on completion."""
+
+    def __init__(self, path):
+        self.final_path = path
+        self.discarded = False
+        super().__init__(path + ".partial", "wb")
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+        self.close()
+
+    def discard(self):
+        """close() then deletes the .partial file and leaves any existing object as it was."""
+        self.discarded = True
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            if self.discarded:
+                os.remove(self.final_path + ".partial")
+            else:
+                os.replace(self.final_path + ".partial", self.final_path)
+
+class LocalStorage:
+    """Same interface on a directory tree (key "a/b.csv" -> root/a/b.csv)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def _target(self, key):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def put_bytes(self, key, data):
+        with self.open_writer(key) as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def open(self, key):
+        return open(self.local_path(key), "rb")
+
+    def open_writer(self, key):
+        return _AtomicFileWriter(self._target(key))
+
+    def open_seekable(self, key):
+        return self.open(key)
+
+    def iter_chunks(self, key, chunk_size=READ_CHUNK_SIZE):
+        with self.open(key) as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+
+    def read_bytes(self, key):
+        with self.open(key) as f:
+            return f.read()
+
+    def upload_file(self, path, key):
+        shutil.copyfile(path, self._target(key))
+
+    def download_file(self, key, path):
+        shutil.copyfile(self.local_path(key), path)
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def list_keys(self, prefix):
+        top = os.path.join(self.root, os.path.dirname(prefix))
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and not filename.endswith(".partial"):
+                    yield key, os.path.getsize(path)
+
+    def delete(self, key):
+        os.remove(self.local_path(key))
+
+    def digest(self, key):
+        return md5_digest(self.iter_chunks(key))
+
+def md5_digest(chunks):
+    h = hashlib.md5()
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+# ---------------- IN-PROCESS ---------------- #
+class _MemoryWriter(io.BytesIO):
+    def __init__(self, objects, key):
+        super().__init__()
+        self.objects, self.key = objects, key
+        self.discarded = False
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+        self.close()
+
+    def discard(self):
+        """close() then stores nothing."""
+        self.discarded = True
+
+    def close(self):
+        if not self.closed and not self.discarded:
+            self.objects[self.key] = self.getvalue()
+        super().close()
+
+class MemoryStorage:
+    """Dict-backed storage for tests and benchmarks that must not touch disk or S3."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def local_path(self, key):
+        return None
+
+    def put_bytes(self, key, data):
+        self.objects[key] = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+
+    def open(self, key):
+        return io.BytesIO(self.objects[key])
+
+    def open_writer(self, key):
+        return _MemoryWriter(self.objects, key)
+
+    def open_seekable(self, key):
+        return self.open(key)
+
+    def iter_chunks(self, key, chunk_size=READ_CHUNK_SIZE):
+        data = self.objects[key]
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    def read_bytes(self, key):
+        return self.objects[key]
+
+    def upload_file(self, path, key):
+        with open(path, "rb") as f:
+            self.put_bytes(key, f.read())
+
+    def download_file(self, key, path):
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+    def exists(self, key):
+        return key in self.objects
+
+    def list_keys(self, prefix):
+        return [(k, len(v)) for k, v in sorted(self.objects.items()) if k.startswith(prefix)]
+
+    def delete(self, key):
+        del self.objects[key]
+
+    def digest(self, key):
+        return md5_digest([self.objects[key]])
+
+def get_storage(bucket=BUCKET):
+    """ROSSMANN_STORAGE_ROOT=/some/dir switches every stage to the local backend."""
+    root = os.environ.get("ROSSMANN_STORAGE_ROOT")
+    if root:
+        return LocalStorage(os.path.join(root, bucket))
+    return S3Storage(bucket)
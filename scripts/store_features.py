@@ -0,0 +1,74 @@
+# scripts/store_features.py
+# Store-constant features, computed once per store (1,115 rows) and gathered onto daily rows
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+
+# Bump when the table layout or any derived column changes
+STORE_FEATURES_VERSION = 1
+
+# Month abbreviations as produced by strftime("%b"). PromoInterval tokens that are
+# not in this table (e.g. Rossmann's "Sept") never match, same as the old string test.
+MONTH_BITS = {
+    name: 1 << i for i, name in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    )
+}
+
+# Store columns that end up in the processed datasets, in output order
+STORE_OUTPUT_COLUMNS = ["StoreType", "Assortment", "CompetitionDistance"]
+
+def promo_interval_mask(promo_interval):
+    """Map each PromoInterval string to a 12-bit month mask (bit 0 = January)."""
+    codes, uniques = pd.factorize(promo_interval)
+    masks = np.array([
+        sum(MONTH_BITS.get(m, 0) for m in s.split(",")) if s != "NoPromo" else 0
+        for s in uniques
+    ], dtype=np.int64)
+    return masks[codes]
+
+def build_store_features(store_df):
+    """One row per store with every value that does not depend on the date."""
+    promo_interval = store_df["PromoInterval"].fillna("NoPromo")
+    return pd.DataFrame({
+        "Store": store_df["Store"].to_numpy(),
+        "StoreType": store_df["StoreType"].to_numpy(),
+        "Assortment": store_df["Assortment"].to_numpy(),
+        "CompetitionDistance": np.log1p(store_df["CompetitionDistance"]).to_numpy(),
+        "CompetitionOpenSinceMonth": store_df["CompetitionOpenSinceMonth"].fillna(0).astype(int).to_numpy(),
+        "CompetitionOpenSinceYear": store_df["CompetitionOpenSinceYear"].fillna(0).astype(int).to_numpy(),
+        "Promo2": store_df["Promo2"].to_numpy(),
+        "Promo2SinceWeek": store_df["Promo2SinceWeek"].fillna(0).astype(int).to_numpy(),
+        "Promo2SinceYear": store_df["Promo2SinceYear"].fillna(0).astype(int).to_numpy(),
+        "PromoMonthMask": promo_interval_mask(promo_interval.to_numpy()),
+    })
+
+def store_positions(table, stores):
+    """Row position in `table` for every entry of `stores` (-1 for unknown stores)."""
+    ids = table["Store"].to_numpy()
+    stores = np.asarray(stores, dtype=np.int64)
+    size = max(int(ids.max()), int(stores.max()) if len(stores) else 0) + 1
+    lookup = np.full(size, -1, dtype=np.int64)
+    lookup[ids] = np.arange(len(ids))
+    return lookup[stores]
+
+def gather(table, column, pos):
+    return table[column].to_numpy()[pos]
+
+# ---------------- VERSIONED ARTIFACT ---------------- #
+def store_csv_fingerprint(store_df):
+    return hashlib.sha256(pd.util.hash_pandas_object(store_df, index=False).values.tobytes()).hexdigest()
+
+def save_store_features(table, target, fingerprint):
+    """`target` is a path or a writable binary stream."""
+    joblib.dump({"version": STORE_FEATURES_VERSION, "fingerprint": fingerprint, "table": table}, target)
+
+def load_store_features(source, fingerprint=None):
+    """Return the cached table, or None if it is stale (other version or other store.csv)."""
+    payload = joblib.load(source)
+    if payload.get("version") != STORE_FEATURES_VERSION:
+        return None
+    if fingerprint is not None and payload.get("fingerprint") != fingerprint:
+        return None
+    return payload["table"]
@@ -1,13 +1,20 @@
-import os, json, joblib, boto3
+from instrument import profiler, peak_rss_mb, PROFILE_FILE  # first: its clock times the imports below
+import os, re, json, time, joblib, shutil, tempfile, multiprocessing
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression, Ridge, Lasso
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, AdaBoostRegressor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.feature_selection import SelectFromModel
-from xgboost import XGBRegressor
+from threadpoolctl import threadpool_limits
+from storage import get_storage
+from dataio import read_dataset, read_matrix, split_rows
+from flat_model import export_model
+from features import package_transform
+from binning import QuantileBinner, binned_pipeline, hist_gbm
+from feature_selection import fingerprint, selection_key, run_selection, load_selection, save_selection
+from stage_cache import StageCache, CACHE_PREFIX
+
+# Estimators, xgboost and matplotlib are imported where they are first used
+profiler.mark("import")
 
 # ---------------- CONFIG ----------------
 BUCKET = "rossmann-sales-bucket"
@@ -15,134 +22,270 @@ PROC_PREFIX = "rossmann-processed/"
 MODEL_PREFIX = "rossmann-trained-models/"
 RESULTS_PREFIX = "rossmann-model-results/"
 FEATURES_PREFIX = "rossmann-selected-features/"
+ART_PREFIX = "rossmann-artifacts/"
+MODEL_DIR = os.environ.get("SM_MODEL_DIR", "/opt/ml/model")
 
-os.makedirs("/tmp", exist_ok=True)
-s3 = boto3.client("s3")
+# CPU budget shared by all concurrent fits; multi-threaded ensembles get HEAVY_N_JOBS of it
+N_CPUS = int(os.environ.get("TRAIN_N_CPUS", os.cpu_count() or 1))
+HEAVY_N_JOBS = int(os.environ.get("TRAIN_HEAVY_N_JOBS", max(1, N_CPUS // 2)))
 
-try:
-    # ---------------- Load Data ----------------
-    def load_csv(key):
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
-        return pd.read_csv(obj["Body"])
+MODEL_NAMES = ["LinearRegression", "Ridge", "Lasso", "RandomForest", "GradientBoosting", "AdaBoost", "XGBoost",
+               "HistGradientBoosting"]
+HEAVY_MODELS = {"RandomForest", "XGBoost", "HistGradientBoosting"}
+# Fitted on the shared uint8 bin codes instead of the float matrix
+BINNED_MODELS = {"HistGradientBoosting"}
+# Feature selection: reuse | hist | permutation (see feature_selection.py); 0 disables its cache
+SELECTION_MODE = os.environ.get("TRAIN_SELECTION_MODE", "reuse")
+SELECTION_CACHE = os.environ.get("TRAIN_SELECTION_CACHE", "1") != "0"
+# In reuse mode the selection fits are these models' "all" fits
+REUSED_MODELS = ["RandomForest", "XGBoost"]
+PLOT_FILES = {"Random Forest": "rf_feature_importances.png", "XGBoost": "xgb_feature_importances.png"}
+# Longest fits are submitted first so the tail of the schedule is short
+SUBMIT_ORDER = ["RandomForest", "XGBoost", "GradientBoosting", "AdaBoost", "HistGradientBoosting",
+                "Lasso", "Ridge", "LinearRegression"]
+
+storage = get_storage(BUCKET)
+
+# ---------------- Define Models ----------------
+def make_model(name, n_jobs=1):
+    # Imported per branch: a run (or a pool worker) only pays for the estimators it fits
+    if name == "LinearRegression":
+        from sklearn.linear_model import LinearRegression
+        return LinearRegression()
+    if name == "Ridge":
+        from sklearn.linear_model import Ridge
+        return Ridge(alpha=1.0)
+    if name == "Lasso":
+        from sklearn.linear_model import Lasso
+        return Lasso(alpha=0.1)
+    if name == "RandomForest":
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    if name == "GradientBoosting":
+        from sklearn.ensemble import GradientBoostingRegressor
+        return GradientBoostingRegressor(n_estimators=100, random_state=42)
+    if name == "AdaBoost":
+        from sklearn.ensemble import AdaBoostRegressor
+        return AdaBoostRegressor(n_estimators=100, random_state=42)
+    if name == "XGBoost":
+        from xgboost import XGBRegressor
+        return XGBRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    if name == "HistGradientBoosting":
+        return hist_gbm(max_iter=100)
+    raise ValueError(f"Unknown model: {name}")
+
+def evaluate(y_true, preds):
+    return {
+        "RMSE": float(np.sqrt(mean_squared_error(y_true, preds))),
+        "MAE": float(mean_absolute_error(y_true, preds)),
+        "R2": float(r2_score(y_true, preds))
+    }
+
+# ---------------- Parallel Training ----------------
+def fit_task(name, feature_set, n_jobs, matrix_dir, n_train, out_dir):
+    """Worker: fit one model on the memory-mapped matrices and pickle it to out_dir.
+
+    Each matrix holds the n_train training rows followed by the validation rows, so both sets are
+    zero-copy slices of one float32 memmap that sklearn and XGBoost take as-is. Histogram-based
+    models read the uint8 bin codes (B_*.npy) and are pickled behind the binner that made them.
+    """
+    load = lambda f: np.load(os.path.join(matrix_dir, f), mmap_mode="r")
+    binned = name in BINNED_MODELS
+    X, y = load(f"{'B' if binned else 'X'}_{feature_set}.npy"), load("y.npy")
+    X_train, X_val = X[:n_train], X[n_train:]
+    y_train, y_val = y[:n_train], y[n_train:]
+
+    timings = {}
+    with threadpool_limits(limits=n_jobs):
+        start = time.perf_counter()
+        model = make_model(name, n_jobs)
+        model.fit(X_train, y_train)
+        timings["fit"] = time.perf_counter() - start
+        start = time.perf_counter()
+        metrics = evaluate(y_val, model.predict(X_val))
+        timings["predict"] = time.perf_counter() - start
+    if binned:
+        model = binned_pipeline(joblib.load(os.path.join(matrix_dir, f"binner_{feature_set}.pkl")), model)
+
+    path = os.path.join(out_dir, f"{name}_{feature_set}.pkl")
+    joblib.dump(model, path)
+    return name, feature_set, metrics, path, dict(timings, peak_rss_mb=peak_rss_mb())
 
-    X = load_csv(PROC_PREFIX + "X_train.csv")
-    y = load_csv(PROC_PREFIX + "y_train.csv").values.ravel()
+def save_columns(path, X, cols, block_rows=100_000):
+    """Write X[:, cols] to a .npy file block by block instead of materializing the subset."""
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=X.dtype, shape=(len(X), len(cols)))
+    for start in range(0, len(X), block_rows):
+        out[start:start + block_rows] = X[start:start + block_rows][:, cols]
+    out.flush()
+    del out
 
-    # ---------------- Train/Test Split -----------------
-    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+def schedule(tasks, n_cpus, submit):
+    """Yield the results of submit(name, feature_set, n_jobs) futures as they finish, keeping
+    the sum of running n_jobs <= n_cpus. tasks: (name, feature_set, n_jobs), in submit order."""
+    pending = list(tasks)
+    running = {}
+    while pending or running:
+        free = n_cpus - sum(running.values())
+        for task in list(pending):
+            name, feature_set, n_jobs = task
+            n_jobs = min(n_jobs, n_cpus)
+            if n_jobs <= free or not running:
+                running[submit(name, feature_set, n_jobs)] = n_jobs
+                free -= n_jobs
+                pending.remove(task)
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            del running[future]
+            yield future.result()
+
+def run_parallel(tasks, n_cpus, matrix_dir, n_train, out_dir):
+    """Yield fit_task results as they finish (see schedule)."""
+    # Not forked from this process: its uploader, logging and profiler threads may hold locks
+    # at the moment of a fork, which the child would inherit locked
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    with ProcessPoolExecutor(max_workers=n_cpus, mp_context=context) as pool:
+        submit = lambda name, feature_set, n_jobs: pool.submit(
+            fit_task, name, feature_set, n_jobs, matrix_dir, n_train, out_dir)
+        yield from schedule(tasks, n_cpus, submit)
+
+# Save plots
+def save_plot(importances, columns, title, filename):
+    import matplotlib.pyplot as plt
+    sorted_idx = np.argsort(importances)
+    plt.figure(figsize=(10, 4))
+    plt.barh(np.array(columns)[sorted_idx], importances[sorted_idx], color='skyblue')
+    plt.axvline(np.median(importances), color='red', linestyle='--', label='Median')
+    plt.title(title)
+    plt.xlabel("Importance Score")
+    plt.grid(axis='x', linestyle='--', alpha=0.6)
+    plt.legend()
+    plt.tight_layout()
+    with storage.open_writer(FEATURES_PREFIX + filename) as f:
+        plt.savefig(f, format="png")
+    plt.close()
+
+def main():
+    # ---------------- Load Data ----------------
+    # One float32 matrix with the training rows first and the validation rows after them
+    # (same rows as train_test_split(test_size=0.2, random_state=42)), so both are views
+    with profiler.span("load"):
+        y = read_dataset(storage, PROC_PREFIX, "y_train", columns=["Sales"])["Sales"].to_numpy(np.float64)
+        train_rows, val_rows = split_rows(len(y), test_size=0.2, random_state=42)
+        order = np.concatenate([train_rows, val_rows])
+        X, columns = read_matrix(storage, PROC_PREFIX, "X_train", rows=order)
+        y = y[order]
+    n_train = len(train_rows)
+    X_train, y_train = X[:n_train], y[:n_train]
+    print(f"🔹 Training matrix {X.shape[0]:,d} x {X.shape[1]} float32 ({X.nbytes / 2**20:.1f}MB)")
 
     # ---------------- Feature Selection ----------------
-    X_sample, _, y_sample, _ = train_test_split(X_train, y_train, train_size=0.25, random_state=42)
-
-    rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-    rf_model.fit(X_sample, y_sample)
-    rf_importances = rf_model.feature_importances_
-    rf_selector = SelectFromModel(rf_model, threshold="median", prefit=True)
-    rf_selected = X_sample.columns[rf_selector.get_support()]
-
-    xgb_model = XGBRegressor(n_estimators=100, random_state=42, verbosity=0)
-    xgb_model.fit(X_sample, y_sample)  # no .to_numpy()
-    xgb_importances = xgb_model.feature_importances_
-    xgb_selector = SelectFromModel(xgb_model, threshold="median", prefit=True)
-    xgb_selected = X_sample.columns[xgb_selector.get_support()]
-
-    combined_features = list(set(rf_selected) | set(xgb_selected))
-    common_features = list(set(rf_selected) & set(xgb_selected))
-
-    # Save selected features txt
-    with open("/tmp/selected_features.txt", "w") as f:
-        f.write("Features selected by Random Forest:\n")
-        f.write("\n".join(rf_selected) + "\n\n")
-        f.write("Features selected by XGBoost:\n")
-        f.write("\n".join(xgb_selected) + "\n\n")
-        f.write("Combined (Union) Features:\n")
-        f.write("\n".join(combined_features) + "\n\n")
-        f.write("Common (Intersection) Features:\n")
-        f.write("\n".join(common_features) + "\n")
-    s3.upload_file("/tmp/selected_features.txt", BUCKET, FEATURES_PREFIX + "selected_features.txt")
-
-    # Save plots
-    def save_plot(importances, columns, title, filename):
-        sorted_idx = np.argsort(importances)
-        plt.figure(figsize=(10, 4))
-        plt.barh(np.array(columns)[sorted_idx], importances[sorted_idx], color='skyblue')
-        plt.axvline(np.median(importances), color='red', linestyle='--', label='Median')
-        plt.title(title)
-        plt.xlabel("Importance Score")
-        plt.grid(axis='x', linestyle='--', alpha=0.6)
-        plt.legend()
-        plt.tight_layout()
-        path = f"/tmp/{filename}"
-        plt.savefig(path)
-        s3.upload_file(path, BUCKET, FEATURES_PREFIX + filename)
-
-    save_plot(rf_importances, X_sample.columns, "Feature Importances - Random Forest", "rf_feature_importances.png")
-    save_plot(xgb_importances, X_sample.columns, "Feature Importances - XGBoost", "xgb_feature_importances.png")
+    # Cached in the stage cache: unchanged data and settings skip the stage. In "reuse" mode the
+    # selection models are the main loop's RandomForest_all / XGBoost_all fits.
+    X_val, y_val = X[n_train:], y[n_train:]
+    out_dir = tempfile.mkdtemp(prefix="train-models-")
+    reuse = {n: make_model(n, N_CPUS) for n in REUSED_MODELS} if SELECTION_MODE == "reuse" else {}
+    config = {"mode": SELECTION_MODE, "n_train": n_train,
+              "models": {n: {k: v for k, v in m.get_params().items() if k != "n_jobs"} for n, m in reuse.items()}}
+    key = selection_key(fingerprint(X, y, columns), config)
+    cache = StageCache(storage, CACHE_PREFIX)  # the pipeline bucket: the job's disk does not outlive it
+    selection = load_selection(cache, key, out_dir) if SELECTION_CACHE else None
+    if selection is not None:
+        print(f"✅ Feature selection unchanged ({key[:12]}), reusing cached result")
+    else:
+        print(f"🔹 Feature selection ({SELECTION_MODE})")
+        with profiler.span("feature_selection"):
+            selection = run_selection(SELECTION_MODE, X_train, y_train, X_val, y_val, columns,
+                                      models=reuse, model_dir=out_dir, evaluate=evaluate, n_jobs=N_CPUS)
+        if SELECTION_CACHE:
+            save_selection(cache, key, selection)
+    combined_features = selection.combined
+
+    storage.put_bytes(FEATURES_PREFIX + "selected_features.txt", selection.report())
+    with profiler.span("plots"):
+        for method, importances in selection.importances.items():
+            filename = PLOT_FILES.get(method, re.sub(r"\W+", "_", method.lower()).strip("_") + "_feature_importances.png")
+            save_plot(importances, columns, f"Feature Importances - {method}", filename)
 
     # Save selected features to JSON
-    with open("/tmp/selected_features.json", "w") as f:
-        json.dump(combined_features, f)
-    s3.upload_file("/tmp/selected_features.json", BUCKET, FEATURES_PREFIX + "selected_features.json")
-
-    # ---------------- Define Models ----------------
-    models = {
-        "LinearRegression": LinearRegression(),
-        "Ridge": Ridge(alpha=1.0),
-        "Lasso": Lasso(alpha=0.1),
-        "RandomForest": RandomForestRegressor(n_estimators=100, random_state=42),
-        "GradientBoosting": GradientBoostingRegressor(n_estimators=100, random_state=42),
-        "AdaBoost": AdaBoostRegressor(n_estimators=100, random_state=42),
-        "XGBoost": XGBRegressor(n_estimators=100, random_state=42)
-    }
+    storage.put_bytes(FEATURES_PREFIX + "selected_features.json", json.dumps(combined_features))
 
-    results = {}
+    # ---------------- Shared Training Matrices ----------------
+    # Written once and memory-mapped read-only by every worker instead of pickled per task
+    matrix_dir = tempfile.mkdtemp(prefix="train-matrices-")
+    selected_idx = [columns.index(c) for c in combined_features]
+    with profiler.span("matrices"):
+        np.save(os.path.join(matrix_dir, "X_all.npy"), X)
+        save_columns(os.path.join(matrix_dir, "X_selected.npy"), X, selected_idx)
+        np.save(os.path.join(matrix_dir, "y.npy"), y)
+        # Binned once for every histogram-based fit; the selected set reuses the same codes
+        binner = QuantileBinner().fit(X_train)
+        B = binner.transform(X)
+        np.save(os.path.join(matrix_dir, "B_all.npy"), B)
+        save_columns(os.path.join(matrix_dir, "B_selected.npy"), B, selected_idx)
+        joblib.dump(binner, os.path.join(matrix_dir, "binner_all.pkl"))
+        joblib.dump(binner.select(selected_idx), os.path.join(matrix_dir, "binner_selected.pkl"))
+        del B
+    del X, X_train, X_val
 
     # ---------------- Training Loop -------------------
-    for name, model in models.items():
-        print(f"\n📦 Training model: {name}")
+    # Models the selection stage already fitted are only uploaded
+    tasks = [
+        (name, feature_set, HEAVY_N_JOBS if name in HEAVY_MODELS else 1)
+        for name in SUBMIT_ORDER for feature_set in ["all", "selected"]
+        if not (feature_set == "all" and name in selection.models)
+    ]
+    print(f"\n📦 Training {len(tasks)} models on {N_CPUS} CPUs (ensembles use {HEAVY_N_JOBS} each)")
 
-        model.fit(X_train, y_train)
-        preds = model.predict(X_val)
-        results[name + "_all"] = {
-            "RMSE": float(np.sqrt(mean_squared_error(y_val, preds))),
-            "MAE": float(mean_absolute_error(y_val, preds)),
-            "R2": float(r2_score(y_val, preds))
-        }
-
-        joblib.dump(model, f"/tmp/{name}_all.pkl")
-        s3.upload_file(f"/tmp/{name}_all.pkl", BUCKET, f"{MODEL_PREFIX}{name}_all.pkl")
-
-        model.fit(X_train[combined_features], y_train)
-        preds_sel = model.predict(X_val[combined_features])
-        results[name + "_selected"] = {
-            "RMSE": float(np.sqrt(mean_squared_error(y_val, preds_sel))),
-            "MAE": float(mean_absolute_error(y_val, preds_sel)),
-            "R2": float(r2_score(y_val, preds_sel))
-        }
-
-        joblib.dump(model, f"/tmp/{name}_selected.pkl")
-        s3.upload_file(f"/tmp/{name}_selected.pkl", BUCKET, f"{MODEL_PREFIX}{name}_selected.pkl")
+    results = {}
+    uploads = []
+    with ThreadPoolExecutor(max_workers=4) as uploader:
+        for name, path in selection.models.items():
+            print(f"✅ {name}_all: RMSE {selection.metrics[name]['RMSE']:.2f} (from feature selection)")
+            results[f"{name}_all"] = selection.metrics[name]
+            uploads.append(uploader.submit(storage.upload_file, path, f"{MODEL_PREFIX}{name}_all.pkl"))
+        with profiler.span("training"):
+            for name, feature_set, metrics, path, timings in run_parallel(tasks, N_CPUS, matrix_dir, n_train, out_dir):
+                print(f"✅ {name}_{feature_set}: RMSE {metrics['RMSE']:.2f}")
+                results[f"{name}_{feature_set}"] = metrics
+                uploads.append(uploader.submit(storage.upload_file, path, f"{MODEL_PREFIX}{name}_{feature_set}.pkl"))
+                # Measured in the worker; the fits overlap, so these add up to more than "training"
+                for step in ["fit", "predict"]:
+                    profiler.add(f"training/{step}/{name}_{feature_set}", timings[step], timings["peak_rss_mb"])
+        with profiler.span("upload"):
+            for upload in uploads:
+                upload.result()
+
+    # Report in the fixed model order, not completion order
+    results = {k: results[k] for k in (f"{n}_{fs}" for n in MODEL_NAMES for fs in ["all", "selected"])}
 
     # ---------------- Save Evaluation Report ----------------
-    with open("/tmp/model_results.json", "w") as f:
-        json.dump(results, f, indent=4)
-    s3.upload_file("/tmp/model_results.json", BUCKET, RESULTS_PREFIX + "model_results.json")
-
-    with open("/tmp/model_performance_report.txt", "w") as f:
-        for model_name, metrics in results.items():
-            f.write(f"===== {model_name} =====\n")
-            for metric, value in metrics.items():
-                f.write(f"{metric}: {value:.4f}\n")
-            f.write("\n")
-    s3.upload_file("/tmp/model_performance_report.txt", BUCKET, RESULTS_PREFIX + "model_performance_report.txt")
+    storage.put_bytes(RESULTS_PREFIX + "model_results.json", json.dumps(results, indent=4))
+
+    report = []
+    for model_name, metrics in results.items():
+        report.append(f"===== {model_name} =====\n")
+        for metric, value in metrics.items():
+            report.append(f"{metric}: {value:.4f}\n")
+        report.append("\n")
+    storage.put_bytes(RESULTS_PREFIX + "model_performance_report.txt", "".join(report))
 
     # Optional: Save final model to SageMaker /opt/ml/model/ (for packaging)
-    final_model = models["XGBoost"]
-    final_model.fit(X_train[combined_features], y_train)
-    joblib.dump(final_model, "/opt/ml/model/model.pkl")
+    # XGBoost_selected is already fitted on the selected features; no need to train it again
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    with profiler.span("package"):
+        shutil.copyfile(os.path.join(out_dir, "XGBoost_selected.pkl"), os.path.join(MODEL_DIR, "model.pkl"))
+        export_model(joblib.load(os.path.join(out_dir, "XGBoost_selected.pkl")), MODEL_DIR)
+        package_transform(storage, ART_PREFIX, MODEL_DIR, combined_features)
 
+    shutil.rmtree(matrix_dir, ignore_errors=True)
+    shutil.rmtree(out_dir, ignore_errors=True)
     print("✅ Training complete. Models and artifacts uploaded to S3.")
 
-except Exception as e:
-    print("❌ Training failed:", str(e))
-    raise e
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("❌ Training failed:", str(e))
+        raise e
+    print(profiler.summary(profiler.write(os.path.join(MODEL_DIR, PROFILE_FILE), "train")))
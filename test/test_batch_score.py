@@ -0,0 +1,73 @@
+# test_batch_score.py
+# scripts/batch_score.py: sharded, multi-process scoring writes what one model.predict gives,
+# in input order, and the bucket's X_test is read in either data format.
+#   python -m pytest test/test_batch_score.py
+import os
+import sys
+import numpy as np
+import pandas as pd
+import joblib
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import batch_score
+import dataio
+from dataio import write_dataset
+from storage import MemoryStorage
+
+N_FEATURES = 6
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.RandomState(0)
+    X = rng.rand(500, N_FEATURES).astype(np.float32)
+    return RandomForestRegressor(n_estimators=8, random_state=42).fit(X, X @ rng.rand(N_FEATURES) * 1000)
+
+@pytest.fixture
+def model_dir(model, tmp_path):
+    path = tmp_path / "model"
+    path.mkdir()
+    joblib.dump(model, str(path / "model.joblib"))
+    return str(path)
+
+def make_x_test(n_rows, seed=1):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame(rng.rand(n_rows, N_FEATURES).round(5), columns=[f"f{i}" for i in range(N_FEATURES)])
+    df.insert(0, "Id", np.arange(1, n_rows + 1))
+    return df
+
+def read_output(path):
+    out = pd.read_csv(path, header=None, names=["Id", "prediction"], float_precision="round_trip")
+    return out["Id"].to_numpy(), out["prediction"].to_numpy()
+
+def test_shards_across_workers_match_predict(model, model_dir, tmp_path):
+    df = make_x_test(2_000)
+    path = str(tmp_path / "X_test.csv")
+    df.to_csv(path, index=False)
+    shard_bytes = 0.004 * 2**20
+    assert len(batch_score.shard_ranges(path, int(shard_bytes), skip_header=True)) > 4
+
+    rows = batch_score.score_file(model_dir, path, str(tmp_path / "out.csv"), workers=2,
+                                  shard_bytes=shard_bytes, batch_rows=100)
+    ids, predictions = read_output(tmp_path / "out.csv")
+    assert rows == len(df)
+    np.testing.assert_array_equal(ids, df["Id"].to_numpy())
+    np.testing.assert_array_equal(predictions, model.predict(df.iloc[:, 1:].to_numpy(np.float32)))
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_main_fetches_x_test_in_data_format(fmt, model, model_dir, tmp_path, monkeypatch):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    df = make_x_test(300)
+    storage = MemoryStorage()
+    write_dataset(storage, df, batch_score.PROC_PREFIX, "X_test", fmt=fmt)
+    monkeypatch.setattr(batch_score, "get_storage", lambda bucket: storage)
+    monkeypatch.setattr(batch_score, "DATA_FORMAT", fmt)
+    monkeypatch.setattr(dataio, "DATA_FORMAT", fmt)
+
+    out_path = str(tmp_path / "preds.csv")
+    batch_score.main(["--model-dir", model_dir, "--output", out_path, "--workers", "1"])
+    ids, predictions = read_output(out_path)
+    np.testing.assert_array_equal(ids, df["Id"].to_numpy())
+    np.testing.assert_allclose(predictions, model.predict(df.iloc[:, 1:].to_numpy(np.float32)), rtol=1e-6)
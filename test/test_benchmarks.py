@@ -0,0 +1,122 @@
+# test_benchmarks.py
+# Smoke runs of the benchmark entry points on a tiny raw-record model: the inference stage and
+# baseline check of benchmarks/run_benchmarks.py, and benchmarks/load_test.py driving a local
+# serve.py with X_test rows read from a MemoryStorage bucket.
+#   python -m pytest test/test_benchmarks.py
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+import joblib
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import storage
+from storage import MemoryStorage
+from dataio import dataset_key, write_dataset
+from features import COLUMNS_FILE, ENCODED_COLUMNS, MODEL_COLUMNS, build_features, encode
+from store_features import build_store_features, save_store_features
+from synthetic import load_store, make_train, make_test
+import load_test
+import run_benchmarks
+pytest.importorskip("fastapi")
+pytest.importorskip("uvicorn")
+
+@pytest.fixture(scope="module")
+def artifact(tmp_path_factory):
+    """(model dir accepting raw records, input dir with store.csv/test.csv, encoded X_test frame)."""
+    store_df = load_store()
+    store_df = store_df[store_df["Store"] <= 20]
+    table = build_store_features(store_df)
+    train = build_features(make_train(2_000, store_df), table)
+    train["StateHoliday"] = train["StateHoliday"].astype(str)
+    encoders = {col: LabelEncoder().fit(train[col]) for col in ENCODED_COLUMNS}
+    train = encode(train, encoders)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(train[MODEL_COLUMNS].to_numpy(np.float32),
+                                                                      train["Sales"])
+    model_dir = tmp_path_factory.mktemp("model")
+    joblib.dump(model, str(model_dir / "model.joblib"))
+    joblib.dump(encoders, str(model_dir / "label_encoders.pkl"))
+    save_store_features(table, str(model_dir / "store_features.pkl"), fingerprint=None)
+    (model_dir / COLUMNS_FILE).write_text(json.dumps(MODEL_COLUMNS))
+
+    input_dir = tmp_path_factory.mktemp("input")
+    test = make_test(300, store_df)
+    test = test[test["Store"].isin(encoders["Store"].classes_)]
+    store_df.to_csv(input_dir / "store.csv", index=False)
+    test.to_csv(input_dir / "test.csv", index=False)
+    X_test = encode(build_features(test, table), encoders)
+    return model_dir, input_dir, X_test
+
+# ---------------- run_benchmarks.py ----------------
+def test_inference_stage(artifact, tmp_path):
+    model_dir, input_dir, _ = artifact
+    out = subprocess.run([sys.executable, os.path.join(ROOT, "benchmarks", "run_benchmarks.py"),
+                          "--inference", str(model_dir), str(input_dir / "test.csv"),
+                          "--requests", "50", "--batch-rows", "500"],
+                         cwd=str(tmp_path), capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr[-2000:]
+    served = json.loads([l for l in out.stdout.splitlines() if l.startswith("{")][-1])
+    assert served["requests"] == 50 and served["batch_rows"] == 500
+    assert 0 < served["p50_ms"] <= served["p99_ms"] and served["rows_per_s"] > 0
+
+def test_baseline_comparison():
+    baseline = {"stages": {"train": {"wall_s": 10.0, "peak_rss_mb": 500.0, "rmse": 100.0, "rows": 1_000},
+                           "inference": {"p99_ms": 2.0, "rows_per_s": 1_000.0}}}
+    current = {"stages": {"train": {"wall_s": 11.0, "peak_rss_mb": 600.0, "rmse": 99.0, "rows": 1_000},
+                          "inference": {"p99_ms": 3.0, "rows_per_s": 2_000.0}}}
+    tolerances = {"time_tolerance": 0.25, "rss_tolerance": 0.15, "rmse_tolerance": 0.01}
+    rows = run_benchmarks.compare(current, baseline, tolerances)
+    regressed = {(stage, metric) for stage, metric, _, _, _, worse in rows if worse}
+    assert {(stage, metric) for stage, metric, *_ in rows} == {
+        ("train", "wall_s"), ("train", "peak_rss_mb"), ("train", "rmse"), ("inference", "p99_ms"),
+        ("inference", "rows_per_s")}  # "rows" is not a metric
+    assert regressed == {("train", "peak_rss_mb"), ("inference", "p99_ms")}
+
+# ---------------- load_test.py ----------------
+@pytest.fixture
+def bucket(artifact, monkeypatch):
+    """X_test in a MemoryStorage bucket, where load_test.py reads it without --data."""
+    _, _, X_test = artifact
+    bucket = MemoryStorage()
+    write_dataset(bucket, X_test, "rossmann-processed/", "X_test", fmt="csv")
+    assert bucket.exists(dataset_key("rossmann-processed/", "X_test", "csv"))
+    monkeypatch.setattr(storage, "get_storage", lambda name: bucket)
+    return bucket
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+def test_load_test_starts_a_local_server(artifact, bucket, tmp_path):
+    model_dir, _, _ = artifact
+    out = str(tmp_path / "load_report.json")
+    load_test.main(["--serve", str(model_dir), "--concurrency", "2", "--warmup", "0.2", "--seconds", "1",
+                    "--out", out])
+    result = load_report(out)
+    assert result["requests"] > 0 and result["errors"] == 0 and result["statuses"] == {"200": result["requests"]}
+    assert result["batch_rows"] == 1 and result["latency"]["p50_ms"] <= result["latency"]["max_ms"]
+    assert sum(b["count"] for b in result["histogram"]) == result["requests"]
+
+def test_load_test_open_loop_batches(artifact, bucket, tmp_path):
+    model_dir, _, _ = artifact
+    port = load_test.free_port()
+    server = load_test.start_server(str(model_dir), 1, port)
+    try:
+        out = str(tmp_path / "load_report.json")
+        load_test.main(["--url", f"http://127.0.0.1:{port}", "--model-dir", str(model_dir),
+                        "--content-type", "application/json", "--batch-rows", "5", "--rate", "40",
+                        "--concurrency", "2", "--warmup", "0.2", "--seconds", "1", "--out", out])
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    result = load_report(out)
+    assert result["errors"] == 0 and result["rate"] == 40
+    # open loop: the request count follows the schedule, not the server
+    assert 30 <= result["requests"] <= 45
+    assert result["rows_per_s"] == pytest.approx(5 * result["requests_per_s"], rel=0.01)
@@ -0,0 +1,104 @@
+# test_binning.py
+# scripts/binning.py: uint8 bin codes fitted on the training rows, and the HistGradientBoosting
+# candidate of train.py boosting on those shared codes.
+#   python -m pytest test/test_binning.py
+import os
+import sys
+import joblib
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from binning import MISSING_CODE, QuantileBinner, binned_pipeline, hist_gbm
+import train
+
+N_TRAIN = 2_000
+
+@pytest.fixture(scope="module")
+def data():
+    """Training rows then validation rows: a continuous, a 5-valued and a 2-valued column."""
+    rng = np.random.RandomState(0)
+    n = N_TRAIN + 500
+    X = np.column_stack([rng.lognormal(8, 1, n), rng.randint(0, 5, n), rng.randint(0, 2, n)]).astype(np.float32)
+    y = 3 * np.log(X[:, 0]) + 2 * X[:, 1] - 4 * X[:, 2] + rng.rand(n)
+    return X, y
+
+def test_codes_are_uint8_with_a_bin_per_value(data):
+    X, _ = data
+    binner = QuantileBinner().fit(X[:N_TRAIN])
+    codes = binner.transform(X)
+    assert codes.dtype == np.uint8 and codes.flags["C_CONTIGUOUS"]
+    assert len(binner.thresholds_[0]) <= 254 and codes[:, 0].max() < MISSING_CODE
+    # few distinct values: one code per value, in order
+    np.testing.assert_array_equal(codes[:, 1], X[:, 1].astype(np.uint8))
+    np.testing.assert_array_equal(codes[:, 2], X[:, 2].astype(np.uint8))
+    # codes only depend on the order of values within a column
+    order = np.argsort(X[:, 0], kind="stable")
+    assert (np.diff(codes[order, 0].astype(int)) >= 0).all()
+
+def test_missing_and_out_of_range_values(data):
+    X, _ = data
+    binner = QuantileBinner().fit(X[:N_TRAIN])
+    top = [len(edges) for edges in binner.thresholds_]
+    rows = np.array([[np.nan, np.nan, np.nan],
+                     [-1.0, -1.0, -1.0],  # below everything seen in training
+                     [1e9, 9.0, 5.0]],   # above it
+                    dtype=np.float32)
+    codes = binner.transform(rows)
+    assert codes[0].tolist() == [MISSING_CODE] * 3
+    assert codes[1].tolist() == [0, 0, 0]
+    assert codes[2].tolist() == top
+
+def test_edges_are_fitted_on_the_training_rows_only(data):
+    X, _ = data
+    shifted = X.copy()
+    shifted[N_TRAIN:] *= 10  # validation rows from another distribution
+    binner = QuantileBinner().fit(shifted[:N_TRAIN])
+    reference = QuantileBinner().fit(X[:N_TRAIN])
+    for edges, expected in zip(binner.thresholds_, reference.thresholds_):
+        np.testing.assert_array_equal(edges, expected)
+    codes = binner.transform(shifted)
+    np.testing.assert_array_equal(codes[:N_TRAIN], reference.transform(X[:N_TRAIN]))
+    assert codes[N_TRAIN:, 0].max() == len(binner.thresholds_[0])  # clipped into the top bin
+    # a column subset of the codes is the binning of that subset
+    np.testing.assert_array_equal(binner.select([2, 0]).transform(shifted[:, [2, 0]]), codes[:, [2, 0]])
+
+def test_max_bins_is_checked():
+    with pytest.raises(ValueError):
+        QuantileBinner(max_bins=256).fit(np.zeros((10, 1)))
+
+def test_boosting_on_codes_matches_boosting_on_values(data):
+    """Exact where every column has <= max_bins distinct values (see binning.py)."""
+    X, y = data
+    X = X.copy()
+    X[:, 0] = np.round(np.log(X[:, 0]) * 20)
+    assert len(np.unique(X[:N_TRAIN, 0])) <= 255
+    binner = QuantileBinner().fit(X[:N_TRAIN])
+    on_codes = hist_gbm(max_iter=30).fit(binner.transform(X[:N_TRAIN]), y[:N_TRAIN])
+    on_values = hist_gbm(max_iter=30).fit(X[:N_TRAIN], y[:N_TRAIN])
+    np.testing.assert_allclose(binned_pipeline(binner, on_codes).predict(X[N_TRAIN:]),
+                               on_values.predict(X[N_TRAIN:]), rtol=1e-9)
+
+def test_hgb_candidate_fits_the_shared_codes(data, tmp_path):
+    """fit_task's HistGradientBoosting reads the B_*.npy codes train.main writes, and is pickled
+    behind the binner, so it scores raw feature rows."""
+    X, y = data
+    binner = QuantileBinner().fit(X[:N_TRAIN])
+    B = binner.transform(X)
+    matrix_dir, out_dir = str(tmp_path / "matrices"), str(tmp_path / "models")
+    os.makedirs(matrix_dir)
+    os.makedirs(out_dir)
+    selected = [0, 1]
+    np.save(os.path.join(matrix_dir, "y.npy"), y)
+    np.save(os.path.join(matrix_dir, "B_all.npy"), B)
+    train.save_columns(os.path.join(matrix_dir, "B_selected.npy"), B, selected)
+    joblib.dump(binner, os.path.join(matrix_dir, "binner_all.pkl"))
+    joblib.dump(binner.select(selected), os.path.join(matrix_dir, "binner_selected.pkl"))
+
+    for feature_set, cols in [("all", [0, 1, 2]), ("selected", selected)]:
+        _, _, metrics, path, _ = train.fit_task("HistGradientBoosting", feature_set, 1, matrix_dir, N_TRAIN, out_dir)
+        model = joblib.load(path)
+        expected = hist_gbm(max_iter=100).fit(B[:N_TRAIN][:, cols], y[:N_TRAIN])
+        preds = model.predict(X[N_TRAIN:][:, cols])
+        np.testing.assert_allclose(preds, expected.predict(B[N_TRAIN:][:, cols]), rtol=1e-9)
+        assert metrics == train.evaluate(y[N_TRAIN:], preds)
@@ -0,0 +1,143 @@
+# test_dataio.py
+# Processed-dataset I/O (scripts/dataio.py): CSV and Parquet round trips with the SCHEMA
+# dtypes, and the split-ordered float32 training matrix.
+#   python -m pytest test/test_dataio.py
+import functools
+import io
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import dataio
+from dataio import SCHEMA, DatasetWriter, dataset_key, iter_batches, write_dataset, read_dataset, iter_dataset, read_matrix
+from dataio import split_rows
+from storage import LocalStorage, MemoryStorage, S3Storage
+
+def make_frame(n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({col: rng.randint(0, 50, n_rows) for col in SCHEMA})
+    df["CompetitionDistance"] = np.log1p(rng.rand(n_rows) * 1e4)
+    df["CompetitionOpenTimeMonths"] = np.log1p(rng.randint(0, 200, n_rows))
+    return df
+
+@pytest.fixture(params=["csv", "parquet"])
+def fmt(request):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    return request.param
+
+def test_roundtrip_applies_schema(fmt):
+    storage = MemoryStorage()
+    df = make_frame(3_500)
+    with DatasetWriter(storage, "proc/", "X_train", fmt=fmt) as writer:
+        for batch in iter_batches(df, rows=1_000):  # several CSV blocks / Parquet row groups
+            writer.append(batch)
+    assert writer.key == dataset_key("proc/", "X_train", fmt) and storage.exists(writer.key)
+
+    back = read_dataset(storage, "proc/", "X_train", fmt=fmt)
+    assert dict(back.dtypes.astype(str)) == SCHEMA
+    pd.testing.assert_frame_equal(back, df.astype(SCHEMA), check_exact=True)
+    chunks = list(iter_dataset(storage, "proc/", "X_train", fmt=fmt, chunksize=700))
+    assert len(chunks) == 5
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), back)
+
+def test_column_subset(fmt):
+    storage = MemoryStorage()
+    df = make_frame(200)
+    write_dataset(storage, df, "proc/", "X_train", fmt=fmt)
+    columns = ["Promo", "Store", "CompetitionDistance"]  # not in file order
+    back = read_dataset(storage, "proc/", "X_train", columns=columns, fmt=fmt)
+    assert list(back.columns) == columns
+    pd.testing.assert_frame_equal(back, df[columns].astype({c: SCHEMA[c] for c in columns}))
+
+def test_read_matrix_rows_and_columns(fmt):
+    storage = MemoryStorage()
+    df = make_frame(2_500)
+    write_dataset(storage, df, "proc/", "X_train", fmt=fmt)
+    rows = np.random.RandomState(1).permutation(2_500)[:900]
+    columns = ["Year", "Store", "CompetitionOpenTimeMonths"]
+    X, names = read_matrix(storage, "proc/", "X_train", rows, columns=columns, fmt=fmt)
+    assert names == columns and X.dtype == np.float32 and X.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(X, df[columns].to_numpy(np.float32)[rows])
+
+    X, names = read_matrix(storage, "proc/", "X_train", np.arange(2_500), fmt=fmt)
+    assert names == list(SCHEMA)
+    with pytest.raises(ValueError):
+        read_matrix(storage, "proc/", "X_train", [2_500], fmt=fmt)
+
+@pytest.mark.parametrize("chunksize", [97, 1_000, 100_000])
+def test_read_matrix_split_matches_train_test_split(fmt, chunksize, monkeypatch):
+    """train.py's split-ordered matrix holds the rows train_test_split picks from the full frame,
+    whichever chunks (CSV blocks, Parquet batches over 700-row groups) the rows arrive in."""
+    from sklearn.model_selection import train_test_split
+    storage = MemoryStorage()
+    df = make_frame(2_500).astype(SCHEMA)
+    X_df, y = df.drop(columns=["Sales"]), df["Sales"].to_numpy(np.float64)
+    with DatasetWriter(storage, "proc/", "X_train", fmt=fmt) as writer:
+        for batch in iter_batches(X_df, rows=700):
+            writer.append(batch)
+    monkeypatch.setattr(dataio, "iter_dataset", functools.partial(iter_dataset, chunksize=chunksize))
+
+    train_rows, val_rows = split_rows(len(df), test_size=0.2, random_state=42)
+    chunk_of = np.arange(len(df)) // chunksize
+    # every chunk holds rows of both sets
+    assert set(chunk_of[train_rows]) == set(chunk_of[val_rows]) == set(chunk_of)
+    order = np.concatenate([train_rows, val_rows])
+    X, names = read_matrix(storage, "proc/", "X_train", order, fmt=fmt)
+    n_train = len(train_rows)
+
+    X_train, X_val, y_train, y_val = train_test_split(X_df, y, test_size=0.2, random_state=42)
+    assert names == list(X_train.columns)
+    np.testing.assert_array_equal(X[:n_train], X_train.to_numpy(np.float32))
+    np.testing.assert_array_equal(X[n_train:], X_val.to_numpy(np.float32))
+    np.testing.assert_array_equal(y[order[:n_train]], y_train)
+    np.testing.assert_array_equal(y[order[n_train:]], y_val)
+
+class StubS3:
+    """The object and multipart subset of the boto3 S3 client."""
+
+    def __init__(self):
+        self.objects = {}
+        self.parts = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = bytes(Body)
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b"".join(self.parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.parts = {}
+
+@pytest.fixture(params=["local", "memory", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path))
+    return MemoryStorage() if request.param == "memory" else S3Storage("bucket", client=StubS3())
+
+def test_failed_write_keeps_previous_object(storage, fmt):
+    df = make_frame(300)
+    write_dataset(storage, df, "proc/", "X_train", fmt=fmt)
+    key = dataset_key("proc/", "X_train", fmt)
+    before = storage.read_bytes(key)
+    with pytest.raises(RuntimeError):
+        with DatasetWriter(storage, "proc/", "X_train", fmt=fmt) as writer:
+            writer.append(make_frame(50, seed=1))
+            raise RuntimeError("failed mid-write")
+    assert storage.read_bytes(key) == before
+    if not isinstance(storage, S3Storage):
+        assert [k for k, _ in storage.list_keys("proc/")] == [key]
+        pd.testing.assert_frame_equal(read_dataset(storage, "proc/", "X_train", fmt=fmt), df.astype(SCHEMA))
@@ -0,0 +1,68 @@
+# test_features.py
+# RecordTransform (the endpoint's raw-record featurization) gives, row for row, the X_test
+# preprocess.py writes for the same days of csv_files/test.csv.
+#   python -m pytest test/test_features.py
+import os
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import preprocess
+from features import MODEL_COLUMNS, RecordTransform, build_features, encode
+from dataio import read_dataset
+from storage import MemoryStorage
+import synthetic
+
+@pytest.fixture(scope="module")
+def processed(tmp_path_factory):
+    """preprocess.run_in_memory on the real store.csv and test.csv, with a synthetic train.csv."""
+    input_dir = tmp_path_factory.mktemp("input")
+    for name in ("store.csv", "test.csv"):
+        shutil.copy(os.path.join(synthetic.CSV_DIR, name), input_dir / name)
+    synthetic.make_train(40_000, synthetic.load_store()).to_csv(input_dir / "train.csv", index=False)
+    storage = MemoryStorage()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(preprocess, "INPUT_DIR", str(input_dir))
+        monkeypatch.setattr(preprocess, "storage", storage)
+        store_table = preprocess.get_store_features(preprocess.read_csv_local("store.csv"))
+        label_encoders, _ = preprocess.run_in_memory(store_table)
+        test_df = preprocess.read_csv_local("test.csv", dtype=preprocess.DAILY_DTYPES)
+    X_test = read_dataset(storage, preprocess.PROC_PREFIX, "X_test")
+    return store_table, label_encoders, test_df, X_test
+
+def test_records_match_the_processed_test_set(processed):
+    store_table, label_encoders, test_df, X_test = processed
+    # build_features keeps open days of stores with a CompetitionDistance; those are the rows
+    # the endpoint is asked about, sent as raw records
+    assert 0 < len(X_test) < len(test_df)
+    rows = test_df.set_index("Id").loc[X_test["Id"].to_numpy()].reset_index()
+    records = rows[["Store", "Date", "Promo", "StateHoliday", "SchoolHoliday"]].to_dict("records")
+
+    transform = RecordTransform(store_table, label_encoders)
+    online = transform.transform_records(records)
+    assert online.dtype == np.float32 and online.shape == (len(X_test), len(MODEL_COLUMNS))
+    np.testing.assert_array_equal(online, X_test[MODEL_COLUMNS].to_numpy(np.float32))
+
+def test_columns_match_build_features_and_encode(processed):
+    store_table, label_encoders, test_df, _ = processed
+    offline = encode(build_features(test_df, store_table), label_encoders)
+    # a model fitted on a column subset gets those columns, in its own order
+    columns = ["CompetitionOpenTimeMonths", "Store", "Promo2Active", "WeekOfYear", "StateHoliday"]
+    transform = RecordTransform(store_table, label_encoders, columns)
+    records = test_df.loc[offline.index, ["Store", "Date", "Promo", "StateHoliday", "SchoolHoliday"]]
+    np.testing.assert_array_equal(transform.transform_records(records.to_dict("records")),
+                                  offline[columns].to_numpy(np.float32))
+
+def test_records_outside_the_processed_rows_are_rejected(processed):
+    store_table, label_encoders, test_df, _ = processed
+    transform = RecordTransform(store_table, label_encoders)
+    record = test_df.iloc[0][["Store", "Date", "Promo", "StateHoliday", "SchoolHoliday"]].to_dict()
+    no_distance = int(store_table.loc[store_table["CompetitionDistance"].isna(), "Store"].iloc[0])
+    for bad in (dict(record, Store=no_distance), dict(record, Store=99_999), dict(record, StateHoliday="z")):
+        with pytest.raises(ValueError):
+            transform.transform_records([bad])
@@ -0,0 +1,65 @@
+# test_flat_model.py
+# Parity of the flat-array predictor (scripts/flat_model.py) with model.predict.
+#   python -m pytest test/test_flat_model.py
+import os
+import sys
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from flat_model import FlatForest, export_model, FLAT_MODEL_DIR, HAS_NUMBA
+
+ENGINES = ["numpy", pytest.param("numba", marks=pytest.mark.skipif(not HAS_NUMBA, reason="numba not installed"))]
+BATCH_SIZES = [1, 64, 3000]  # batch-1 path, level-synchronous path, per-tree large-batch path
+
+def make_data(n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(n_rows, 16).astype(np.float32)
+    X[:, :4] = rng.randint(0, 7, size=(n_rows, 4))  # encoded categoricals: many exact ties
+    y = X @ rng.rand(16) * 1000 + rng.rand(n_rows) * 50
+    return X, y
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = make_data(4000)
+    X_test, _ = make_data(3000, seed=1)
+    X_test[:500] = X[:500]  # rows sitting exactly on split thresholds
+    return X, y, X_test
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("estimator", [RandomForestRegressor, ExtraTreesRegressor])
+def test_sklearn_forest_parity(data, estimator, engine):
+    X, y, X_test = data
+    model = estimator(n_estimators=20, min_samples_leaf=1, random_state=42).fit(X, y)
+    flat = FlatForest.from_model(model, engine=engine)
+    for n in BATCH_SIZES:
+        np.testing.assert_allclose(flat.predict(X_test[:n]), model.predict(X_test[:n]), rtol=1e-6)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_xgboost_parity_with_missing_values(data, engine):
+    xgboost = pytest.importorskip("xgboost")
+    X, y, X_test = data
+    X = X.copy()
+    X[::5, 6] = np.nan
+    model = xgboost.XGBRegressor(n_estimators=30, max_depth=6, random_state=42).fit(X, y)
+    X_test = X_test.copy()
+    X_test[::3, 6] = np.nan
+    flat = FlatForest.from_model(model, engine=engine)
+    for n in BATCH_SIZES:
+        np.testing.assert_allclose(flat.predict(X_test[:n]), model.predict(X_test[:n]), rtol=1e-5)
+
+def test_export_roundtrip_is_memory_mapped(data, tmp_path):
+    X, y, X_test = data
+    model = RandomForestRegressor(n_estimators=5, random_state=42).fit(X, y)
+    export_model(model, str(tmp_path))
+    flat = FlatForest.load(str(tmp_path / FLAT_MODEL_DIR))
+    assert isinstance(np.load(str(tmp_path / FLAT_MODEL_DIR / "nodes.npy"), mmap_mode="r"), np.memmap)
+    assert flat.meta["n_trees"] == 5
+    np.testing.assert_allclose(flat.predict(X_test), model.predict(X_test), rtol=1e-6)
+
+def test_wrong_feature_count_is_rejected(data):
+    X, y, _ = data
+    flat = FlatForest.from_model(RandomForestRegressor(n_estimators=2, random_state=42).fit(X, y))
+    with pytest.raises(ValueError):
+        flat.predict(np.zeros((1, 15), dtype=np.float32))
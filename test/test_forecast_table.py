@@ -0,0 +1,106 @@
+# test_forecast_table.py
+# The pre-scored forecast grid (scripts/forecast_table.py) returns the model's own
+# predictions, records outside the grid fall back to the model in inference.py, and a
+# table scored by another model is not served.
+#   python -m pytest test/test_forecast_table.py
+import os
+import sys
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from features import ENCODED_COLUMNS, MODEL_COLUMNS, RecordTransform, build_features, record_columns
+from store_features import build_store_features
+from forecast_table import FORECAST_TABLE_DIR, ForecastTable, build_forecast_table
+from flat_model import source_digest
+from synthetic import load_store, make_train, make_test
+import inference
+
+START, N_DAYS = "2015-08-01", 5
+
+class CountingModel:
+    def __init__(self, model):
+        self.model = model
+        self.rows = 0
+
+    def predict(self, X):
+        self.rows += len(X)
+        return self.model.predict(X)
+
+@pytest.fixture(scope="module")
+def fitted():
+    store_df = load_store()
+    store_df = store_df[store_df["Store"] <= 30]
+    table = build_store_features(store_df)
+    train = build_features(make_train(3_000, store_df), table)
+    train["StateHoliday"] = train["StateHoliday"].astype(str)
+    encoders = {col: LabelEncoder().fit(train[col]) for col in ENCODED_COLUMNS}
+    for col in ENCODED_COLUMNS:
+        train[col] = encoders[col].transform(train[col])
+    model = RandomForestRegressor(n_estimators=10, min_samples_leaf=2, random_state=42)
+    model.fit(train[MODEL_COLUMNS].to_numpy(np.float32), train["Sales"])
+    transform = RecordTransform(table, encoders)
+    forecast = build_forecast_table(model.predict, transform, START, N_DAYS)
+    test = make_test(500, store_df, start=START, end="2015-08-05")
+    records = test[test["Store"].isin(encoders["Store"].classes_)].to_dict("records")
+    return model, transform, forecast, records
+
+def test_lookups_match_the_model(fitted):
+    model, transform, forecast, records = fitted
+    values, hit = forecast.lookup_columns(*record_columns(records))
+    assert hit.all()
+    np.testing.assert_allclose(values, model.predict(transform.transform_records(records)), rtol=1e-6)
+
+def test_save_load_roundtrip(fitted, tmp_path):
+    _, _, forecast, records = fitted
+    loaded = ForecastTable.load(forecast.save(str(tmp_path / "forecast_table")))
+    np.testing.assert_array_equal(loaded.lookup_columns(*record_columns(records))[0],
+                                  forecast.lookup_columns(*record_columns(records))[0])
+
+def test_off_grid_keys_miss(fitted):
+    _, _, forecast, records = fitted
+    record = dict(records[0])
+    off_grid = [dict(record, Date="2015-07-31"), dict(record, Date="2015-08-06"), dict(record, Store=10_000),
+                dict(record, StateHoliday="z"), dict(record, Promo=2)]
+    values, hit = forecast.lookup_columns(*record_columns([record] + off_grid))
+    assert hit.tolist() == [True] + [False] * len(off_grid)
+    assert np.isnan(values[1:]).all()
+
+def test_inference_falls_back_to_the_model(fitted, monkeypatch):
+    model, transform, forecast, records = fitted
+    counting = CountingModel(model)
+    monkeypatch.setattr(inference, "record_transform", transform)
+    monkeypatch.setattr(inference, "forecast_table", forecast)
+    # an off-grid day is still a valid record: the transform featurizes it for the model
+    batch = records[:3] + [dict(records[3], Date="2015-08-20")] + records[4:6]
+    data = inference.input_fn(inference.json.dumps(batch), "application/json")
+    prediction = inference.predict_fn(data, counting)
+    assert counting.rows == 1
+    np.testing.assert_allclose(prediction, model.predict(transform.transform_records(batch)), rtol=1e-6)
+
+def test_table_of_a_replaced_model_is_skipped(fitted, tmp_path, monkeypatch):
+    model, transform, _, records = fitted
+    model_dir = str(tmp_path)
+    joblib.dump(model, os.path.join(model_dir, "model.joblib"))
+    build_forecast_table(model.predict, transform, START, N_DAYS, model_digest=source_digest(model_dir)).save(
+        os.path.join(model_dir, FORECAST_TABLE_DIR))
+    monkeypatch.setattr(inference, "ENGINE", "sklearn")
+    monkeypatch.setattr(inference, "load_transform", lambda path: transform)
+    for name in ("record_transform", "forecast_table"):  # load_model sets these; restored afterwards
+        monkeypatch.setattr(inference, name, None)
+    inference.load_model(model_dir)
+    assert inference.forecast_table is not None
+
+    retrained = RandomForestRegressor(n_estimators=3, random_state=0).fit(
+        transform.transform_records(records), np.arange(len(records), dtype=float))
+    joblib.dump(retrained, os.path.join(model_dir, "model.joblib"))
+    loaded = inference.load_model(model_dir)
+    assert inference.forecast_table is None
+    data = inference.input_fn(inference.json.dumps(records[:5]), "application/json")
+    np.testing.assert_allclose(inference.predict_fn(data, loaded),
+                               retrained.predict(transform.transform_records(records[:5])), rtol=1e-6)
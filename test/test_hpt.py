@@ -0,0 +1,48 @@
+# test_hpt.py
+# Warm-started forest growth and successive halving in scripts/hpt.py.
+#   python -m pytest test/test_hpt.py
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from hpt import ForestCache, make_forest, rmse, sample_configs, successive_halving
+
+PARAMS = {"n_estimators": 30, "min_samples_split": 2, "min_samples_leaf": 1, "max_features": "sqrt"}
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.RandomState(0)
+    X = rng.rand(600, 8).astype(np.float32)
+    y = X @ rng.rand(8) * 1000 + rng.rand(600) * 50
+    return X[:450], y[:450], X[450:], y[450:]
+
+def test_warm_started_forest_matches_fresh_fit(data):
+    X_train, y_train, X_val, y_val = data
+    cache = ForestCache(X_train, y_train, X_val, y_val)
+    for n_trees in (10, 25, 18):  # grow, grow again, then a prefix of the grown forest
+        score, forest = cache.grow(PARAMS, n_trees)
+        fresh = make_forest(dict(PARAMS, n_estimators=n_trees)).fit(X_train, y_train)
+        assert len(forest.estimators_) == n_trees
+        np.testing.assert_allclose(forest.predict(X_val), fresh.predict(X_val), rtol=1e-10)
+        assert score == pytest.approx(rmse(y_val, fresh.predict(X_val)))
+
+def test_halving_keeps_top_configs_each_rung(data):
+    X_train, y_train, X_val, y_val = data
+    configs = sample_configs(9, seed=3)
+    for config in configs:
+        config["n_estimators"] = 20 + config["n_estimators"] // 10  # keep the fits small
+    eta = 3
+    best_params, best_rmse, model, history = successive_halving(
+        configs, X_train, y_train, X_val, y_val, eta=eta, min_fraction=1 / 9, n_jobs=1)
+
+    assert [len(rung["results"]) for rung in history] == [9, 3, 1]
+    assert [rung["rows"] for rung in history] == [50, 150, 450]
+    for rung, next_rung in zip(history, history[1:]):
+        scores = [r["rmse"] for r in rung["results"]]
+        assert scores == sorted(scores)
+        kept = [r["params"] for r in rung["results"][:len(rung["results"]) // eta]]
+        assert sorted(map(str, kept)) == sorted(str(r["params"]) for r in next_rung["results"])
+    assert best_params == history[-1]["results"][0]["params"]
+    assert best_rmse == pytest.approx(rmse(y_val, model.predict(X_val)))
@@ -0,0 +1,41 @@
+# test_instrument.py
+# scripts/instrument.py: span bookkeeping, and the RSS sampler only running while a span is open.
+#   python -m pytest test/test_instrument.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from instrument import Profiler
+
+def wait_stopped(profiler, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while profiler._sampler is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return profiler._sampler is None
+
+def test_spans_nest_and_add_up():
+    profiler = Profiler(modes=(), rss_interval=0.01)
+    for _ in range(3):
+        with profiler.span("fit"):
+            with profiler.span("predict"):
+                time.sleep(0.01)
+    spans = profiler.report("test")["spans"]
+    assert spans["fit"]["calls"] == 3 and spans["fit/predict"]["calls"] == 3
+    assert spans["fit"]["seconds"] >= spans["fit/predict"]["seconds"] >= 0.03
+    assert spans["fit"]["peak_rss_mb"] > 0
+
+def test_sampler_runs_only_while_a_span_is_open():
+    profiler = Profiler(modes=(), rss_interval=0.01)
+    assert profiler._sampler is None
+    with profiler.span("load"):
+        sampler = profiler._sampler
+        assert sampler is not None and sampler.is_alive()
+        time.sleep(0.05)
+    assert wait_stopped(profiler)
+    sampler.join(timeout=1)
+    assert not sampler.is_alive()
+
+    with profiler.span("load"):  # a later span starts a new one
+        assert profiler._sampler is not None and profiler._sampler.is_alive()
+    assert wait_stopped(profiler)
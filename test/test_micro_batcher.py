@@ -0,0 +1,88 @@
+# test_micro_batcher.py
+# Request coalescing in scripts/inference.py (INFERENCE_BATCH_WINDOW_MS): results, failures, shutdown.
+#   python -m pytest test/test_micro_batcher.py
+import os
+import sys
+import threading
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import inference
+from inference import MicroBatcher
+
+class DoublingModel:
+    """predict = 2 * first column; rejects rows with NaN, like a model fed bad input."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, X):
+        self.batches.append(len(X))
+        if np.isnan(X).any():
+            raise ValueError("Input contains NaN")
+        return X[:, 0] * 2
+
+def concurrent_predict(batcher, inputs):
+    results = [None] * len(inputs)
+
+    def call(i):
+        try:
+            results[i] = batcher.predict(inputs[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results
+
+@pytest.fixture
+def inputs():
+    return [np.full((n, 3), float(n)) for n in (1, 2, 3, 4)]
+
+def test_concurrent_requests_share_one_predict(inputs):
+    model = DoublingModel()
+    batcher = MicroBatcher(model, window_ms=500, max_rows=100)
+    results = concurrent_predict(batcher, inputs)
+    for X, result in zip(inputs, results):
+        np.testing.assert_array_equal(result, X[:, 0] * 2)
+    assert len(model.batches) < len(inputs)
+    assert sum(model.batches) == sum(len(X) for X in inputs)
+    batcher.close()
+
+def test_bad_request_fails_alone(inputs):
+    model = DoublingModel()
+    batcher = MicroBatcher(model, window_ms=500, max_rows=100)
+    inputs[2] = inputs[2].copy()
+    inputs[2][1, 0] = np.nan
+    results = concurrent_predict(batcher, inputs)
+    assert isinstance(results[2], ValueError)
+    for i in (0, 1, 3):
+        np.testing.assert_array_equal(results[i], inputs[i][:, 0] * 2)
+    batcher.close()
+
+def test_close_stops_the_thread():
+    batcher = MicroBatcher(DoublingModel(), window_ms=1)
+    np.testing.assert_array_equal(batcher.predict(np.ones((2, 3))), [2.0, 2.0])
+    batcher.close()
+    batcher.thread.join(timeout=5)
+    assert not batcher.thread.is_alive()
+    np.testing.assert_array_equal(batcher.predict(np.ones((2, 3))), [2.0, 2.0])  # straight to the model
+
+def test_close_batchers_retires_every_model(monkeypatch):
+    monkeypatch.setattr(inference, "BATCH_WINDOW_MS", 1.0)
+    monkeypatch.setattr(inference, "prediction_cache", None)
+    inference.close_batchers()
+    models = [DoublingModel(), DoublingModel()]
+    for model in models:
+        np.testing.assert_array_equal(inference.model_predict(np.ones((1, 3)), model), [2.0])
+    batchers = [inference.get_batcher(model) for model in models]
+    assert [b.model for b in batchers] == models
+    inference.close_batchers()
+    assert not inference._batchers
+    for batcher in batchers:
+        batcher.thread.join(timeout=5)
+        assert not batcher.thread.is_alive()
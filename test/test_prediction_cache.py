@@ -0,0 +1,96 @@
+# test_prediction_cache.py
+# LRU/TTL behaviour of the opt-in prediction cache (scripts/prediction_cache.py).
+#   python -m pytest test/test_prediction_cache.py
+import os
+import sys
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import prediction_cache
+from prediction_cache import PredictionCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class CountingModel:
+    """model.predict that remembers which rows reached it."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(np.array(X))
+        return self.model.predict(X)
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.RandomState(0)
+    X = rng.rand(500, 8).astype(np.float32)
+    return RandomForestRegressor(n_estimators=10, random_state=42).fit(X, X @ rng.rand(8)), X
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, "monotonic", clock)
+    return clock
+
+def test_hits_match_model_predict(forest):
+    model, X = forest
+    counting = CountingModel(model)
+    cache = PredictionCache(max_entries=1_000)
+    first = cache.predict(X[:50], model, counting.predict)
+    second = cache.predict(X[:50], model, counting.predict)
+    np.testing.assert_array_equal(first, model.predict(X[:50]))
+    np.testing.assert_array_equal(second, model.predict(X[:50]))
+    assert len(counting.calls) == 1
+    assert cache.stats()["hits"] == 50 and cache.stats()["misses"] == 50
+
+def test_mixed_batch_is_scattered_back_in_input_order(forest):
+    model, X = forest
+    counting = CountingModel(model)
+    cache = PredictionCache(max_entries=1_000)
+    cache.predict(X[0:40:2], model, counting.predict)  # even rows cached
+    batch = X[:40][::-1]  # odd (missing) and even (cached) rows interleaved, reversed
+    np.testing.assert_array_equal(cache.predict(batch, model, counting.predict), model.predict(batch))
+    np.testing.assert_array_equal(counting.calls[-1], X[1:40:2][::-1])  # only the misses, in order
+
+def test_ttl_expires_entries(forest, clock):
+    model, X = forest
+    counting = CountingModel(model)
+    cache = PredictionCache(max_entries=1_000, ttl_s=60)
+    cache.predict(X[:5], model, counting.predict)
+    clock.now += 59
+    cache.predict(X[:5], model, counting.predict)
+    assert len(counting.calls) == 1
+    clock.now += 61
+    np.testing.assert_array_equal(cache.predict(X[:5], model, counting.predict), model.predict(X[:5]))
+    assert len(counting.calls) == 2
+    assert cache.stats()["expirations"] == 5
+
+def test_lru_evicts_least_recently_used(forest):
+    model, X = forest
+    counting = CountingModel(model)
+    cache = PredictionCache(max_entries=3)
+    cache.predict(X[:3], model, counting.predict)
+    cache.predict(X[:1], model, counting.predict)  # row 0 becomes the most recent
+    cache.predict(X[3:4], model, counting.predict)  # evicts row 1
+    assert cache.stats()["evictions"] == 1
+    cache.predict(X[[0, 2, 3]], model, counting.predict)
+    assert len(counting.calls) == 2
+    cache.predict(X[1:2], model, counting.predict)
+    np.testing.assert_array_equal(counting.calls[-1], X[1:2])
+
+def test_model_reload_invalidates(forest):
+    model, X = forest
+    other = RandomForestRegressor(n_estimators=10, random_state=7).fit(X, X[:, 0])
+    cache = PredictionCache(max_entries=1_000)
+    cache.predict(X[:20], model, model.predict)
+    np.testing.assert_array_equal(cache.predict(X[:20], other, other.predict), other.predict(X[:20]))
+    assert cache.stats()["entries"] == 20 and cache.stats()["hits"] == 0
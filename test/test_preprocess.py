@@ -0,0 +1,48 @@
+# test_preprocess.py
+# preprocess.py --chunksize writes exactly what the in-memory path writes.
+#   python -m pytest test/test_preprocess.py
+import os
+import sys
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import preprocess
+from dataio import read_dataset
+from storage import MemoryStorage
+import synthetic
+
+CHUNKSIZE = 97  # rows of one store are spread across many chunks
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    store_df = synthetic.load_store()
+    store_df = store_df[store_df["Store"] <= 40]  # few stores: every test store is seen in train
+    synthetic.make_train(3_000, store_df).to_csv(tmp_path / "train.csv", index=False)
+    synthetic.make_test(400, store_df).to_csv(tmp_path / "test.csv", index=False)
+    store_df.to_csv(tmp_path / "store.csv", index=False)
+    monkeypatch.setattr(preprocess, "INPUT_DIR", str(tmp_path))
+    return tmp_path
+
+def run(monkeypatch, fn, *args):
+    storage = MemoryStorage()
+    monkeypatch.setattr(preprocess, "storage", storage)
+    store_table = preprocess.get_store_features(preprocess.read_csv_local("store.csv"))
+    fn(store_table, *args)
+    return {name: read_dataset(storage, preprocess.PROC_PREFIX, name) for name in ("X_train", "y_train", "X_test")}
+
+def test_chunked_matches_in_memory(inputs, monkeypatch):
+    train = pd.read_csv(inputs / "train.csv")
+    chunk_of_row = pd.Series(range(len(train))) // CHUNKSIZE
+    assert (chunk_of_row.groupby(train["Store"]).nunique() > 1).any()
+
+    expected = run(monkeypatch, preprocess.run_in_memory)
+    label_encoders = preprocess.fit_encoders_streaming(
+        preprocess.build_store_features(preprocess.read_csv_local("store.csv")), CHUNKSIZE)
+    chunked = run(monkeypatch, preprocess.run_chunked, CHUNKSIZE, label_encoders)
+
+    assert len(expected["X_train"]) > 1_000
+    for name in expected:
+        pd.testing.assert_frame_equal(chunked[name], expected[name], check_exact=True)
@@ -0,0 +1,103 @@
+# test_retrain.py
+# Rebuild gates and incremental model updates of scripts/retrain.py.
+#   python -m pytest test/test_retrain.py
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import retrain
+from retrain import DRIFT_COLUMNS, reference_histogram, drift_checks, boost_more, grow_forest
+
+BASE_ROWS = 50_000
+
+def drift_frame(n_rows, seed, distance_shift=0.0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "Promo": rng.randint(0, 2, n_rows),
+        "StateHoliday": rng.choice(4, n_rows, p=[0.97, 0.02, 0.007, 0.003]),
+        "StoreType": rng.randint(0, 4, n_rows),
+        "Assortment": rng.randint(0, 3, n_rows),
+        "CompetitionDistance": rng.normal(8.0 + distance_shift, 1.0, n_rows),
+        "Sales": rng.gamma(4.0, 1_500.0, n_rows),
+    })
+
+class StubDelta:
+    def __init__(self, frame):
+        self.frame = frame
+        self.y = frame["Sales"].to_numpy(np.float64)
+        self.X = frame[[c for c in DRIFT_COLUMNS if c != "Sales"]].to_numpy(np.float32)
+
+class StubModel:
+    """Predicts the delta's target plus a fixed error."""
+
+    def __init__(self, y, error):
+        self.predictions = y + error
+
+    def predict(self, X):
+        return self.predictions
+
+@pytest.fixture(scope="module")
+def base_state():
+    base = drift_frame(BASE_ROWS, seed=0)
+    return {
+        "base": {"rows": BASE_ROWS}, "increments": 0, "rows_since_rebuild": 0, "baseline_rmse": 500.0,
+        "reference": {col: reference_histogram(base[col].to_numpy()) for col in DRIFT_COLUMNS},
+    }
+
+def failing(state, delta, monkeypatch, error=500.0):
+    monkeypatch.setattr(retrain, "load_model", lambda name: StubModel(delta.y, error))
+    checks = drift_checks(state, delta, {"selected": [0, 1]})
+    assert set(checks) == {f"psi_{c}" for c in DRIFT_COLUMNS} | {"rmse_ratio", "new_fraction", "increments"}
+    return {check for check, (value, limit) in checks.items() if value > limit}
+
+def test_same_distribution_passes(base_state, monkeypatch):
+    assert failing(base_state, StubDelta(drift_frame(5_000, seed=1)), monkeypatch) == set()
+
+def test_psi_gate(base_state, monkeypatch):
+    delta = StubDelta(drift_frame(5_000, seed=1, distance_shift=1.0))
+    assert failing(base_state, delta, monkeypatch) == {"psi_CompetitionDistance"}
+
+def test_rmse_gate(base_state, monkeypatch):
+    delta = StubDelta(drift_frame(5_000, seed=1))
+    assert failing(base_state, delta, monkeypatch, error=500.0 * (retrain.RMSE_RATIO_MAX + 0.1)) == {"rmse_ratio"}
+
+def test_new_fraction_gate(base_state, monkeypatch):
+    state = dict(base_state, rows_since_rebuild=int(BASE_ROWS * retrain.MAX_NEW_FRACTION))
+    assert failing(state, StubDelta(drift_frame(5_000, seed=1)), monkeypatch) == {"new_fraction"}
+
+def test_increments_gate(base_state, monkeypatch):
+    state = dict(base_state, increments=retrain.MAX_INCREMENTS)
+    assert failing(state, StubDelta(drift_frame(5_000, seed=1)), monkeypatch) == {"increments"}
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.RandomState(0)
+    X = rng.rand(1_200, 6).astype(np.float32)
+    y = X @ rng.rand(6) * 1000 + rng.rand(1_200) * 50
+    return X[:1_000], y[:1_000], X[1_000:], y[1_000:]
+
+def test_boost_more_adds_rounds(data):
+    xgboost = pytest.importorskip("xgboost")
+    X, y, X_new, y_new = data
+    model = xgboost.XGBRegressor(n_estimators=20, max_depth=4, random_state=42, n_jobs=1).fit(X, y)
+    before = model.predict(X_new)
+    updated = boost_more(model, X_new, y_new)
+    assert updated.get_booster().num_boosted_rounds() == 20 + retrain.XGB_ROUNDS
+    np.testing.assert_allclose(updated.predict(X_new, iteration_range=(0, 20)), before, rtol=1e-6)
+    assert updated.get_params()["n_jobs"] == 1
+
+def test_grow_forest_keeps_old_trees(data):
+    X, y, X_new, y_new = data
+    model = RandomForestRegressor(n_estimators=10, random_state=42, n_jobs=1).fit(X, y)
+    old_trees = list(model.estimators_)
+    old_predictions = [tree.predict(X_new) for tree in old_trees]
+    updated = grow_forest(model, X_new, y_new)
+    assert len(updated.estimators_) == 10 + retrain.RF_TREES
+    assert all(new is old for new, old in zip(updated.estimators_, old_trees))
+    for tree, predictions in zip(updated.estimators_, old_predictions):
+        np.testing.assert_array_equal(tree.predict(X_new), predictions)
+    assert not updated.warm_start and updated.n_jobs == 1
@@ -0,0 +1,176 @@
+# test_serve.py
+# scripts/serve.py end to end: a pre-forked server on a tiny model answers CSV and JSON on
+# /invocations, and a SIGHUP swaps in a new model without failing a request, for a pickled
+# model and for an artifact with a flat_model/ export. Malformed input is a 400, not a 500.
+#   python -m pytest test/test_serve.py
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import threading
+import subprocess
+import http.client
+from contextlib import contextmanager
+import numpy as np
+import joblib
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVE = os.path.join(ROOT, "scripts", "serve.py")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from flat_model import export_model
+from features import COLUMNS_FILE, ENCODED_COLUMNS, MODEL_COLUMNS, build_features
+from store_features import build_store_features, save_store_features
+from synthetic import load_store, make_train, make_test
+pytest.importorskip("fastapi")
+pytest.importorskip("uvicorn")
+
+def make_model(seed):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(300, 4)
+    return RandomForestRegressor(n_estimators=5, random_state=seed).fit(X, X @ rng.rand(4) * 100 + seed * 1000)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def post(port, body, content_type):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("POST", "/invocations", body, {"Content-Type": content_type})
+        response = conn.getresponse()
+        return response.status, response.read().decode("utf-8")
+    finally:
+        conn.close()
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, "server exited"
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/ping")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+@contextmanager
+def serving(model_dir, engine):
+    port = free_port()
+    env = dict(os.environ, INFERENCE_ENGINE=engine)
+    process = subprocess.Popen([sys.executable, SERVE, "--model-dir", str(model_dir), "--host", "127.0.0.1",
+                                "--port", str(port), "--workers", "2", "--watch", "0"],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, process)
+        yield port, process
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+@pytest.fixture(params=["joblib", "flat"])
+def server(request, tmp_path):
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    joblib.dump(make_model(0), str(model_dir / "model.joblib"))
+    if request.param == "flat":
+        export_model(make_model(0), str(model_dir))
+    with serving(model_dir, "sklearn" if request.param == "joblib" else "auto") as (port, process):
+        yield port, model_dir, process
+
+ROWS = np.random.RandomState(9).rand(3, 4).round(4)
+
+def test_invocations_csv_and_json(server):
+    port, _, _ = server
+    expected = make_model(0).predict(ROWS.astype(np.float32))
+    status, body = post(port, "\n".join(",".join(map(str, row)) for row in ROWS), "text/csv")
+    assert status == 200
+    np.testing.assert_allclose([float(v) for v in body.splitlines()], expected, rtol=1e-6)
+    status, body = post(port, json.dumps(ROWS.tolist()), "application/json")
+    assert status == 200
+    np.testing.assert_allclose(json.loads(body), expected, rtol=1e-6)
+    assert post(port, "1,2\n3", "text/csv")[0] == 400
+
+def test_sighup_reload_serves_new_model_without_failures(server):
+    port, model_dir, process = server
+    body = ",".join(map(str, ROWS[0]))
+    old, new = (make_model(seed).predict(ROWS[:1].astype(np.float32))[0] for seed in (0, 1))
+    seen, failures, stop = [], [], threading.Event()
+
+    def client():
+        while not stop.is_set():
+            try:
+                status, text = post(port, body, "text/csv")
+                if status != 200:
+                    failures.append(status)
+                else:
+                    seen.append(float(text))
+            except (OSError, http.client.HTTPException) as e:
+                failures.append(repr(e))
+
+    threads = [threading.Thread(target=client) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        time.sleep(0.5)
+        joblib.dump(make_model(1), str(model_dir / "model.joblib"))  # flat_model/ is now stale
+        process.send_signal(signal.SIGHUP)
+        deadline = time.monotonic() + 60
+        while not (seen and seen[-1] == pytest.approx(new)) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        time.sleep(1.0)  # keep the load on while the old generation retires
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    assert failures == []
+    assert seen[0] == pytest.approx(old) and seen[-1] == pytest.approx(new)
+    # both generations accept until the new one is up; after that only the new model answers
+    for _ in range(20):
+        status, text = post(port, body, "text/csv")
+        assert status == 200 and float(text) == pytest.approx(new)
+
+@pytest.fixture
+def records_server(tmp_path):
+    """A model artifact that accepts raw records (store features, encoders and column order)."""
+    store_df = load_store()
+    store_df = store_df[store_df["Store"] <= 20]
+    table = build_store_features(store_df)
+    train = build_features(make_train(2_000, store_df), table)
+    train["StateHoliday"] = train["StateHoliday"].astype(str)
+    encoders = {col: LabelEncoder().fit(train[col]) for col in ENCODED_COLUMNS}
+    for col in ENCODED_COLUMNS:
+        train[col] = encoders[col].transform(train[col])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(train[MODEL_COLUMNS].to_numpy(np.float32),
+                                                                      train["Sales"])
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    joblib.dump(model, str(model_dir / "model.joblib"))
+    joblib.dump(encoders, str(model_dir / "label_encoders.pkl"))
+    save_store_features(table, str(model_dir / "store_features.pkl"), fingerprint=None)
+    (model_dir / COLUMNS_FILE).write_text(json.dumps(MODEL_COLUMNS))
+    test = make_test(50, store_df)
+    record = test[test["Store"].isin(encoders["Store"].classes_)].drop(columns=["Id"]).iloc[0].to_dict()
+    with serving(model_dir, "sklearn") as (port, _):
+        yield port, {k: v.item() if hasattr(v, "item") else v for k, v in record.items()}
+
+def test_malformed_records_are_client_errors(records_server):
+    port, record = records_server
+    assert post(port, json.dumps(record), "application/json")[0] == 200
+    missing_store = {k: v for k, v in record.items() if k != "Store"}
+    for payload in [missing_store, [record, missing_store], [record, 5], dict(record, Store=None)]:
+        status, text = post(port, json.dumps(payload), "application/json")
+        assert status == 400, (payload, text)
+    assert post(port, json.dumps([[1.0, 2.0], [3.0]]), "application/json")[0] == 400
@@ -0,0 +1,93 @@
+# test_serving_log.py
+# scripts/serving_log.py: the queue-backed inference logger honours its level and still writes
+# errors through the listener thread; StageMetrics counts every handler stage.
+#   python -m pytest test/test_serving_log.py
+import os
+import sys
+import atexit
+import logging
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import serving_log
+from serving_log import StageMetrics, get_logger
+import inference
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+@pytest.fixture
+def queued_logger(request, monkeypatch):
+    """A fresh INFO logger whose listener hands records to a RecordingHandler; stop() flushes it."""
+    monkeypatch.setattr(serving_log, "LOG_LEVEL", "INFO")
+    logger = get_logger(f"rossmann.test.{request.node.name}")
+    entry = next(e for e in serving_log._listeners if e[0] in logger.handlers)
+    handler, listener = entry
+    recorder = RecordingHandler()
+    listener.handlers = (recorder,)
+    yield logger, listener, recorder
+    if listener._thread is not None:
+        listener.stop()
+    atexit.unregister(listener.stop)  # stopping twice raises
+    serving_log._listeners.remove(entry)
+    logger.removeHandler(handler)
+
+def test_debug_records_are_dropped_at_info(queued_logger):
+    logger, listener, recorder = queued_logger
+    assert not logger.isEnabledFor(logging.DEBUG)
+    logger.debug("parsed %s rows", 10)
+    logger.info("model loaded")
+    listener.stop()
+    assert [r.getMessage() for r in recorder.records] == ["model loaded"]
+
+def test_exceptions_reach_the_handler_through_the_listener(queued_logger):
+    logger, listener, recorder = queued_logger
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        logger.exception("❌ Error in input_fn")
+    listener.stop()
+    (record,) = recorder.records
+    # QueueHandler formats the traceback into the message before the record crosses threads
+    assert record.levelno == logging.ERROR and record.getMessage().startswith("❌ Error in input_fn")
+    assert "ValueError: bad row" in record.getMessage()
+
+def test_stage_metrics_count_calls_and_errors():
+    metrics = StageMetrics(("parse", "predict"))
+    for _ in range(3):
+        with metrics.timed("parse"):
+            pass
+    with pytest.raises(RuntimeError):
+        with metrics.timed("predict"):
+            raise RuntimeError("model failed")
+    snapshot = metrics.snapshot()
+    assert snapshot["parse"]["count"] == 3 and snapshot["parse"]["errors"] == 0
+    assert snapshot["predict"]["count"] == 1 and snapshot["predict"]["errors"] == 1
+    assert snapshot["parse"]["max_ms"] >= snapshot["parse"]["mean_ms"] >= 0
+    metrics.reset()
+    assert all(stage["count"] == 0 for stage in metrics.snapshot().values())
+
+class DoublingModel:
+    def predict(self, X):
+        return X[:, 0] * 2
+
+def test_metrics_snapshot_counts_each_request_stage(monkeypatch):
+    monkeypatch.setattr(inference, "metrics", StageMetrics(("parse", "predict", "serialize")))
+    monkeypatch.setattr(inference, "BATCH_WINDOW_MS", 0)
+    monkeypatch.setattr(inference, "prediction_cache", None)
+    model = DoublingModel()
+    for _ in range(2):
+        data = inference.input_fn("1,2\n3,4", "text/csv")
+        inference.output_fn(inference.predict_fn(data, model), "text/csv")
+    with pytest.raises(ValueError):
+        inference.input_fn("1,2", "application/xml")
+    snapshot = inference.metrics_snapshot()
+    assert {s: snapshot[s]["count"] for s in ("parse", "predict", "serialize")} == {
+        "parse": 3, "predict": 2, "serialize": 2}
+    assert snapshot["parse"]["errors"] == 1 and snapshot["predict"]["errors"] == 0
+    assert "startup" in snapshot
@@ -0,0 +1,124 @@
+# test_stage_cache.py
+# Stage cache keys (scripts/stage_cache.py) and the launcher wiring in cicd/stages.py.
+#   python -m pytest test/test_stage_cache.py
+import os
+import re
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "cicd"))
+from stage_cache import StageCache, stage_key
+from storage import LocalStorage, MemoryStorage
+import stages
+
+@pytest.fixture
+def code(tmp_path):
+    paths = [tmp_path / "stage.py", tmp_path / "helpers.py"]
+    for path in paths:
+        path.write_text(f"# {path.name}\n")
+    return [str(p) for p in paths]
+
+def test_key_depends_on_inputs_code_and_params(code):
+    inputs = {"raw/train.csv": "etag-1", "raw/store.csv": "etag-2"}
+    key = stage_key("preprocess", inputs, code, {"mode": "full", "data_format": "csv"})
+    assert key == stage_key("preprocess", dict(reversed(list(inputs.items()))), code,
+                            {"data_format": "csv", "mode": "full"})
+    assert key != stage_key("preprocess", dict(inputs, **{"raw/train.csv": "etag-3"}), code,
+                            {"mode": "full", "data_format": "csv"})
+    assert key != stage_key("preprocess", inputs, code, {"mode": "incremental", "data_format": "csv"})
+    assert key != stage_key("train", inputs, code, {"mode": "full", "data_format": "csv"})
+    with open(code[1], "a") as f:
+        f.write("x = 1\n")
+    assert key != stage_key("preprocess", inputs, code, {"mode": "full", "data_format": "csv"})
+
+@pytest.fixture(params=["memory", "local"])
+def storage(request, tmp_path):
+    return MemoryStorage() if request.param == "memory" else LocalStorage(str(tmp_path / "bucket"))
+
+@pytest.fixture
+def demo_stage(storage, code, tmp_path, monkeypatch):
+    """A stage reading raw/ and writing out/, wired to `storage` and a local cache."""
+    monkeypatch.setitem(stages.STAGES, "demo", {
+        "inputs": lambda: ["raw/", "config.json"],
+        "code": code,
+        "params": lambda: {"mode": os.environ.get("DEMO_MODE", "full")},
+        "outputs": ["out/"],
+        "after": [],
+    })
+    cache = StageCache(LocalStorage(str(tmp_path / "cache")), "")
+    monkeypatch.setattr(stages, "get_storage", lambda bucket: storage)
+    monkeypatch.setattr(stages, "get_cache", lambda: cache)
+    storage.put_bytes("raw/a.csv", b"1,2\n")
+    storage.put_bytes("raw/b.csv", b"3,4\n")
+    return storage
+
+def demo_key(storage):
+    return stages.spec_key(stages.current_spec("demo", storage))
+
+def test_stage_key_tracks_inputs_code_and_params(demo_stage, code, monkeypatch):
+    storage = demo_stage
+    key = demo_key(storage)
+    storage.put_bytes("unrelated/x.csv", b"ignored")
+    assert demo_key(storage) == key
+
+    storage.put_bytes("raw/b.csv", b"3,5\n")
+    assert demo_key(storage) != key
+    storage.put_bytes("raw/b.csv", b"3,4\n")
+    assert demo_key(storage) == key
+
+    storage.put_bytes("config.json", b"{}")  # a listed input appearing
+    assert demo_key(storage) != key
+    storage.delete("config.json")
+
+    monkeypatch.setenv("DEMO_MODE", "incremental")
+    assert demo_key(storage) != key
+    monkeypatch.delenv("DEMO_MODE")
+
+    with open(code[0], "a") as f:
+        f.write("y = 2\n")
+    assert demo_key(storage) != key
+
+def test_hit_restores_outputs(demo_stage):
+    storage = demo_stage
+    outputs = {"out/model.pkl": b"model" * 1000, "out/results/metrics.json": b'{"rmse": 1.0}'}
+    launches = []
+
+    def launch():
+        launches.append(1)
+        for key, data in outputs.items():
+            storage.put_bytes(key, data)
+        return {"model_uri": "s3://bucket/model.tar.gz"}
+
+    assert stages.run_stage("demo", launch) == {"model_uri": "s3://bucket/model.tar.gz"}
+    for key in outputs:
+        storage.delete(key)
+
+    assert stages.run_stage("demo", launch) == {"model_uri": "s3://bucket/model.tar.gz"}
+    assert len(launches) == 1
+    for key, data in outputs.items():
+        assert storage.read_bytes(key) == data
+
+    storage.put_bytes("raw/a.csv", b"changed\n")
+    stages.run_stage("demo", launch)
+    assert len(launches) == 2
+
+def local_imports(script, seen=None):
+    """scripts/*.py that `script` imports, directly or through another one (itself included)."""
+    seen = set() if seen is None else seen
+    seen.add(script)
+    with open(script) as f:
+        for name in re.findall(r"^\s*(?:from|import)\s+(\w+)", f.read(), re.M):
+            path = os.path.join(ROOT, "scripts", name + ".py")
+            if os.path.exists(path) and path not in seen:
+                local_imports(path, seen)
+    return seen
+
+@pytest.mark.parametrize("stage, script", [("preprocess", "preprocess.py"), ("train", "train.py"), ("hpo", "hpt.py")])
+def test_stage_code_covers_what_the_script_imports(stage, script):
+    code = set(stages.STAGES[stage]["code"])
+    imported = local_imports(os.path.join(ROOT, "scripts", script))
+    imported.discard(os.path.join(ROOT, "scripts", "flat_kernels.py"))  # serving only, never run by a stage
+    assert imported <= code, sorted(imported - code)
+    assert os.path.join(ROOT, "requirements.txt") in code
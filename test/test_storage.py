@@ -0,0 +1,111 @@
+# test_storage.py
+# Round trips through the storage backends (scripts/storage.py); S3 against a stub client.
+#   python -m pytest test/test_storage.py
+import os
+import sys
+import threading
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from storage import LocalStorage, MemoryStorage, S3MultipartWriter
+
+MB = 1024 * 1024
+
+class StubS3:
+    """The multipart subset of the boto3 S3 client, recording every call."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parts = {}
+        self.objects = {}
+        self.completed = None
+        self.aborted = False
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self.lock:
+            self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.completed = MultipartUpload["Parts"]
+        self.objects[Key] = b"".join(self.parts[p["PartNumber"]] for p in self.completed)
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+@pytest.fixture(params=["local", "memory"])
+def storage(request, tmp_path):
+    return LocalStorage(str(tmp_path)) if request.param == "local" else MemoryStorage()
+
+def test_roundtrip(storage, tmp_path):
+    data = os.urandom(3 * MB + 17)
+    with storage.open_writer("a/b/data.bin") as f:
+        for start in range(0, len(data), MB // 3):
+            f.write(data[start:start + MB // 3])
+    storage.put_bytes("a/c.txt", "text")
+    assert storage.read_bytes("a/b/data.bin") == data
+    assert b"".join(storage.iter_chunks("a/b/data.bin", chunk_size=MB)) == data
+    assert storage.open("a/c.txt").read() == b"text"
+    assert sorted(storage.list_keys("a/")) == [("a/b/data.bin", len(data)), ("a/c.txt", 4)]
+    assert storage.exists("a/c.txt") and not storage.exists("a/missing")
+
+    source = tmp_path / "upload.bin"
+    source.write_bytes(data)
+    storage.upload_file(str(source), "up/file.bin")
+    storage.download_file("up/file.bin", str(tmp_path / "download.bin"))
+    assert (tmp_path / "download.bin").read_bytes() == data
+    storage.delete("up/file.bin")
+    assert not storage.exists("up/file.bin")
+
+def test_digest_is_content_addressed(storage):
+    storage.put_bytes("x", b"same")
+    storage.put_bytes("y", b"same")
+    storage.put_bytes("z", b"other")
+    assert storage.digest("x") == storage.digest("y") != storage.digest("z")
+
+def test_local_writer_renames_partial_only_on_success(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.put_bytes("d/key.csv", b"old")
+    with storage.open_writer("d/key.csv") as f:
+        f.write(b"new")
+        assert os.path.exists(tmp_path / "d" / "key.csv.partial")
+        assert storage.read_bytes("d/key.csv") == b"old"  # readers still see the previous object
+        assert [k for k, _ in storage.list_keys("d/")] == ["d/key.csv"]
+    assert storage.read_bytes("d/key.csv") == b"new"
+
+    with pytest.raises(RuntimeError):
+        with storage.open_writer("d/key.csv") as f:
+            f.write(b"half")
+            raise RuntimeError("failed mid-write")
+    assert storage.read_bytes("d/key.csv") == b"new"
+    assert os.listdir(tmp_path / "d") == ["key.csv"]
+
+def test_s3_writer_splits_into_parts():
+    client = StubS3()
+    data = os.urandom(12 * MB + 5)
+    with S3MultipartWriter(client, "bucket", "key", part_size=5 * MB, max_concurrency=2) as f:
+        for start in range(0, len(data), 3 * MB):
+            f.write(data[start:start + 3 * MB])
+    assert [p["PartNumber"] for p in client.completed] == [1, 2, 3]
+    assert [len(client.parts[n]) for n in (1, 2, 3)] == [5 * MB, 5 * MB, 2 * MB + 5]
+    assert client.objects["key"] == data
+
+def test_s3_writer_small_object_is_one_put():
+    client = StubS3()
+    with S3MultipartWriter(client, "bucket", "key") as f:
+        f.write(b"small")
+    assert client.objects["key"] == b"small" and client.completed is None
+
+def test_s3_writer_aborts_on_error():
+    client = StubS3()
+    with pytest.raises(RuntimeError):
+        with S3MultipartWriter(client, "bucket", "key", part_size=5 * MB) as f:
+            f.write(os.urandom(6 * MB))
+            raise RuntimeError("failed mid-write")
+    assert client.aborted and client.completed is None and "key" not in client.objects
@@ -0,0 +1,157 @@
+# test_train.py
+# scripts/train.py: the CPU-budget scheduler behind run_parallel, and the cached feature
+# selection stage (a hit skips the selection fits and the *_all fits it stood in for).
+#   python -m pytest test/test_train.py
+import io
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import train
+from storage import MemoryStorage
+from dataio import split_rows, write_dataset
+from binning import QuantileBinner
+
+def run_schedule(tasks, n_cpus):
+    """schedule() over a thread pool; returns (results in yield order, peak n_jobs running)."""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def fit(name, feature_set, n_jobs):
+        with lock:
+            state["running"] += n_jobs
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02 * n_jobs)
+        with lock:
+            state["running"] -= n_jobs
+        return name, feature_set, n_jobs
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        submit = lambda name, feature_set, n_jobs: pool.submit(fit, name, feature_set, n_jobs)
+        results = list(train.schedule(tasks, n_cpus, submit))
+    return results, state["peak"]
+
+def test_schedule_stays_within_the_cpu_budget():
+    tasks = [(name, fs, 3 if name in ("RF", "XGB") else 1)
+             for name in ["RF", "XGB", "GB", "Lasso", "Ridge"] for fs in ["all", "selected"]]
+    results, peak = run_schedule(tasks, n_cpus=4)
+    assert peak <= 4
+    assert sorted(results) == sorted(tasks)
+
+def test_schedule_clips_tasks_wider_than_the_budget():
+    results, peak = run_schedule([("RF", "all", 8), ("Lasso", "all", 1), ("RF", "selected", 8)], n_cpus=2)
+    assert peak <= 2
+    assert sorted(results) == [("Lasso", "all", 1), ("RF", "all", 2), ("RF", "selected", 2)]
+
+# ---------------- cached feature selection ----------------
+MODELS = ["RandomForest", "XGBoost", "Ridge"]  # the two reused by selection, plus one fitted as usual
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.RandomState(0)
+    X = pd.DataFrame(rng.rand(1_500, 6).astype(np.float32), columns=[f"f{i}" for i in range(6)])
+    y = (5_000 * X["f0"] + 2_000 * X["f1"] ** 2 + 300 * rng.rand(len(X))).round().astype(int)
+    return X, pd.DataFrame({"Sales": y})
+
+def run_train(monkeypatch, storage, model_dir, selection_cache=True, models=MODELS):
+    """train.main() on `storage` with the fits run serially in this process.
+
+    Returns the selection runs and the (name, feature_set) fits of the training loop."""
+    runs, fits = [], []
+    run_selection = train.run_selection
+
+    def counting_selection(*args, **kwargs):
+        runs.append(args[0])
+        return run_selection(*args, **kwargs)
+
+    def serial(tasks, n_cpus, matrix_dir, n_train, out_dir):
+        for name, feature_set, _ in tasks:
+            fits.append((name, feature_set))
+            yield train.fit_task(name, feature_set, 1, matrix_dir, n_train, out_dir)
+
+    for name, value in {"storage": storage, "MODEL_DIR": model_dir, "N_CPUS": 1, "HEAVY_N_JOBS": 1,
+                        "SELECTION_MODE": "reuse", "SELECTION_CACHE": selection_cache,
+                        "MODEL_NAMES": models, "SUBMIT_ORDER": models, "run_parallel": serial,
+                        "run_selection": counting_selection,
+                        "package_transform": lambda *args: None}.items():  # no encoders in this bucket
+        monkeypatch.setattr(train, name, value)
+    train.main()
+    return runs, fits
+
+def new_bucket(training_data):
+    storage = MemoryStorage()
+    X, y = training_data
+    write_dataset(storage, X, train.PROC_PREFIX, "X_train")
+    write_dataset(storage, y, train.PROC_PREFIX, "y_train")
+    return storage
+
+def outputs(storage, model_dir):
+    return {
+        "selected": json.loads(storage.read_bytes(train.FEATURES_PREFIX + "selected_features.json")),
+        "results": json.loads(storage.read_bytes(train.RESULTS_PREFIX + "model_results.json")),
+        "all_fits": {n: storage.read_bytes(f"{train.MODEL_PREFIX}{n}_all.pkl") for n in train.REUSED_MODELS},
+        "model": joblib.load(os.path.join(model_dir, "model.pkl")),
+    }
+
+def test_cached_selection_reuses_its_fits(training_data, tmp_path, monkeypatch):
+    storage = new_bucket(training_data)
+    runs, fits = run_train(monkeypatch, storage, str(tmp_path / "first"))
+    first = outputs(storage, str(tmp_path / "first"))
+    assert runs == ["reuse"]
+    # RandomForest_all / XGBoost_all came out of the selection stage, not the training loop
+    assert sorted(fits) == sorted([(n, "selected") for n in MODELS] + [("Ridge", "all")])
+
+    runs, fits = run_train(monkeypatch, storage, str(tmp_path / "second"))
+    second = outputs(storage, str(tmp_path / "second"))
+    assert runs == []  # a stage-cache hit: no selection fits at all
+    assert sorted(fits) == sorted([(n, "selected") for n in MODELS] + [("Ridge", "all")])
+    assert second["all_fits"] == first["all_fits"]  # the cached pickles, uploaded as-is
+    assert second["selected"] == first["selected"]
+    assert second["results"] == first["results"]
+
+    # model.pkl is XGBoost_selected, fitted on the same selected columns
+    X = training_data[0][second["selected"]].to_numpy(np.float32)
+    assert second["model"].n_features_in_ == len(second["selected"])
+    np.testing.assert_array_equal(second["model"].predict(X), first["model"].predict(X))
+
+def test_cached_selection_matches_the_uncached_path(training_data, tmp_path, monkeypatch):
+    cached = new_bucket(training_data)
+    run_train(monkeypatch, cached, str(tmp_path / "warm"))
+    runs, _ = run_train(monkeypatch, cached, str(tmp_path / "cached"))
+    assert runs == []
+
+    uncached = new_bucket(training_data)
+    runs, _ = run_train(monkeypatch, uncached, str(tmp_path / "uncached"), selection_cache=False)
+    assert runs == ["reuse"]
+    assert not any(key.startswith(train.CACHE_PREFIX) for key, _ in uncached.list_keys(""))
+    for name in ["selected_features.json", "selected_features.txt"]:
+        assert cached.read_bytes(train.FEATURES_PREFIX + name) == uncached.read_bytes(train.FEATURES_PREFIX + name)
+    assert (cached.read_bytes(train.RESULTS_PREFIX + "model_results.json")
+            == uncached.read_bytes(train.RESULTS_PREFIX + "model_results.json"))
+
+def test_hgb_candidate_is_binned_on_the_training_rows(training_data, tmp_path, monkeypatch):
+    fitted = []
+    fit = QuantileBinner.fit
+    monkeypatch.setattr(QuantileBinner, "fit", lambda self, X, y=None: fitted.append(np.array(X)) or fit(self, X, y))
+    storage = new_bucket(training_data)
+    run_train(monkeypatch, storage, str(tmp_path), models=MODELS + ["HistGradientBoosting"])
+    X = training_data[0].to_numpy(np.float32)
+    train_rows, _ = split_rows(len(X), test_size=0.2, random_state=42)
+    (binned,) = fitted
+    np.testing.assert_array_equal(binned, X[train_rows])  # no validation row shapes the edges
+
+    # both HGB fits are pipelines over the shared codes that score raw feature rows
+    selected = json.loads(storage.read_bytes(train.FEATURES_PREFIX + "selected_features.json"))
+    for feature_set, columns in [("all", list(training_data[0].columns)), ("selected", selected)]:
+        model = joblib.load(io.BytesIO(storage.read_bytes(f"{train.MODEL_PREFIX}HistGradientBoosting_{feature_set}.pkl")))
+        assert [name for name, _ in model.steps] == ["bin", "model"]
+        assert model.named_steps["model"].n_features_in_ == len(columns)
+        assert np.isfinite(model.predict(training_data[0][columns].to_numpy(np.float32))).all()